@@ -0,0 +1,193 @@
+import asyncio
+import dataclasses
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from src.api.compressione import comprimibile, negozia_codifica
+from src.api.fetch_from_db import fetch_rows_cursor, get_cached_body, pooled_connection
+from src.api.http_cache import intestazioni_tabella, non_modificato, risposta_non_modificata
+from src.api.serialization import FORMATI_DATI, csv_header, encode_csv_rows, encode_rows
+from src.configurations import config
+from src.database.data_access import Interrogazione
+from src.logging.log_setup import get_logger
+
+# Inizializza il logger per questo modulo, per registrare eventi e errori.
+logger = get_logger(__name__)
+
+
+def create_db_executor() -> ThreadPoolExecutor:
+    """
+    Crea l'executor dedicato alle letture SQLite, separato dal threadpool di default di Starlette.
+    """
+    logger.info(f"Executor per le letture dal database avviato con {config.db_executor_workers} thread.")
+    return ThreadPoolExecutor(max_workers=config.db_executor_workers, thread_name_prefix="sqlite-reader")
+
+
+async def run_in_db_executor(request: Request, func, *args):
+    """
+    Esegue una funzione bloccante nell'executor del database senza bloccare l'event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(request.app.state.db_executor, partial(func, *args))
+
+
+# Formati che possono essere inviati man mano che le righe sono lette dal cursore.
+FORMATI_STREAMING = ("json", "csv")
+# Estensione del file suggerita al client per i formati di esportazione.
+ESTENSIONI = {"csv": "csv", "arrow": "arrows", "parquet": "parquet"}
+
+
+def _read_body(request: Request, table_name: str, interrogazione: Interrogazione, formato: str,
+               codifica: str | None) -> tuple[bytes, str | None, str | None]:
+    # Lavoro bloccante eseguito interamente in un thread dell'executor: checkout, cache, query e compressione.
+    with pooled_connection(request.app.state.db_pool) as conn:
+        return get_cached_body(table_name, interrogazione, conn, request.app.state.response_cache,
+                               formato=formato, codifica=codifica)
+
+
+async def fetch_response_async(request: Request, table_name: str, interrogazione: Interrogazione,
+                               formato: str = "json") -> Response:
+    """
+    Versione asincrona della lettura di una tabella: restituisce la risposta nel formato richiesto
+    (JSON, CSV, Arrow IPC o Parquet), dalla cache se possibile, oppure un 304 senza corpo
+    se la copia del client (If-None-Match / If-Modified-Since) è ancora valida.
+    Se il client lo accetta il corpo è compresso, con la variante compressa servita dalla cache.
+    """
+    # Con la cache disattivata le righe vengono inviate al client man mano che sono lette dal cursore.
+    # Le pagine, già limitate, passano invece dalla lettura completa che calcola il cursore successivo.
+    streaming = (request.app.state.response_cache.max_entries <= 0 and config.api_fast_json
+                 and not interrogazione.paginata and formato in FORMATI_STREAMING)
+    # Le risposte dalla cache sono compresse qui, una volta per versione dei dati; quelle in streaming
+    # sono compresse al volo da CompressioneMiddleware.
+    codifica = None
+    if not streaming and comprimibile(FORMATI_DATI[formato]):
+        codifica = negozia_codifica(request.headers.get("accept-encoding"))
+
+    # Le intestazioni dipendono solo dalla versione dei dati in memoria: il 304 non usa il database.
+    # Ogni codifica è una rappresentazione diversa, con il proprio ETag.
+    headers = intestazioni_tabella(request, table_name, dataclasses.astuple(interrogazione), formato, codifica)
+    if headers is not None:
+        # Formato e codifica dipendono dalle intestazioni della richiesta: le cache intermedie devono tenerne conto.
+        headers["Vary"] = "Accept, Accept-Encoding"
+        if non_modificato(request, headers):
+            return risposta_non_modificata(headers)
+    if formato in ESTENSIONI:
+        # I formati di esportazione vengono proposti come file da salvare, con il nome della tabella.
+        headers = {**(headers or {}),
+                   "Content-Disposition": f'attachment; filename="{table_name}.{ESTENSIONI[formato]}"'}
+
+    if streaming:
+        return await _stream_response_async(request, table_name, interrogazione, headers, formato)
+
+    body, successiva, applicata = await run_in_db_executor(request, _read_body, request, table_name,
+                                                           interrogazione, formato, codifica)
+    if applicata is not None:
+        headers = {**(headers or {}), "Content-Encoding": applicata}
+    if successiva is not None:
+        # Link alla pagina successiva (RFC 8288): stessa richiesta, con il cursore dell'ultima riga.
+        headers = {**(headers or {}), "Link": f'<{request.url.include_query_params(after=successiva)}>; rel="next"'}
+    return Response(content=body, media_type=FORMATI_DATI[formato], headers=headers)
+
+
+class _ConnessioneInStreaming:
+    """
+    Connessione del pool prelevata per tutta la durata di una risposta in streaming.
+    Viene restituita una sola volta, da chi arriva per primo tra la fine della risposta, la gestione
+    di un errore e il prelievo stesso se nel frattempo la richiesta è stata annullata.
+    """
+
+    def __init__(self, pool):
+        self._contesto = pooled_connection(pool)
+        # Serializza letture e restituzione: la connessione non torna al pool durante una fetchmany in corso.
+        self._lock = threading.Lock()
+        self._restituita = False
+        self.conn = None
+
+    def preleva(self):
+        conn = self._contesto.__enter__()
+        with self._lock:
+            self.conn = conn
+            if not self._restituita:
+                return conn
+            # La richiesta è stata annullata mentre si attendeva la connessione: va restituita subito.
+            self._contesto.__exit__(None, None, None)
+        return conn
+
+    def leggi(self, cursor, batch_size: int) -> list:
+        with self._lock:
+            # Dopo la restituzione il cursore non va più usato: la risposta termina.
+            return [] if self._restituita else cursor.fetchmany(batch_size)
+
+    def restituisci(self):
+        with self._lock:
+            if self._restituita:
+                return
+            self._restituita = True
+            if self.conn is not None:
+                self._contesto.__exit__(None, None, None)
+
+
+class _RispostaInStreaming(StreamingResponse):
+    """
+    StreamingResponse che restituisce la connessione al pool al termine dell'invio, in ogni caso:
+    anche se il client si disconnette prima che il corpo inizi o se l'invio solleva un'eccezione,
+    quando né il generatore né il task in background della risposta verrebbero completati.
+    Se la risposta non viene mai inviata (es. un errore prima dell'invio) la connessione è restituita
+    quando l'oggetto risposta viene eliminato.
+    """
+
+    def __init__(self, content, connessione: _ConnessioneInStreaming, **kwargs):
+        super().__init__(content, **kwargs)
+        self._connessione = connessione
+        weakref.finalize(self, connessione.restituisci)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Chiamata sincrona: va eseguita anche quando il task è stato annullato. Attende al massimo
+            # la fine di una lettura di un blocco di righe già in corso nell'executor.
+            self._connessione.restituisci()
+
+
+async def _stream_response_async(request: Request, table_name: str, interrogazione: Interrogazione,
+                                 headers: dict[str, str] | None, formato: str = "json") -> StreamingResponse:
+    # La connessione resta prelevata per tutta la durata dello streaming e viene restituita dalla risposta.
+    connessione = _ConnessioneInStreaming(request.app.state.db_pool)
+    try:
+        conn = await run_in_db_executor(request, connessione.preleva)
+        # Errori di validazione o di query vengono sollevati qui, prima che la risposta inizi.
+        cursor = await run_in_db_executor(request, fetch_rows_cursor, table_name, interrogazione, conn)
+    except BaseException:
+        connessione.restituisci()
+        raise
+
+    async def body() -> AsyncIterator[bytes]:
+        columns = [description[0] for description in cursor.description]
+        # Il CSV inizia con l'intestazione, il JSON con l'apertura della lista.
+        yield csv_header(columns) if formato == "csv" else b"["
+        first = True
+        while True:
+            # Ogni blocco di righe è letto nell'executor, lasciando libero l'event loop.
+            rows = await run_in_db_executor(request, connessione.leggi, cursor, config.api_json_batch_size)
+            if not rows:
+                break
+            if formato == "csv":
+                yield encode_csv_rows(rows)
+                continue
+            chunk = encode_rows(columns, rows)
+            yield chunk if first else b"," + chunk
+            first = False
+        if formato != "csv":
+            yield b"]"
+        # Restituisce la connessione appena lette tutte le righe, senza attendere la fine dell'invio.
+        connessione.restituisci()
+
+    return _RispostaInStreaming(body(), connessione, media_type=FORMATI_DATI[formato], headers=headers)
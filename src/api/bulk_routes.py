@@ -0,0 +1,63 @@
+# Importa APIRouter per creare un gruppo di rotte, Query per definire i parametri delle richieste
+# e Request per accedere a pool, cache ed executor condivisi dall'applicazione.
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+
+# Importa le funzioni per eseguire il lavoro bloccante fuori dall'event loop con una connessione del pool.
+from src.api.async_fetch import run_in_db_executor
+from src.api.fetch_from_db import LAYOUTS, get_cached_body, pooled_connection
+from src.api.http_cache import intestazioni_tabelle, non_modificato, risposta_non_modificata
+# Importa i nomi delle serie e delle tabelle nell'URL.
+from src.api.risorse import RISORSE
+from src.api.serialization import dumps
+from src.database.data_access import Interrogazione, transazione_lettura
+
+# Crea un'istanza di APIRouter.
+# 'prefix' aggiunge "/dati" all'inizio di tutte le rotte definite in questo file.
+# 'tags' raggruppa queste rotte sotto "Lettura Multipla" nella documentazione dell'API.
+router = APIRouter(prefix="/dati", tags=["Lettura Multipla"])
+
+
+def _read_bulk(request: Request, risorse: list[str], interrogazione: Interrogazione, layout: str) -> bytes:
+    # Lavoro bloccante eseguito in un thread dell'executor: una sola connessione e una sola transazione di
+    # lettura per tutte le tabelle, così i dati combinati provengono dallo stesso stato del database.
+    cache = request.app.state.response_cache
+    with pooled_connection(request.app.state.db_pool) as conn, transazione_lettura(conn):
+        # Ogni tabella passa dalla stessa cache delle rotte singole: le voci già presenti vengono riusate.
+        parts = [dumps(risorsa) + b":" + get_cached_body(RISORSE[risorsa], interrogazione, conn, cache, layout)[0]
+                 for risorsa in risorse]
+    return b"{" + b",".join(parts) + b"}"
+
+
+# Definisce un endpoint per leggere più serie e tabelle con una sola richiesta.
+@router.get("")
+async def get_dati(
+    request: Request,
+    # Parametro ripetibile: ?risorsa=produttivita-macroaree&risorsa=produttivita-nazionale
+    risorsa: list[str] = Query(..., description="Serie calcolate o tabelle originali da leggere (ripetibile)"),
+    da_anno: int | None = Query(None, description="Anno di inizio, comune a tutte le risorse"),
+    a_anno: int | None = Query(None, description="Anno di fine, comune a tutte le risorse"),
+    layout: str = Query("record", description="'record' (lista di oggetti) o 'colonne' (una lista per colonna)")
+):
+    """
+    Più serie calcolate e tabelle originali (es. 'produttivita-macroaree', 'produttivita') in un unico oggetto
+    JSON con una voce per risorsa, letto in una sola transazione. Il layout 'colonne' restituisce per ogni
+    risorsa un oggetto con una lista di valori per colonna, molto più compatto della lista di oggetti.
+    """
+    # Le risorse ripetute vengono lette una volta sola, mantenendo l'ordine della richiesta.
+    risorse = list(dict.fromkeys(risorsa))
+    sconosciute = [nome for nome in risorse if nome not in RISORSE]
+    if sconosciute:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Risorse sconosciute: {sconosciute}. Risorse disponibili: {', '.join(RISORSE)}.")
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Layout non supportato. Layout disponibili: {', '.join(LAYOUTS)}.")
+    interrogazione = Interrogazione(da_anno=da_anno, a_anno=a_anno)
+
+    # Come per le rotte singole, il 304 dipende solo dalle versioni dei dati in memoria.
+    headers = intestazioni_tabelle(request, [RISORSE[nome] for nome in risorse], risorse, da_anno, a_anno, layout)
+    if headers is not None and non_modificato(request, headers):
+        return risposta_non_modificata(headers)
+
+    body = await run_in_db_executor(request, _read_bulk, request, risorse, interrogazione, layout)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,174 @@
+import gzip
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.configurations import config
+
+# brotli e zstandard sono dipendenze opzionali: senza di esse resta disponibile solo gzip.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Codifiche supportate, in ordine di preferenza del server quando il client le accetta allo stesso modo.
+CODIFICHE = ("zstd", "br", "gzip")
+# Media type che vale la pena comprimere; immagini PNG, PDF e Parquet sono già compressi.
+TIPI_COMPRIMIBILI = ("text/", "application/json", "application/vnd.apache.arrow.stream", "image/svg+xml")
+
+
+def codifiche_disponibili() -> list[str]:
+    """
+    Restituisce le codifiche utilizzabili con le dipendenze installate.
+    """
+    mancanti = {"br": brotli is None, "zstd": zstandard is None}
+    return [codifica for codifica in CODIFICHE if not mancanti.get(codifica, False)]
+
+
+def comprimibile(media_type: str) -> bool:
+    """
+    Indica se le risposte con questo media type vanno compresse.
+    """
+    return media_type.lower().startswith(TIPI_COMPRIMIBILI)
+
+
+def negozia_codifica(accept_encoding: str | None) -> str | None:
+    """
+    Sceglie la codifica della risposta dall'intestazione Accept-Encoding: vince il valore 'q' più alto e,
+    a parità, l'ordine di CODIFICHE. Restituisce None se la risposta va inviata senza compressione.
+    """
+    if not config.api_compressione or not accept_encoding:
+        return None
+    preferenze = {}
+    for voce in accept_encoding.split(","):
+        nome, *parametri = [parte.strip() for parte in voce.split(";")]
+        q = 1.0
+        for parametro in parametri:
+            chiave, _, valore = parametro.partition("=")
+            if chiave.strip().lower() == "q":
+                try:
+                    q = float(valore)
+                except ValueError:
+                    q = 0.0
+        if nome:
+            preferenze[nome.lower()] = q
+
+    scelta, migliore = None, 0.0
+    for codifica in codifiche_disponibili():
+        # Una codifica non elencata vale quanto '*', se presente.
+        q = preferenze.get(codifica, preferenze.get("*", 0.0))
+        if q > migliore:
+            scelta, migliore = codifica, q
+    return scelta
+
+
+def comprimi(body: bytes, codifica: str, livelli: dict = config.api_livelli_compressione) -> bytes:
+    """
+    Comprime un corpo completo con la codifica indicata ("gzip", "br" o "zstd").
+    """
+    livello = livelli[codifica]
+    if codifica == "gzip":
+        # mtime=0 rende l'output deterministico: lo stesso corpo produce sempre gli stessi byte.
+        return gzip.compress(body, compresslevel=livello, mtime=0)
+    if codifica == "br":
+        return brotli.compress(body, quality=livello)
+    return zstandard.ZstdCompressor(level=livello).compress(body)
+
+
+class _CompressoreIncrementale:
+    # Comprime un corpo inviato a blocchi (StreamingResponse) con la codifica indicata.
+
+    def __init__(self, codifica: str, livello: int):
+        if codifica == "gzip":
+            # wbits 16 + MAX_WBITS produce il formato gzip (intestazione e CRC) invece di zlib.
+            compressore = zlib.compressobj(livello, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.comprimi, self.termina = compressore.compress, compressore.flush
+        elif codifica == "br":
+            compressore = brotli.Compressor(quality=livello)
+            self.comprimi, self.termina = compressore.process, compressore.finish
+        else:
+            compressore = zstandard.ZstdCompressor(level=livello).compressobj()
+            self.comprimi, self.termina = compressore.compress, compressore.flush
+
+
+class CompressioneMiddleware:
+    """
+    Middleware ASGI che comprime le risposte con gzip, brotli o zstd secondo l'intestazione Accept-Encoding.
+    Le risposte che hanno già una Content-Encoding (le varianti precompresse della cache dei dati) passano
+    invariate; i corpi completi più piccoli di 'minimo' byte e i media type già compressi non vengono compressi.
+    """
+
+    def __init__(self, app: ASGIApp, minimo: int = config.api_compressione_min_byte):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codifica = negozia_codifica(Headers(scope=scope).get("accept-encoding"))
+        if codifica is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _RispostaCompressa(send, codifica, self.minimo).send)
+
+
+class _RispostaCompressa:
+    # Intercetta i messaggi della risposta: l'inizio viene trattenuto finché il primo blocco del corpo
+    # non indica se la risposta è completa (e quanto è grande) o inviata a blocchi.
+
+    def __init__(self, send: Send, codifica: str, minimo: int):
+        self._send = send
+        self._codifica = codifica
+        self._minimo = minimo
+        self._inizio: Message | None = None
+        self._compressore: _CompressoreIncrementale | None = None
+        self._invariata = False
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            self._inizio = message
+            return
+        if message["type"] != "http.response.body" or self._invariata:
+            await self._send(message)
+            return
+
+        body, altri = message.get("body", b""), message.get("more_body", False)
+        if self._compressore is not None:
+            # Blocchi successivi di una risposta a blocchi già compressa.
+            chunk = self._compressore.comprimi(body)
+            if not altri:
+                chunk += self._compressore.termina()
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": altri})
+            return
+
+        headers = MutableHeaders(raw=self._inizio["headers"])
+        if ("content-encoding" in headers or not comprimibile(headers.get("content-type", ""))
+                or (not altri and len(body) < self._minimo)):
+            # Risposta già compressa, non comprimibile o troppo piccola: inviata così com'è.
+            self._invariata = True
+            await self._send(self._inizio)
+            await self._send(message)
+            return
+
+        headers["Content-Encoding"] = self._codifica
+        headers.add_vary_header("Accept-Encoding")
+        if "etag" in headers and not headers["etag"].startswith("W/"):
+            # Il corpo compresso al volo non è identico byte per byte all'originale: l'ETag diventa debole.
+            headers["ETag"] = "W/" + headers["etag"]
+        if altri:
+            # Risposta a blocchi: la lunghezza finale non è nota in anticipo.
+            del headers["content-length"]
+            self._compressore = _CompressoreIncrementale(self._codifica,
+                                                         config.api_livelli_compressione[self._codifica])
+            body = self._compressore.comprimi(body)
+        else:
+            body = comprimi(body, self._codifica)
+            headers["Content-Length"] = str(len(body))
+        await self._send(self._inizio)
+        await self._send({"type": "http.response.body", "body": body, "more_body": altri})
@@ -1,9 +1,19 @@
 import sqlite3
+from contextlib import contextmanager
 import pandas as pd
 from pathlib import Path
 from fastapi import HTTPException, status
 
+from src.api.compressione import comprimi
+from src.api.response_cache import ResponseCache
+from src.api.query_params import codifica_cursore
+from src.api.serialization import (FORMATI_ARROW, csv_header, dumps, encode_arrow, encode_columns, encode_csv_rows,
+                                   encode_rows, iter_json_rows)
 from src.configurations import config
+from src.database.connection_pool import PoolTimeoutError, SQLiteConnectionPool
+from src.database.data_access import (PREFISSO_CHIAVE, Interrogazione, costruisci_query, leggi_tabella, tipi_arrow,
+                                      valida_intervallo_anni)
+from src.database.data_version import get_data_version
 from src.logging.log_setup import get_logger
 
 # Inizializza il logger per questo modulo, per registrare eventi e errori.
@@ -12,61 +22,192 @@ logger = get_logger(__name__)
 db_path = Path(config.DB_DIR)
 
 
-def fetch_data_from_db(table_name: str, da_anno: int | None, a_anno: int | None) -> list:
+@contextmanager
+def pooled_connection(pool: SQLiteConnectionPool):
     """
-    Recupera i dati da una tabella specificata, con filtri opzionali per anno.
+    Preleva una connessione dal pool e la restituisce al termine del blocco,
+    traducendo gli errori del pool in risposte HTTP.
     """
-    # Controlla se il file del database esiste effettivamente nel percorso specificato.
-    if not db_path.exists():
-        # Se il database non viene trovato, registra un errore e solleva un'eccezione HTTP 404 (Not Found).
-        logger.error(f"Database '{db_path}' non trovato. Eseguire prima l'importazione.")
+    try:
+        conn = pool.checkout()
+    except FileNotFoundError:
+        logger.error(f"Database '{pool.db_path}' non trovato. Eseguire prima l'importazione.")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f"Database non trovato al percorso: {db_path}")
+                            detail=f"Database non trovato al percorso: {pool.db_path}")
+    except PoolTimeoutError:
+        # Tutte le connessioni sono occupate: il client può riprovare più tardi.
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Server sovraccarico, riprovare più tardi.")
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+# Forme del corpo JSON: lista di oggetti (una per riga) oppure un oggetto con una lista di valori per colonna.
+LAYOUTS = ("record", "colonne")
+
+
+def get_cached_body(table_name: str, interrogazione: Interrogazione, conn: sqlite3.Connection,
+                    cache: ResponseCache, layout: str = "record", formato: str = "json",
+                    codifica: str | None = None) -> tuple[bytes, str | None, str | None]:
+    """
+    Restituisce i dati richiesti di una tabella come corpo già serializzato nel formato indicato
+    (vedi FORMATI_DATI), insieme al cursore della pagina successiva (None se non è una lettura paginata
+    o se non ci sono altre righe), servendoli dalla cache finché la versione dei dati della tabella non cambia.
+    In JSON il corpo è una lista di oggetti (layout "record") o un oggetto con una lista per colonna ("colonne").
+    Con una 'codifica' ("gzip", "br" o "zstd") il corpo è compresso: anche la variante compressa
+    è salvata nella cache, così viene calcolata una sola volta per versione dei dati. I corpi più piccoli
+    di config.api_compressione_min_byte restano non compressi. Il terzo elemento restituito è la codifica
+    effettivamente applicata (None per il corpo non compresso).
+    """
+    # La versione viene letta a ogni richiesta: è una lettura per chiave primaria, molto più economica della query.
+    version = get_data_version(conn, table_name)
+    key = (table_name, interrogazione, layout, formato)
 
+    if codifica is not None:
+        compressed = cache.get(key + (codifica,), version)
+        if compressed is not None:
+            return compressed
+
+    cached = cache.get(key, version)
+    if cached is None:
+        # Cache miss: esegue la query e serializza il risultato una sola volta.
+        cached = _serializza(table_name, interrogazione, conn, layout, formato)
+        cache.set(key, version, cached)
+    body, successiva = cached
+    if codifica is None:
+        return body, successiva, None
+
+    if len(body) < config.api_compressione_min_byte:
+        # Corpo troppo piccolo, come per CompressioneMiddleware: la variante è il corpo non compresso,
+        # salvata comunque in cache così le richieste successive non ripetono il controllo.
+        compressed = (body, successiva, None)
+    else:
+        # Le varianti salvate in cache usano i livelli di compressione più alti: il costo si paga una volta sola.
+        # Con la cache disattivata la compressione si ripete a ogni richiesta e usa i livelli veloci.
+        livelli = config.api_livelli_compressione_cache if cache.max_entries > 0 else config.api_livelli_compressione
+        compressed = (comprimi(body, codifica, livelli), successiva, codifica)
+    cache.set(key + (codifica,), version, compressed)
+    return compressed
+
+
+def _serializza(table_name: str, interrogazione: Interrogazione, conn: sqlite3.Connection,
+                layout: str, formato: str) -> tuple[bytes, str | None]:
+    # Lista di oggetti JSON non paginata: il caso più comune, con i percorsi dedicati.
+    if formato == "json" and layout == "record" and not interrogazione.paginata:
+        if config.api_fast_json:
+            # Percorso veloce: le righe passano direttamente dal cursore al JSON, senza pandas.
+            return b"".join(iter_json_rows(fetch_rows_cursor(table_name, interrogazione, conn))), None
+        return dumps(fetch_data_from_db(table_name, interrogazione, conn=conn)), None
+
+    successiva = None
+    if interrogazione.paginata:
+        # Le pagine passano sempre dal cursore: servono i valori di ordinamento dell'ultima riga.
+        columns, rows, successiva = fetch_page(table_name, interrogazione, conn)
+    else:
+        cursor = fetch_rows_cursor(table_name, interrogazione, conn)
+        columns, rows = [description[0] for description in cursor.description], cursor.fetchall()
+
+    # Tutti i formati partono dalle tuple del cursore, senza un dizionario per riga.
+    if formato == "csv":
+        body = csv_header(columns) + encode_csv_rows(rows)
+    elif formato in FORMATI_ARROW:
+        body = encode_arrow(columns, rows, tipi_arrow(table_name), formato)
+    elif layout == "colonne":
+        body = encode_columns(columns, rows)
+    else:
+        body = b"[" + encode_rows(columns, rows) + b"]"
+    return body, codifica_cursore(successiva) if successiva is not None else None
+
+
+def _validate_year_range(da_anno: int | None, a_anno: int | None):
     # Valida che, se entrambi gli anni sono forniti, l'anno di fine non sia precedente all'anno di inizio.
-    if da_anno is not None and a_anno is not None and a_anno < da_anno:
+    try:
+        valida_intervallo_anni(da_anno, a_anno)
+    except ValueError as e:
         # Se la validazione fallisce, solleva un'eccezione HTTP 400 (Bad Request).
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="'a_anno' deve essere maggiore o uguale a 'da_anno'.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
+
+def fetch_rows_cursor(table_name: str, interrogazione: Interrogazione, conn: sqlite3.Connection,
+                      chiavi: bool = False) -> sqlite3.Cursor:
+    """
+    Esegue la query della lettura richiesta e restituisce il cursore sqlite3, senza materializzare le righe.
+    Con 'chiavi' le righe terminano con le colonne di ordinamento (vedi costruisci_query).
+    """
+    try:
+        query, params = costruisci_query(table_name, interrogazione, chiavi=chiavi)
+    except ValueError as e:
+        # Parametri non validi per la tabella: errore del client, HTTP 400 (Bad Request).
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     try:
-        # Apre una connessione al database. L'uso di 'with' garantisce che la connessione venga chiusa automaticamente.
-        with sqlite3.connect(db_path) as conn:
-            # Costruisce la parte iniziale della query SQL per selezionare tutti i record.
-            query = f'SELECT * FROM "{table_name}"'
-            conditions = []  # Lista per memorizzare le condizioni del filtro (clausola WHERE).
-            params = {}  # Dizionario per i parametri della query, per prevenire attacchi di SQL injection.
+        return conn.execute(query, params)
+    except sqlite3.Error as e:
+        logger.error(f"Errore database durante la lettura della tabella {table_name}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail=f"Errore interno del server durante la lettura della tabella '{table_name}'.")
 
-            # Se è stato fornito un anno di inizio, aggiunge la relativa condizione.
-            if da_anno is not None:
-                conditions.append(f'"{config.colonna_anno}" >= :da_anno')
-                params['da_anno'] = da_anno
 
-            # Se è stato fornito un anno di fine, aggiunge la relativa condizione.
-            if a_anno is not None:
-                conditions.append(f'"{config.colonna_anno}" <= :a_anno')
-                params['a_anno'] = a_anno
+def fetch_page(table_name: str, interrogazione: Interrogazione,
+               conn: sqlite3.Connection) -> tuple[list[str], list[tuple], tuple | None]:
+    """
+    Legge una pagina di una lettura paginata. Restituisce i nomi delle colonne, le righe e, se esiste
+    una pagina successiva, i valori di ordinamento dell'ultima riga (da codificare nel cursore 'after').
+    """
+    cursor = fetch_rows_cursor(table_name, interrogazione, conn, chiavi=True)
+    names = [description[0] for description in cursor.description]
+    # Le colonne di ordinamento sono in coda: 'k' separa le colonne richieste dalle chiavi.
+    k = len([name for name in names if not name.startswith(PREFISSO_CHIAVE)])
+    # La query legge al più una riga oltre il limite, che indica se esiste una pagina successiva.
+    rows = cursor.fetchall()
+    successiva = None
+    if interrogazione.limit is not None and len(rows) > interrogazione.limit:
+        rows = rows[:interrogazione.limit]
+        successiva = tuple(rows[-1][k:])
+    return names[:k], [row[:k] for row in rows], successiva
 
-            # Se ci sono condizioni di filtro, le aggiunge alla query principale, unite da "AND".
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
 
-            # Registra la query completa e i parametri per scopi di debug.
-            logger.debug(f"Esecuzione query: {query} con parametri: {params}")
+def explain_query_plan(table_name: str, interrogazione: Interrogazione, conn: sqlite3.Connection) -> list[str]:
+    """
+    Restituisce il piano di esecuzione (EXPLAIN QUERY PLAN) della query della lettura richiesta.
+    """
+    query, params = costruisci_query(table_name, interrogazione)
+    # L'ultima colonna di ogni riga del piano contiene la descrizione del passo (es. "SEARCH ... USING INDEX").
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
 
-            # Esegue la query utilizzando pandas, che popola un DataFrame con i risultati.
-            # 'params' viene passato per una sostituzione sicura dei valori nella query.
-            df = pd.read_sql_query(query, conn, params=params)
 
-            # Se il DataFrame è vuoto (nessun risultato trovato), restituisce una lista vuota.
-            if df.empty:
-                return []
+def year_range_uses_index(table_name: str, conn: sqlite3.Connection) -> bool:
+    """
+    Verifica che una query per intervallo di anni sulla tabella usi un indice invece di una scansione completa.
+    """
+    plan = explain_query_plan(table_name, Interrogazione(da_anno=0, a_anno=0), conn)
+    logger.debug(f"Piano di esecuzione per la tabella '{table_name}': {plan}")
+    # Con un indice il piano contiene "SEARCH"; una scansione completa compare come "SCAN".
+    return bool(plan) and all(step.startswith("SEARCH") for step in plan)
 
-            # Altrimenti, converte il DataFrame in una lista di dizionari e la restituisce.
-            return df.to_dict(orient='records')
 
+def fetch_data_from_db(table_name: str, interrogazione: Interrogazione = Interrogazione(),
+                       conn: sqlite3.Connection | None = None) -> list:
+    """
+    Recupera i dati da una tabella specificata, con filtri, proiezione, ordinamento e limite opzionali
+    (vedi Interrogazione), come lista di dizionari.
+    È l'adattatore HTTP di leggi_tabella: traduce gli errori della lettura in risposte HTTP.
+    Se viene passata una connessione (es. dal pool dell'API) la usa direttamente,
+    altrimenti ne apre una nuova solo per questa lettura.
+    """
+    try:
+        df = leggi_tabella(table_name, interrogazione, conn=conn)
+    except ValueError as e:
+        # Parametri non validi per la tabella: errore del client, HTTP 400 (Bad Request).
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except FileNotFoundError:
+        # Se il database non viene trovato, registra un errore e solleva un'eccezione HTTP 404 (Not Found).
+        logger.error(f"Database '{db_path}' non trovato. Eseguire prima l'importazione.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Database non trovato al percorso: {db_path}")
     # Gestisce specificamente gli errori che possono verificarsi durante le operazioni con il database SQLite.
-    except sqlite3.Error as e:
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
         logger.error(f"Errore database durante la lettura della tabella {table_name}: {e}", exc_info=True)
         # Solleva un'eccezione HTTP 500 (Internal Server Error) con un messaggio generico per sicurezza.
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -75,3 +216,10 @@ def fetch_data_from_db(table_name: str, da_anno: int | None, a_anno: int | None)
     except Exception as e:
         logger.error(f"Errore generico durante la lettura della tabella {table_name}: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Errore generico del server.")
+
+    # Se il DataFrame è vuoto (nessun risultato trovato), restituisce una lista vuota.
+    if df.empty:
+        return []
+    # Le colonne categoriali (regioni, macro aree) diventano stringhe nel JSON, come i nomi letti da SQLite.
+    df = df.astype({col: object for col in df.select_dtypes("category").columns})
+    return df.to_dict(orient='records')
@@ -0,0 +1,78 @@
+import hashlib
+import json
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+
+from src.configurations import config
+
+
+def etag_dati(*parti) -> str:
+    """
+    ETag (tra virgolette, come richiesto da HTTP) che identifica una risposta: cambia solo se cambiano
+    le parti indicate, cioè tabella, parametri della richiesta e versione dei dati.
+    """
+    contenuto = json.dumps(parti)
+    return f'"{hashlib.sha256(contenuto.encode("utf-8")).hexdigest()}"'
+
+
+def intestazioni_cache(etag: str, aggiornato_il: str | None) -> dict[str, str]:
+    """
+    Intestazioni di cache di una risposta: ETag, Cache-Control e, se nota, la data di ultima modifica dei dati.
+    """
+    headers = {"ETag": etag, "Cache-Control": config.api_cache_control}
+    if aggiornato_il is not None:
+        headers["Last-Modified"] = format_datetime(datetime.fromisoformat(aggiornato_il), usegmt=True)
+    return headers
+
+
+def intestazioni_tabella(request: Request, table_name: str, *parametri) -> dict[str, str] | None:
+    """
+    Intestazioni di cache della risposta con i dati di una tabella, calcolate dalla versione dei dati in memoria
+    (senza query sul database). Restituisce None se il database non esiste.
+    """
+    return intestazioni_tabelle(request, [table_name], *parametri)
+
+
+def intestazioni_tabelle(request: Request, table_names: list[str], *parametri) -> dict[str, str] | None:
+    """
+    Come intestazioni_tabella, per una risposta che combina più tabelle: l'ETag cambia se cambia una
+    qualsiasi delle tabelle e Last-Modified è la data di aggiornamento più recente.
+    """
+    versioni = [request.app.state.data_versions.get(table_name) for table_name in table_names]
+    if None in versioni:
+        return None
+    # La data di aggiornamento fa parte dell'ETag: un database ricreato riparte dalla versione 1.
+    aggiornamenti = [aggiornato_il for _, aggiornato_il in versioni if aggiornato_il is not None]
+    return intestazioni_cache(etag_dati(*table_names, *parametri, *versioni), max(aggiornamenti, default=None))
+
+
+def non_modificato(request: Request, headers: dict[str, str]) -> bool:
+    """
+    Indica se la copia in possesso del client, descritta dalle intestazioni condizionali della richiesta,
+    corrisponde ancora alla risposta con queste intestazioni. If-None-Match ha la precedenza
+    su If-Modified-Since, come prevede HTTP.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Il confronto è debole: un ETag "W/..." restituito da un proxy vale quanto l'originale.
+        etags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in etags or headers["ETag"] in etags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or "Last-Modified" not in headers:
+        return False
+    try:
+        client = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        # Una data non valida viene ignorata, come se l'intestazione non ci fosse.
+        return False
+    return client.tzinfo is not None and parsedate_to_datetime(headers["Last-Modified"]) <= client
+
+
+def risposta_non_modificata(headers: dict[str, str]) -> Response:
+    """
+    Risposta 304 senza corpo, con le stesse intestazioni di cache della risposta completa.
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
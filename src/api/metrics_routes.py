@@ -0,0 +1,35 @@
+# Importa APIRouter per creare un gruppo di rotte e Request per accedere allo stato dell'applicazione.
+from fastapi import APIRouter, Request
+
+# Crea un'istanza di APIRouter.
+# 'prefix' aggiunge "/metriche" all'inizio di tutte le rotte definite in questo file.
+# 'tags' raggruppa queste rotte sotto "Metriche" nella documentazione dell'API.
+router = APIRouter(prefix="/metriche", tags=["Metriche"])
+
+
+# Definisce un endpoint per consultare lo stato del pool di connessioni.
+@router.get("/pool-connessioni")
+async def get_metriche_pool(request: Request):
+    """
+    Dimensione, connessioni in uso, numero di checkout e tempi di attesa del pool di connessioni.
+    """
+    # Il pool è creato all'avvio dell'applicazione e salvato nello stato dell'app.
+    return request.app.state.db_pool.stats()
+
+
+# Definisce un endpoint per consultare i contatori della cache delle risposte.
+@router.get("/cache-risposte")
+async def get_metriche_cache(request: Request):
+    """
+    Voci, hit, miss, evizioni e invalidazioni della cache delle risposte, utili a dimensionarla.
+    """
+    return request.app.state.response_cache.stats()
+
+
+# Definisce un endpoint per consultare i contatori della cache dei grafici.
+@router.get("/cache-grafici")
+async def get_metriche_cache_grafici(request: Request):
+    """
+    Voci, hit, miss ed evizioni della cache dei grafici già generati.
+    """
+    return request.app.state.plot_cache.stats()
@@ -0,0 +1,91 @@
+# Importa hashlib e json per calcolare la chiave (impronta del contenuto) dei grafici in cache.
+import hashlib
+import json
+
+# Importa APIRouter per creare un gruppo di rotte, Query per definire i parametri delle richieste,
+# Request per accedere a pool, cache ed executor condivisi dall'applicazione e Response per restituire i grafici.
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+
+# Importa le funzioni per eseguire il lavoro bloccante fuori dall'event loop con una connessione del pool.
+from src.api.async_fetch import run_in_db_executor
+from src.api.fetch_from_db import _validate_year_range, pooled_connection
+from src.api.http_cache import intestazioni_tabella, non_modificato, risposta_non_modificata
+# Importa i nomi delle serie nell'URL e le tabelle corrispondenti.
+from src.api.risorse import SERIE_CALCOLATE
+from src.database.data_version import get_data_version
+# Importa la descrizione dei grafici e le funzioni per costruirli ed esportarli.
+from src.generate_plots.create_plots import (FORMATI, FORMATI_IMMAGINE, GRAFICI, GraficoSpec, costruisci_figura,
+                                             kaleido, serializza_figura)
+
+# Crea un'istanza di APIRouter.
+# 'prefix' aggiunge "/grafici" all'inizio di tutte le rotte definite in questo file.
+# 'tags' raggruppa queste rotte sotto "Grafici" nella documentazione dell'API.
+router = APIRouter(prefix="/grafici", tags=["Grafici"])
+
+# Ogni serie nell'URL (lo stesso nome delle rotte di /serie-calcolate) ha il grafico della sua tabella.
+_GRAFICI_PER_TABELLA = {grafico.table_name: grafico for grafico in GRAFICI}
+GRAFICI_PER_SERIE: dict[str, GraficoSpec] = {serie: _GRAFICI_PER_TABELLA[table_name]
+                                             for serie, table_name in SERIE_CALCOLATE.items()}
+
+
+def chiave_grafico(serie: str, da_anno: int | None, a_anno: int | None, formato: str, versione: int) -> str:
+    """
+    Impronta del grafico: cambia solo se cambiano serie, intervallo di anni, formato o dati della tabella.
+    """
+    contenuto = json.dumps([serie, da_anno, a_anno, formato, versione])
+    return hashlib.sha256(contenuto.encode("utf-8")).hexdigest()
+
+
+def _read_plot(request: Request, serie: str, da_anno: int | None, a_anno: int | None,
+               formato: str) -> bytes | None:
+    # Lavoro bloccante eseguito in un thread dell'executor: versione dei dati, cache e, se serve, generazione.
+    grafico = GRAFICI_PER_SERIE[serie]
+    cache = request.app.state.plot_cache
+    with pooled_connection(request.app.state.db_pool) as conn:
+        version = get_data_version(conn, grafico.table_name)
+        chiave = chiave_grafico(serie, da_anno, a_anno, formato, version)
+        body = cache.get((chiave,), version)
+        if body is None:
+            # Cache miss: legge i dati, costruisce la figura e la esporta una sola volta.
+            fig = costruisci_figura(grafico.table_name, grafico.y_col, grafico.title, grafico.color_col,
+                                    grafico.y_axis_title, da_anno, a_anno, conn=conn)
+            if fig is None:
+                return None
+            body = serializza_figura(fig, formato)
+            cache.set((chiave,), version, body)
+    return body
+
+
+# Definisce un endpoint per ottenere il grafico di una serie calcolata.
+@router.get("/{serie}")
+async def get_grafico(
+    request: Request,
+    serie: str,
+    da_anno: int | None = Query(None, description="Anno di inizio"),
+    a_anno: int | None = Query(None, description="Anno di fine"),
+    formato: str = Query("json", description=f"Formato del grafico: {', '.join(FORMATI)}")
+):
+    """
+    Grafico di una serie calcolata (es. 'produttivita-macroaree') come figura Plotly JSON, pagina HTML o immagine.
+    """
+    if serie not in GRAFICI_PER_SERIE:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Serie sconosciuta. Serie disponibili: {', '.join(GRAFICI_PER_SERIE)}.")
+    if formato not in FORMATI:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Formato non supportato. Formati disponibili: {', '.join(FORMATI)}.")
+    if formato in FORMATI_IMMAGINE and kaleido is None:
+        # Le immagini statiche richiedono kaleido, dipendenza opzionale non installata sul server.
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                            detail="Esportazione in immagine non disponibile su questo server.")
+    _validate_year_range(da_anno, a_anno)
+    # Come per i dati, un client con il grafico della versione corrente riceve un 304 senza usare il database.
+    headers = intestazioni_tabella(request, GRAFICI_PER_SERIE[serie].table_name, serie, da_anno, a_anno, formato)
+    if headers is not None and non_modificato(request, headers):
+        return risposta_non_modificata(headers)
+
+    body = await run_in_db_executor(request, _read_plot, request, serie, da_anno, a_anno, formato)
+    if body is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Nessun dato disponibile per l'intervallo di anni richiesto.")
+    return Response(content=body, media_type=FORMATI[formato], headers=headers)
@@ -0,0 +1,128 @@
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException, Query, Request, status
+
+from src.api.serialization import FORMATI_DATI, formati_disponibili
+from src.database.data_access import Interrogazione
+
+
+def codifica_cursore(valori: tuple) -> str:
+    """
+    Codifica i valori di ordinamento dell'ultima riga di una pagina in un cursore opaco da usare come 'after'.
+    """
+    contenuto = json.dumps(list(valori), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(contenuto).decode("ascii").rstrip("=")
+
+
+def decodifica_cursore(cursore: str) -> tuple:
+    """
+    Decodifica un cursore prodotto da codifica_cursore. Solleva un'eccezione HTTP 400 se non è valido.
+    """
+    try:
+        # Il padding '=' viene rimosso dal cursore per renderlo più leggibile nell'URL: va ripristinato.
+        valori = json.loads(base64.urlsafe_b64decode(cursore + "=" * (-len(cursore) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        valori = None
+    if not isinstance(valori, list) or any(isinstance(valore, (list, dict)) for valore in valori):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursore 'after' non valido.")
+    return tuple(valori)
+
+
+def interrogazione_da_query(
+    da_anno: int | None = Query(None, description="Anno di inizio"),
+    a_anno: int | None = Query(None, description="Anno di fine"),
+    regione: list[str] | None = Query(None, description="Regioni da includere (parametro ripetibile)"),
+    macro_area: list[str] | None = Query(None, description="Macro aree da includere (parametro ripetibile)"),
+    colonne: list[str] | None = Query(None, description="Colonne da restituire (parametro ripetibile)"),
+    ordina: list[str] | None = Query(None, description="Colonne di ordinamento (parametro ripetibile); "
+                                                       "il prefisso '-' indica l'ordine decrescente"),
+    limit: int | None = Query(None, ge=1, description="Numero massimo di righe della pagina"),
+    after: str | None = Query(None, description="Cursore della pagina successiva, dall'intestazione Link"),
+) -> Interrogazione:
+    """
+    Dipendenza comune alle rotte dei dati: raccoglie i parametri della richiesta in un'Interrogazione.
+    La validazione rispetto alla tabella avviene nella lettura, che risponde 400 ai parametri non validi.
+    """
+    return Interrogazione(
+        da_anno=da_anno,
+        a_anno=a_anno,
+        # L'ordine dei filtri non conta: normalizzarlo fa condividere la stessa voce di cache.
+        regioni=tuple(sorted(set(regione or ()))),
+        macro_aree=tuple(sorted(set(macro_area or ()))),
+        colonne=tuple(colonne or ()),
+        ordina=tuple(ordina or ()),
+        limit=limit,
+        after=decodifica_cursore(after) if after is not None else None,
+    )
+
+
+def negozia_formato(accept: str, disponibili: list[str]) -> str | None:
+    """
+    Sceglie tra i formati disponibili quello preferito dall'intestazione Accept: vince il valore 'q' più alto,
+    poi l'intervallo di media type più specifico ('text/csv' prima di 'text/*' e di '*/*'), poi l'ordine
+    in cui il client elenca i media type; a parità l'ordine di FORMATI_DATI (JSON per primo).
+    Restituisce None se nessun formato disponibile è accettato.
+    """
+    intervalli = []
+    for indice, voce in enumerate(accept.split(",")):
+        media_type, *parametri = [parte.strip() for parte in voce.split(";")]
+        q = 1.0
+        for parametro in parametri:
+            nome, _, valore = parametro.partition("=")
+            if nome.strip().lower() == "q":
+                try:
+                    q = float(valore)
+                except ValueError:
+                    q = 0.0
+        if media_type:
+            intervalli.append((media_type.lower(), q, indice))
+
+    scelta, migliore = None, None
+    for formato in disponibili:
+        tipo, sottotipo = FORMATI_DATI[formato].split("/")
+        corrispondenze = []
+        for media_type, q, indice in intervalli:
+            if media_type == f"{tipo}/{sottotipo}":
+                corrispondenze.append((2, q, indice))
+            elif media_type == f"{tipo}/*":
+                corrispondenze.append((1, q, indice))
+            elif media_type == "*/*":
+                corrispondenze.append((0, q, indice))
+        if not corrispondenze:
+            continue
+        # Per ogni formato conta l'intervallo più specifico che lo comprende (RFC 9110, sezione 12.5.1).
+        specificita, q, indice = max(corrispondenze, key=lambda c: (c[0], -c[2]))
+        punteggio = (q, specificita, -indice)
+        if q > 0 and (migliore is None or punteggio > migliore):
+            scelta, migliore = formato, punteggio
+    return scelta
+
+
+def formato_da_richiesta(
+    request: Request,
+    formato: str | None = Query(None, description=f"Formato della risposta: {', '.join(FORMATI_DATI)}; "
+                                                  "se assente viene scelto dall'intestazione Accept"),
+) -> str:
+    """
+    Dipendenza comune alle rotte dei dati: il formato della risposta, indicato dal parametro 'formato'
+    oppure negoziato con l'intestazione Accept (JSON se l'intestazione manca).
+    """
+    disponibili = formati_disponibili()
+    if formato is not None:
+        if formato not in FORMATI_DATI:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Formato non supportato. Formati disponibili: {', '.join(FORMATI_DATI)}.")
+        if formato not in disponibili:
+            # Arrow e Parquet richiedono pyarrow, dipendenza opzionale non installata sul server.
+            raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                                detail=f"Formato '{formato}' non disponibile su questo server.")
+        return formato
+
+    scelta = negozia_formato(request.headers.get("accept", "*/*"), disponibili)
+    if scelta is None:
+        media_types = [FORMATI_DATI[formato] for formato in disponibili]
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                            detail=f"Nessun formato accettabile. Media type disponibili: {', '.join(media_types)}.")
+    return scelta
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+from src.configurations import config
+
+# Valore salvato in una voce: il corpo già serializzato (grafici) oppure una tupla che lo accompagna con i
+# metadati della risposta, cioè (corpo, cursore della pagina successiva) per i dati e
+# (corpo, cursore, codifica applicata) per le varianti compresse; cursore e codifica possono essere None.
+ValoreCache = bytes | tuple[bytes, str | None] | tuple[bytes, str | None, str | None]
+
+
+def _dimensione(body: ValoreCache) -> int:
+    # Per le tuple conta tutte le parti non nulle: corpo, cursore ed eventuale nome della codifica.
+    return len(body) if isinstance(body, bytes) else sum(len(parte) for parte in body if parte is not None)
+
+
+class ResponseCache:
+    """
+    Cache LRU in memoria delle risposte già serializzate, con scadenza (TTL). I valori sono opachi
+    per la cache (vedi ValoreCache): chi li salva decide se memorizzare il solo corpo o una tupla.
+
+    Ogni voce ricorda la versione dei dati con cui è stata prodotta: se la versione
+    corrente della tabella è cambiata (nuova importazione o nuovo calcolo) la voce è scartata.
+    """
+
+    def __init__(self, max_entries: int = config.api_cache_max_entries, ttl: float = config.api_cache_ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Le voci sono ordinate dalla meno recente alla più recente.
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        # Contatori per il dimensionamento della cache.
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key: tuple, version: int) -> ValoreCache | None:
+        """
+        Restituisce il valore salvato per la chiave, così come passato a set(),
+        oppure None se assente, scaduto o di una versione precedente.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            entry_version, created_at, body = entry
+            if entry_version != version:
+                # I dati sono stati aggiornati dopo la creazione della voce.
+                del self._entries[key]
+                self._invalidations += 1
+                self._misses += 1
+                return None
+            if time.monotonic() - created_at > self.ttl:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            # Segna la voce come usata di recente.
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return body
+
+    def set(self, key: tuple, version: int, body: ValoreCache):
+        """
+        Salva un corpo di risposta (o la tupla con corpo e metadati),
+        eliminando le voci meno usate oltre la capacità massima.
+        """
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """
+        Svuota la cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Restituisce i contatori di utilizzo della cache.
+        """
+        with self._lock:
+            requests = self._hits + self._misses
+            return {
+                "voci": len(self._entries),
+                "capacita": self.max_entries,
+                "ttl_secondi": self.ttl,
+                "byte_memorizzati": sum(_dimensione(entry[2]) for entry in self._entries.values()),
+                "hit": self._hits,
+                "miss": self._misses,
+                "hit_ratio": round(self._hits / requests, 4) if requests else 0.0,
+                "evizioni": self._evictions,
+                "scadenze": self._expirations,
+                "invalidazioni": self._invalidations,
+            }
@@ -0,0 +1,51 @@
+import sqlite3
+import time
+
+from fastapi import FastAPI, HTTPException
+
+from src.api.compressione import codifiche_disponibili
+from src.api.fetch_from_db import get_cached_body
+from src.api.risorse import RISORSE
+from src.configurations import config
+from src.database.data_access import Interrogazione
+from src.logging.log_setup import get_logger
+
+# Inizializza il logger per questo modulo, per registrare eventi e errori.
+logger = get_logger(__name__)
+
+
+def riscalda_cache(app: FastAPI) -> bool:
+    """
+    Prepara il worker a ricevere traffico: apre il pool di connessioni, carica le versioni dei dati e mette
+    nella cache delle risposte la lettura completa di ogni risorsa in config.api_risorse_riscaldamento,
+    in JSON e in ogni codifica di compressione disponibile. Al termine imposta app.state.pronto.
+    Restituisce False, lasciando il worker non pronto, se il database non esiste ancora.
+    """
+    inizio = time.perf_counter()
+    try:
+        app.state.db_pool.open()
+    except FileNotFoundError:
+        logger.warning(f"Database '{config.DB_DIR}' non ancora presente: cache non riscaldate.")
+        return False
+
+    nomi = config.api_risorse_riscaldamento or list(RISORSE)
+    voci = 0
+    with app.state.db_pool.connection() as conn:
+        for nome in nomi:
+            table_name = RISORSE[nome]
+            # Le versioni dei dati servono già alla prima richiesta, per ETag e 304.
+            app.state.data_versions.get(table_name)
+            try:
+                # La variante non compressa viene letta per prima: le altre la comprimono dalla cache.
+                for codifica in (None, *codifiche_disponibili()):
+                    get_cached_body(table_name, Interrogazione(), conn, app.state.response_cache, codifica=codifica)
+                    voci += 1
+            except (HTTPException, sqlite3.Error):
+                # Una tabella mancante (es. serie non ancora calcolate) non impedisce di servire le altre.
+                logger.warning(f"Riscaldamento della risorsa '{nome}' non riuscito: tabella '{table_name}' "
+                               "non leggibile.")
+
+    app.state.pronto = True
+    logger.info(f"Cache riscaldate con {voci} risposte di {len(nomi)} risorse "
+                f"in {(time.perf_counter() - inizio) * 1000:.0f} ms.")
+    return True
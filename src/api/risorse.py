@@ -0,0 +1,21 @@
+# Importa le configurazioni, che contengono i nomi delle tabelle.
+from src.configurations import config
+
+# Nome di ogni serie calcolata nell'URL (come nelle rotte di /serie-calcolate) e tabella corrispondente.
+SERIE_CALCOLATE = {
+    "media-occupazione-macroaree": config.tabella_medie_macroaree_occupazione_pesca,
+    "media-occupazione-nazionale": config.tabella_media_nazionale_occupazione_pesca,
+    "media-valore-aggiunto-macroaree": config.tabella_medie_macroaree_valore_aggiunto_pesca,
+    "produttivita-macroaree": config.tabella_totali_macroaree_produttivita_pesca,
+    "produttivita-nazionale": config.tabella_totale_nazionale_produttivita_pesca,
+}
+
+# Nome di ogni tabella originale nell'URL (come nelle rotte di /tabelle_originali) e tabella corrispondente.
+TABELLE_ORIGINALI = {
+    "andamento-occupazione": config.tabella_andamento_occupazione_pesca,
+    "importanza-economica": config.tabella_importanza_economica_pesca,
+    "produttivita": config.tabella_produttivita_pesca,
+}
+
+# Tutte le risorse leggibili dall'API: i nomi delle serie e delle tabelle originali non si sovrappongono.
+RISORSE = {**SERIE_CALCOLATE, **TABELLE_ORIGINALI}
@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+import sqlite3
+from typing import Iterator
+
+from src.configurations import config
+
+# orjson è una dipendenza opzionale: se installata viene usata per una serializzazione JSON più veloce.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pyarrow è una dipendenza opzionale: serve solo per i formati Arrow IPC e Parquet.
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Formati delle risposte con i dati, con il media type corrispondente.
+FORMATI_DATI = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",  # Stream IPC di Apache Arrow.
+    "parquet": "application/vnd.apache.parquet",
+}
+# Formati che richiedono pyarrow.
+FORMATI_ARROW = ("arrow", "parquet")
+
+
+def formati_disponibili() -> list[str]:
+    """
+    Restituisce i formati dei dati utilizzabili con le dipendenze installate.
+    """
+    return [formato for formato in FORMATI_DATI if pa is not None or formato not in FORMATI_ARROW]
+
+
+def dumps(obj) -> bytes:
+    """
+    Serializza un oggetto in JSON (UTF-8), con orjson se disponibile.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    # Stessi parametri di serializzazione della JSONResponse di FastAPI.
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_rows(columns: list[str], rows: list[tuple]) -> bytes:
+    """
+    Codifica un blocco di righe come oggetti JSON separati da virgole, senza parentesi quadre,
+    così che i blocchi successivi si possano concatenare in un'unica lista.
+    """
+    return dumps([dict(zip(columns, row)) for row in rows])[1:-1]
+
+
+def encode_columns(columns: list[str], rows: list[tuple]) -> bytes:
+    """
+    Codifica le righe in formato colonnare, un oggetto JSON con una lista di valori per colonna
+    ({"Anno": [...], ...}): i nomi delle colonne compaiono una volta sola invece che in ogni riga.
+    """
+    values = [list(column) for column in zip(*rows)] or [[] for _ in columns]
+    return dumps(dict(zip(columns, values)))
+
+
+def iter_json_rows(cursor: sqlite3.Cursor, batch_size: int = config.api_json_batch_size) -> Iterator[bytes]:
+    """
+    Legge le righe direttamente dal cursore sqlite3 e le codifica in JSON un blocco alla volta,
+    producendo una lista di oggetti senza costruire DataFrame né la lista completa dei record.
+    """
+    # I nomi delle colonne sono disponibili nella descrizione del cursore.
+    columns = [description[0] for description in cursor.description]
+    yield b"["
+    first = True
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        chunk = encode_rows(columns, rows)
+        yield chunk if first else b"," + chunk
+        first = False
+    yield b"]"
+
+
+def csv_header(columns: list[str]) -> bytes:
+    """
+    Restituisce la riga di intestazione CSV con i nomi delle colonne.
+    """
+    return encode_csv_rows([columns])
+
+
+def encode_csv_rows(rows: list[tuple]) -> bytes:
+    """
+    Codifica un blocco di righe in CSV (RFC 4180, UTF-8); i valori mancanti diventano campi vuoti.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def iter_csv_rows(cursor: sqlite3.Cursor, batch_size: int = config.api_json_batch_size) -> Iterator[bytes]:
+    """
+    Come iter_json_rows, ma produce il CSV: l'intestazione e poi un blocco di righe alla volta dal cursore.
+    """
+    yield csv_header([description[0] for description in cursor.description])
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield encode_csv_rows(rows)
+
+
+def encode_arrow(columns: list[str], rows: list[tuple], tipi: dict, formato: str) -> bytes:
+    """
+    Codifica le righe come stream IPC di Apache Arrow ("arrow") o file Parquet ("parquet").
+    Le righe vengono trasposte in una lista di valori per colonna, convertita direttamente in array Arrow
+    senza passare da un dizionario per riga. 'tipi' associa a ogni colonna il tipo Arrow (vedi tipi_arrow):
+    con un tipo dictionary la colonna viene codificata come dizionario (nomi di regioni e macro aree).
+    """
+    if pa is None:
+        raise ValueError("I formati arrow e parquet richiedono il pacchetto 'pyarrow'.")
+    values = list(zip(*rows)) or [() for _ in columns]
+    arrays = []
+    for name, column in zip(columns, values):
+        tipo = tipi.get(name)
+        if tipo is not None and pa.types.is_dictionary(tipo):
+            arrays.append(pa.array(column, type=tipo.value_type).dictionary_encode())
+        else:
+            arrays.append(pa.array(column, type=tipo))
+    table = pa.Table.from_arrays(arrays, names=columns)
+
+    sink = pa.BufferOutputStream()
+    if formato == "parquet":
+        pq.write_table(table, sink)
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -1,10 +1,14 @@
-# Importa APIRouter per creare un gruppo di rotte e Query per definire i parametri delle richieste.
-from fastapi import APIRouter, Query
+# Importa APIRouter per creare un gruppo di rotte, Depends per raccogliere i parametri delle richieste
+# e Request per accedere a pool, cache ed executor condivisi dall'applicazione.
+from fastapi import APIRouter, Depends, Request
 
-# Importa la funzione che si occupa di interrogare il database.
-from src.api.fetch_from_db import fetch_data_from_db
+# Importa la funzione asincrona che restituisce i dati (dalla cache o dal database).
+from src.api.async_fetch import fetch_response_async
+# Importa le dipendenze che raccolgono i parametri della lettura e il formato della risposta.
+from src.api.query_params import formato_da_richiesta, interrogazione_da_query
 # Importa le configurazioni, che contengono i nomi delle tabelle.
 from src.configurations import config
+from src.database.data_access import Interrogazione
 
 # Crea un'istanza di APIRouter.
 # 'prefix' aggiunge "/serie-calcolate" all'inizio di tutte le rotte definite in questo file.
@@ -14,67 +18,85 @@ router = APIRouter(prefix="/serie-calcolate", tags=["Serie Calcolate"])
 
 # Definisce un endpoint per ottenere la media di occupazione per macroaree.
 @router.get("/media-occupazione-macroaree")
-def get_media_occupazione_macroaree(
-    # Definisce un parametro opzionale 'da_anno' per filtrare i dati.
-    da_anno: int | None = Query(None, description="Anno di inizio"),
-    # Definisce un parametro opzionale 'a_anno' per filtrare i dati.
-    a_anno: int | None = Query(None, description="Anno di fine")
+async def get_media_occupazione_macroaree(
+    request: Request,
+    # Filtri, proiezione, ordinamento e paginazione richiesti (vedi interrogazione_da_query).
+    interrogazione: Interrogazione = Depends(interrogazione_da_query),
+    # Formato della risposta: JSON, CSV, Arrow IPC o Parquet (vedi formato_da_richiesta).
+    formato: str = Depends(formato_da_richiesta)
 ):
     """
     Media Variazione percentuale occupazione delle 5 Aree.
     """
     # Chiama la funzione generica per recuperare i dati, specificando la tabella corretta
-    # e passando i filtri per l'anno.
-    return fetch_data_from_db(config.tabella_medie_macroaree_occupazione_pesca, da_anno, a_anno)
+    # e passando i parametri della richiesta.
+    return await fetch_response_async(request, config.tabella_medie_macroaree_occupazione_pesca,
+                                      interrogazione, formato)
 
 
 # Definisce un endpoint per ottenere la media di occupazione a livello nazionale.
 @router.get("/media-occupazione-nazionale")
-def get_media_occupazione_nazionale(
-    da_anno: int | None = Query(None, description="Anno di inizio"),
-    a_anno: int | None = Query(None, description="Anno di fine")
+async def get_media_occupazione_nazionale(
+    request: Request,
+    # Filtri, proiezione, ordinamento e paginazione richiesti (vedi interrogazione_da_query).
+    interrogazione: Interrogazione = Depends(interrogazione_da_query),
+    # Formato della risposta: JSON, CSV, Arrow IPC o Parquet (vedi formato_da_richiesta).
+    formato: str = Depends(formato_da_richiesta)
 ):
     """
     Media Variazione percentuale occupazione nazionale.
     """
     # Recupera i dati dalla tabella della media nazionale di occupazione.
-    return fetch_data_from_db(config.tabella_media_nazionale_occupazione_pesca, da_anno, a_anno)
+    return await fetch_response_async(request, config.tabella_media_nazionale_occupazione_pesca,
+                                      interrogazione, formato)
 
 
 # Definisce un endpoint per ottenere la media del valore aggiunto per macroaree.
 @router.get("/media-valore-aggiunto-macroaree")
-def get_media_valore_aggiunto_macroaree(
-    da_anno: int | None = Query(None, description="Anno di inizio"),
-    a_anno: int | None = Query(None, description="Anno di fine")
+async def get_media_valore_aggiunto_macroaree(
+    request: Request,
+    # Filtri, proiezione, ordinamento e paginazione richiesti (vedi interrogazione_da_query).
+    interrogazione: Interrogazione = Depends(interrogazione_da_query),
+    # Formato della risposta: JSON, CSV, Arrow IPC o Parquet (vedi formato_da_richiesta).
+    formato: str = Depends(formato_da_richiesta)
 ):
     """
     Media percentuale valore aggiunto per Macro-Area
     """
     # Recupera i dati dalla tabella delle medie del valore aggiunto per macroarea.
-    return fetch_data_from_db(config.tabella_medie_macroaree_valore_aggiunto_pesca, da_anno, a_anno)
+    return await fetch_response_async(request, config.tabella_medie_macroaree_valore_aggiunto_pesca,
+                                      interrogazione, formato)
 
 
 # Definisce un endpoint per ottenere la produttività per macroaree.
 @router.get("/produttivita-macroaree")
-def get_produttivita_macroaree(
-    da_anno: int | None = Query(None, description="Anno di inizio"),
-    a_anno: int | None = Query(None, description="Anno di fine")
+async def get_produttivita_macroaree(
+    request: Request,
+    # Filtri, proiezione, ordinamento e paginazione richiesti (vedi interrogazione_da_query).
+    interrogazione: Interrogazione = Depends(interrogazione_da_query),
+    # Formato della risposta: JSON, CSV, Arrow IPC o Parquet (vedi formato_da_richiesta).
+    formato: str = Depends(formato_da_richiesta)
 ):
     """
     Produttività totale in migliaia di euro delle 5 Aree Nord-ovest, Nord-est, Centro, Sud, Isole.
     """
     # Recupera i dati dalla tabella dei totali di produttività per macroarea.
-    return fetch_data_from_db(config.tabella_totali_macroaree_produttivita_pesca, da_anno, a_anno)
+    return await fetch_response_async(request, config.tabella_totali_macroaree_produttivita_pesca,
+                                      interrogazione, formato)
 
 
 # Definisce un endpoint per ottenere la produttività a livello nazionale.
 @router.get("/produttivita-nazionale")
-def get_produttivita_nazionale(
-    da_anno: int | None = Query(None, description="Anno di inizio"),
-    a_anno: int | None = Query(None, description="Anno di fine")
+async def get_produttivita_nazionale(
+    request: Request,
+    # Filtri, proiezione, ordinamento e paginazione richiesti (vedi interrogazione_da_query).
+    interrogazione: Interrogazione = Depends(interrogazione_da_query),
+    # Formato della risposta: JSON, CSV, Arrow IPC o Parquet (vedi formato_da_richiesta).
+    formato: str = Depends(formato_da_richiesta)
 ):
     """
     Produttività totale in migliaia di euro nazionale.
     """
     # Recupera i dati dalla tabella del totale di produttività nazionale.
-    return fetch_data_from_db(config.tabella_totale_nazionale_produttivita_pesca, da_anno, a_anno)
\ No newline at end of file
+    return await fetch_response_async(request, config.tabella_totale_nazionale_produttivita_pesca,
+                                      interrogazione, formato)
\ No newline at end of file
@@ -1,9 +1,13 @@
-# Importa APIRouter per creare un gruppo di rotte e Query per definire i parametri delle richieste.
-from fastapi import APIRouter, Query
-# Importa la funzione che si occupa di interrogare il database.
-from src.api.fetch_from_db import fetch_data_from_db
+# Importa APIRouter per creare un gruppo di rotte, Depends per raccogliere i parametri delle richieste
+# e Request per accedere a pool, cache ed executor condivisi dall'applicazione.
+from fastapi import APIRouter, Depends, Request
+# Importa la funzione asincrona che restituisce i dati (dalla cache o dal database).
+from src.api.async_fetch import fetch_response_async
+# Importa le dipendenze che raccolgono i parametri della lettura e il formato della risposta.
+from src.api.query_params import formato_da_richiesta, interrogazione_da_query
 # Importa le configurazioni, che contengono i nomi delle tabelle.
 from src.configurations import config
+from src.database.data_access import Interrogazione
 
 # Crea un'istanza di APIRouter.
 # 'prefix' aggiunge "/tabelle_originali" all'inizio di tutte le rotte definite in questo file.
@@ -12,43 +16,46 @@ router = APIRouter(prefix="/tabelle_originali", tags=["Tabelle Originali"])
 
 # Definisce un endpoint per ottenere i dati sull'andamento dell'occupazione.
 @router.get("/andamento-occupazione")
-def get_andamento_occupazione(
-        # Definisce un parametro opzionale 'da_anno' per filtrare i dati per anno di inizio.
-        da_anno: int | None = Query(None, description="Anno di inizio"),
-        # Definisce un parametro opzionale 'a_anno' per filtrare i dati per anno di fine.
-        a_anno: int | None = Query(None, description="Anno di fine")
+async def get_andamento_occupazione(
+        request: Request,
+        # Filtri, proiezione, ordinamento e paginazione richiesti (vedi interrogazione_da_query).
+        interrogazione: Interrogazione = Depends(interrogazione_da_query),
+        # Formato della risposta: JSON, CSV, Arrow IPC o Parquet (vedi formato_da_richiesta).
+        formato: str = Depends(formato_da_richiesta)
 ):
     """
         Esporta la tabella 'Andamento-occupazione-del-settore-della-pesca-per-regione'.
     """
     # Chiama la funzione per recuperare i dati, specificando la tabella corretta
-    # e passando i filtri per l'anno.
-    return fetch_data_from_db(config.tabella_andamento_occupazione_pesca, da_anno, a_anno)
+    # e passando i parametri della richiesta.
+    return await fetch_response_async(request, config.tabella_andamento_occupazione_pesca, interrogazione, formato)
 
 # Definisce un endpoint per ottenere i dati sull'importanza economica.
 @router.get("/importanza-economica")
-def get_importanza_economica(
-        # Parametro opzionale per l'anno di inizio.
-        da_anno: int | None = Query(None, description="Anno di inizio"),
-        # Parametro opzionale per l'anno di fine.
-        a_anno: int | None = Query(None, description="Anno di fine")
+async def get_importanza_economica(
+        request: Request,
+        # Filtri, proiezione, ordinamento e paginazione richiesti (vedi interrogazione_da_query).
+        interrogazione: Interrogazione = Depends(interrogazione_da_query),
+        # Formato della risposta: JSON, CSV, Arrow IPC o Parquet (vedi formato_da_richiesta).
+        formato: str = Depends(formato_da_richiesta)
 ):
     """
         Esporta la tabella 'Importanza-economica-del-settore-della-pesca-per-regione'.
         """
     # Recupera i dati dalla tabella sull'importanza economica.
-    return fetch_data_from_db(config.tabella_importanza_economica_pesca, da_anno, a_anno)
+    return await fetch_response_async(request, config.tabella_importanza_economica_pesca, interrogazione, formato)
 
 # Definisce un endpoint per ottenere i dati sulla produttività.
 @router.get("/produttivita")
-def get_produttivita(
-        # Parametro opzionale per l'anno di inizio.
-        da_anno: int | None = Query(None, description="Anno di inizio"),
-        # Parametro opzionale per l'anno di fine.
-        a_anno: int | None = Query(None, description="Anno di fine")
+async def get_produttivita(
+        request: Request,
+        # Filtri, proiezione, ordinamento e paginazione richiesti (vedi interrogazione_da_query).
+        interrogazione: Interrogazione = Depends(interrogazione_da_query),
+        # Formato della risposta: JSON, CSV, Arrow IPC o Parquet (vedi formato_da_richiesta).
+        formato: str = Depends(formato_da_richiesta)
 ):
     """
         Esporta la tabella 'Produttivita-del-settore-della-pesca-per-regione'.
         """
     # Recupera i dati dalla tabella sulla produttività.
-    return fetch_data_from_db(config.tabella_produttivita_pesca, da_anno, a_anno)
\ No newline at end of file
+    return await fetch_response_async(request, config.tabella_produttivita_pesca, interrogazione, formato)
\ No newline at end of file
@@ -1,4 +1,5 @@
 import logging
+import os
 from pathlib import Path
 
 # --- Percorsi Base ---
@@ -44,6 +45,20 @@ colonna_media_nazionale_variazione_percentuale_occupazione = "Media_Nazionale_Va
 tabella_medie_macroaree_occupazione_pesca = "Medie_Macroaree_Andamento_Occupazione_Pesca"
 colonna_media_macroarea_variazione_percentuale_occupazione = "Media_Macroarea_Variazione_Percentuale_Occupazione"
 
+# --- Metadati ---
+
+tabella_versioni_dati = "_versioni_dati"  # Versione dei dati di ogni tabella, incrementata a ogni scrittura.
+tabella_file_importati = "_file_importati"  # Hash, dimensione e data di modifica dei CSV già importati.
+tabella_dim_regioni = "_dim_regioni"  # Codice, nome e macro area di ogni regione, generata da 'macro_aree'.
+tabella_dim_macro_aree = "_dim_macro_aree"  # Codice e nome di ogni macro area, generata da 'macro_aree'.
+tabella_pipeline_impronte = "_pipeline_impronte"  # Impronta dell'ultima esecuzione riuscita di ogni nodo.
+tabella_serie_parziali = "_serie_parziali"  # Somme e conteggi per (Anno, Macro Area) delle serie materializzate.
+
+# --- Calcolo Serie ---
+
+# Dove vengono eseguite le aggregazioni delle serie calcolate: "pandas" (in memoria) oppure "sql" (in SQLite).
+serie_backend = "pandas"
+
 # --- Macro-Aree ---
 macro_aree = {
     'Valle d\'Aosta': 'Nord-ovest', 'Piemonte': 'Nord-ovest', 'Liguria': 'Nord-ovest', 'Lombardia': 'Nord-ovest',
@@ -54,6 +69,76 @@ macro_aree = {
     'Sicilia': 'Isole', 'Sardegna': 'Isole'
 }
 
+# --- Importazione ---
+
+import_chunk_size = 10_000  # Righe lette e scritte per ogni blocco nell'importazione in streaming.
+import_workers = 1  # Processi usati per analizzare i CSV in parallelo (1 = importazione sequenziale).
+
+# --- Pipeline ---
+
+pipeline_workers = 4  # Thread usati per eseguire in parallelo i nodi indipendenti della pipeline.
+
+# --- Snapshot ---
+
+snapshot_dir = PRJ_ROOT / "snapshot"  # Cartella dello snapshot colonnare dell'intero dataset.
+# Se True, API e calcolo delle serie leggono le tabelle dallo snapshot mappato in memoria quando è aggiornato,
+# altrimenti (o se lo snapshot manca o è obsoleto) leggono da SQLite.
+usa_snapshot = False
+
+# --- Grafici ---
+
+grafici_dir = PRJ_ROOT / "grafici"  # Cartella in cui vengono scritti i grafici generati in modalità batch.
+grafici_formati = ("html",)  # Formati dei file: "json", "html", "png", "svg" (png e svg richiedono kaleido).
+grafici_workers = 4  # Processi usati per generare i grafici in parallelo.
+
+# --- Pool Connessioni API ---
+
+db_pool_size = 8  # Numero di connessioni in sola lettura aperte all'avvio dell'API.
+db_pool_timeout = 5.0  # Secondi di attesa massima per ottenere una connessione libera.
+db_mmap_size = 256 * 1024 * 1024  # Byte del file mappati in memoria da ogni connessione.
+db_cache_size_kib = 16 * 1024  # Dimensione della page cache di ogni connessione, in KiB.
+# Thread dedicati alle letture dagli endpoint asincroni. Non supera la dimensione del pool,
+# così ogni thread trova sempre una connessione libera.
+db_executor_workers = db_pool_size
+
+# --- Cache Risposte API ---
+
+api_cache_max_entries = 256  # Numero massimo di risposte serializzate mantenute in memoria.
+api_cache_ttl = 3600  # Secondi dopo i quali una risposta in cache viene comunque ricalcolata.
+api_plot_cache_max_entries = 64  # Numero massimo di grafici già generati mantenuti in memoria dall'API.
+
+# --- Cache HTTP ---
+
+# Intestazione Cache-Control delle risposte con i dati: i client possono riusarle per 'max-age' secondi,
+# poi le rivalidano con If-None-Match / If-Modified-Since e ricevono un 304 se i dati non sono cambiati.
+api_cache_control = "public, max-age=60"
+
+# --- Serializzazione API ---
+
+api_fast_json = True  # Se False, le risposte vengono costruite con pandas (percorso precedente).
+api_json_batch_size = 1000  # Righe lette dal cursore e codificate in JSON per ogni blocco.
+
+# --- Compressione HTTP ---
+
+api_compressione = True  # Se False, le risposte vengono sempre inviate senza compressione.
+api_compressione_min_byte = 1024  # Le risposte più piccole non vengono compresse al volo: il guadagno è minimo.
+# Livelli delle risposte compresse al volo a ogni richiesta: privilegiano la velocità.
+api_livelli_compressione = {"gzip": 6, "br": 4, "zstd": 3}
+# Livelli delle varianti compresse salvate nella cache delle risposte: sono calcolate una volta sola
+# per versione dei dati, quindi possono privilegiare la dimensione.
+api_livelli_compressione_cache = {"gzip": 9, "br": 11, "zstd": 19}
+
+# --- Server API ---
+
+api_host = "127.0.0.1"  # Indirizzo su cui il server resta in ascolto ("0.0.0.0" per tutte le interfacce).
+api_port = 8000
+# Processi worker in modalità produzione: ognuno ha pool di connessioni e cache proprie.
+api_workers = os.cpu_count() or 1
+api_timeout_keep_alive = 5  # Secondi di attesa di una nuova richiesta su una connessione keep-alive.
+# Risorse (nomi nell'URL, vedi src.api.risorse) lette e messe in cache all'avvio di ogni worker,
+# prima che accetti richieste. None indica tutte le serie calcolate e le tabelle originali.
+api_risorse_riscaldamento = None
+
 # --- Logging ---
 
 log_dir_name = "logs"
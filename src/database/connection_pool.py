@@ -0,0 +1,164 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.configurations import config
+from src.logging.log_setup import get_logger
+
+# Inizializza il logger per questo modulo, per registrare eventi e errori.
+logger = get_logger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """
+    Sollevata quando nessuna connessione si libera entro il tempo massimo di attesa.
+    """
+
+
+class SQLiteConnectionPool:
+    """
+    Pool di connessioni SQLite in sola lettura, pensato per essere condiviso dall'API.
+
+    Le connessioni vengono aperte una sola volta (in modalità 'mode=ro') e riutilizzate
+    tra le richieste, evitando di pagare apertura del file e configurazione a ogni chiamata.
+    """
+
+    def __init__(self, db_path: Path, pool_size: int = config.db_pool_size,
+                 timeout: float = config.db_pool_timeout):
+        self.db_path = Path(db_path)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        # Coda thread-safe che contiene le connessioni libere.
+        self._idle: queue.Queue = queue.Queue(maxsize=pool_size)
+        # Lock che protegge l'apertura del pool e l'aggiornamento delle metriche.
+        self._lock = threading.Lock()
+        self._opened = False
+        # Generazione del pool, incrementata a ogni chiusura, e generazione di ogni connessione prelevata:
+        # una connessione restituita dopo la chiusura (o dopo una riapertura) va chiusa, non rimessa in coda.
+        self._generation = 0
+        self._checked_out: dict[sqlite3.Connection, int] = {}
+        # Metriche di utilizzo del pool.
+        self._checkouts = 0
+        self._timeouts = 0
+        self._in_use = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def open(self):
+        """
+        Apre tutte le connessioni del pool. Se il database non esiste solleva FileNotFoundError.
+        """
+        with self._lock:
+            if self._opened:
+                return
+            if not self.db_path.exists():
+                raise FileNotFoundError(self.db_path)
+
+            # Il journal WAL è una proprietà persistente del file: va impostato con una connessione
+            # in scrittura, dopodiché le connessioni in sola lettura non bloccano più gli scrittori.
+            conn = sqlite3.connect(self.db_path)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+            finally:
+                conn.close()
+
+            for _ in range(self.pool_size):
+                self._idle.put_nowait(self._connect())
+            self._opened = True
+            logger.info(f"Pool di {self.pool_size} connessioni in sola lettura aperto su '{self.db_path}'.")
+
+    def _connect(self) -> sqlite3.Connection:
+        # 'mode=ro' apre il file in sola lettura; check_same_thread=False consente di usare la
+        # connessione nei thread del server, dato che il pool garantisce un solo utilizzatore alla volta.
+        uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size={config.db_mmap_size}")
+        conn.execute(f"PRAGMA cache_size=-{config.db_cache_size_kib}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA query_only=1")
+        return conn
+
+    def checkout(self) -> sqlite3.Connection:
+        """
+        Preleva una connessione dal pool, attendendo al massimo 'timeout' secondi.
+        """
+        if not self._opened:
+            self.open()
+
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            logger.error(f"Nessuna connessione libera nel pool entro {self.timeout} secondi.")
+            raise PoolTimeoutError(f"Pool di connessioni esaurito dopo {self.timeout} secondi di attesa.")
+        waited = time.perf_counter() - start
+
+        with self._lock:
+            self._checked_out[conn] = self._generation
+            self._checkouts += 1
+            self._in_use += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """
+        Restituisce una connessione al pool. Se nel frattempo il pool è stato chiuso la connessione viene chiusa.
+        """
+        # Chiude un'eventuale transazione di lettura rimasta aperta, così da non trattenere lo snapshot WAL.
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+            generation = self._checked_out.pop(conn, None)
+            if self._opened and generation == self._generation:
+                self._idle.put_nowait(conn)
+                return
+        # Prelevata prima di una chiusura: la coda appartiene ormai a un'altra generazione di connessioni.
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager che preleva una connessione e la restituisce al termine del blocco.
+        """
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """
+        Chiude tutte le connessioni libere del pool; quelle in uso vengono chiuse quando sono restituite.
+        """
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._opened = False
+            self._generation += 1
+        logger.info("Pool di connessioni chiuso.")
+
+    def stats(self) -> dict:
+        """
+        Restituisce le metriche di utilizzo del pool.
+        """
+        with self._lock:
+            return {
+                "dimensione": self.pool_size,
+                "aperto": self._opened,
+                "in_uso": self._in_use,
+                "libere": self._idle.qsize(),
+                "checkout_totali": self._checkouts,
+                "timeout": self._timeouts,
+                "attesa_media_ms": round(self._total_wait / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "attesa_massima_ms": round(self._max_wait * 1000, 3),
+            }
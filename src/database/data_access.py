@@ -0,0 +1,310 @@
+import sqlite3
+from contextlib import closing, contextmanager, nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.configurations import config
+from src.database.dimensioni import DIMENSIONI, MACRO_AREE, REGIONI, select_decodificata
+from src.database.dimensioni import decodifica as decodifica_dimensioni
+from src.database.schema import SCHEMAS
+from src.database.snapshot import carica_tabella_se_aggiornata
+from src.logging.log_setup import get_logger
+
+# pyarrow è una dipendenza opzionale: serve solo per restituire i risultati come tabelle Arrow.
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Inizializza il logger per questo modulo, per registrare eventi e errori.
+logger = get_logger(__name__)
+
+# Prefisso delle colonne di ordinamento aggiunte in coda alle righe di una pagina, per costruire il cursore.
+PREFISSO_CHIAVE = "__chiave_"
+
+
+@dataclass(frozen=True)
+class Interrogazione:
+    """
+    Parametri di lettura di una tabella: filtri, proiezione, ordinamento e paginazione per chiave (keyset).
+    Il valore predefinito legge l'intera tabella. È immutabile e confrontabile, quindi usabile come chiave di cache.
+    """
+    da_anno: int | None = None
+    a_anno: int | None = None
+    # Nomi delle regioni e delle macro aree da includere (vuoto = tutte).
+    regioni: tuple[str, ...] = ()
+    macro_aree: tuple[str, ...] = ()
+    # Colonne da restituire, nell'ordine indicato (vuoto = tutte).
+    colonne: tuple[str, ...] = ()
+    # Colonne di ordinamento; il prefisso "-" indica l'ordine decrescente.
+    ordina: tuple[str, ...] = ()
+    # Numero massimo di righe, e valori delle colonne di ordinamento dell'ultima riga della pagina precedente.
+    limit: int | None = None
+    after: tuple | None = None
+
+    @property
+    def paginata(self) -> bool:
+        return self.limit is not None or self.after is not None
+
+    @property
+    def solo_anni(self) -> bool:
+        # Solo filtri per anno e proiezione: la lettura può essere servita dallo snapshot colonnare.
+        return not (self.regioni or self.macro_aree or self.ordina or self.paginata)
+
+
+def valida_intervallo_anni(da_anno: int | None, a_anno: int | None):
+    """
+    Solleva ValueError se entrambi gli anni sono indicati e l'anno di fine precede quello di inizio.
+    """
+    if da_anno is not None and a_anno is not None and a_anno < da_anno:
+        raise ValueError("'a_anno' deve essere maggiore o uguale a 'da_anno'.")
+
+
+def colonne_ordinamento(table_name: str, interrogazione: Interrogazione) -> list[tuple[str, bool]]:
+    """
+    Restituisce le colonne di ordinamento (nome, decrescente) della lettura. Le pagine sono sempre ordinate
+    in modo totale: le colonne della chiave primaria non indicate vengono aggiunte in coda, in ordine crescente.
+    Senza ordinamento né paginazione restituisce una lista vuota (ordine naturale della tabella).
+    """
+    ordine = [(col.removeprefix("-"), col.startswith("-")) for col in interrogazione.ordina]
+    if interrogazione.paginata and table_name in SCHEMAS:
+        indicate = {col for col, _ in ordine}
+        ordine += [(col, False) for col in SCHEMAS[table_name].primary_key if col not in indicate]
+    return ordine
+
+
+def valida_interrogazione(table_name: str, interrogazione: Interrogazione):
+    """
+    Controlla i parametri della lettura rispetto allo schema della tabella e ai nomi di regioni e macro aree
+    di config.py. Solleva ValueError con un messaggio rivolto al client.
+    """
+    valida_intervallo_anni(interrogazione.da_anno, interrogazione.a_anno)
+    if table_name not in SCHEMAS:
+        if not interrogazione.solo_anni or interrogazione.colonne:
+            raise ValueError(f"La tabella '{table_name}' supporta solo i filtri per anno.")
+        return
+    column_names = SCHEMAS[table_name].column_names
+
+    richieste = interrogazione.colonne + tuple(col.removeprefix("-") for col in interrogazione.ordina)
+    sconosciute = [col for col in richieste if col not in column_names]
+    if sconosciute:
+        raise ValueError(f"Colonne sconosciute: {sconosciute}. Colonne disponibili: {column_names}.")
+    if interrogazione.regioni:
+        if config.colonna_regione not in column_names:
+            raise ValueError(f"Il filtro per regione non si applica alla tabella '{table_name}'.")
+        sconosciute = [regione for regione in interrogazione.regioni if regione not in REGIONI]
+        if sconosciute:
+            raise ValueError(f"Regioni sconosciute: {sconosciute}. Regioni disponibili: {REGIONI}.")
+    if interrogazione.macro_aree:
+        if config.colonna_regione not in column_names and config.colonna_macro_area not in column_names:
+            raise ValueError(f"Il filtro per macro area non si applica alla tabella '{table_name}'.")
+        sconosciute = [macro_area for macro_area in interrogazione.macro_aree if macro_area not in MACRO_AREE]
+        if sconosciute:
+            raise ValueError(f"Macro aree sconosciute: {sconosciute}. Macro aree disponibili: {MACRO_AREE}.")
+    if interrogazione.limit is not None and interrogazione.limit < 1:
+        raise ValueError("'limit' deve essere almeno 1.")
+    if interrogazione.after is not None and \
+            len(interrogazione.after) != len(colonne_ordinamento(table_name, interrogazione)):
+        raise ValueError("Il cursore 'after' non corrisponde all'ordinamento richiesto.")
+
+
+def _condizione_dopo(ordine: list[tuple[str, bool]], valori: tuple, params: dict, non_null: set[str]) -> str:
+    # Righe successive al cursore nell'ordine indicato.
+    if all(col in non_null for col, _ in ordine) and len({decrescente for _, decrescente in ordine}) == 1:
+        # Colonne senza NULL nella stessa direzione (es. la chiave primaria): il confronto tra row value
+        # permette a SQLite di posizionarsi direttamente nell'indice invece di scorrerlo dall'inizio.
+        params.update({f"dopo_{i}": valore for i, valore in enumerate(valori)})
+        colonne = ", ".join(f't."{col}"' for col, _ in ordine)
+        segnaposto = ", ".join(f":dopo_{i}" for i in range(len(ordine)))
+        return f"({colonne}) {'<' if ordine[0][1] else '>'} ({segnaposto})"
+
+    # Caso generale: (c1 dopo v1) OR (c1 = v1 AND c2 dopo v2) OR ...
+    # SQLite ordina i NULL come i valori più piccoli, e nelle colonne dei valori possono esserci NULL.
+    alternative = []
+    for i, (col, decrescente) in enumerate(ordine):
+        uguali = [f't."{c}" IS :dopo_{j}' for j, (c, _) in enumerate(ordine[:i])]
+        if valori[i] is None:
+            # Dopo un NULL vengono i valori non NULL in ordine crescente, nessuno in ordine decrescente.
+            dopo = "0" if decrescente else f't."{col}" IS NOT NULL'
+        elif decrescente:
+            dopo = f'(t."{col}" < :dopo_{i} OR t."{col}" IS NULL)'
+        else:
+            dopo = f't."{col}" > :dopo_{i}'
+        alternative.append("(" + " AND ".join(uguali + [dopo]) + ")")
+        params[f"dopo_{i}"] = valori[i]
+    return "(" + " OR ".join(alternative) + ")"
+
+
+def costruisci_query(table_name: str, interrogazione: Interrogazione = Interrogazione(), decodifica: bool = True,
+                     chiavi: bool = False) -> tuple[str, dict]:
+    """
+    Costruisce la SELECT della lettura richiesta e i relativi parametri, dopo averla validata (ValueError).
+    Con 'decodifica' le colonne dimensione vengono risolte nei nomi direttamente da SQLite (per chi serializza
+    le righe così come sono, es. l'API); altrimenti restano codici interi. I filtri su regioni e macro aree
+    diventano condizioni sui codici, che usano gli indici sulle colonne Regione e Macro Area.
+
+    Con 'chiavi', per le letture paginate, in coda a ogni riga vengono aggiunte le colonne di ordinamento
+    (prefisso PREFISSO_CHIAVE) e viene letta una riga oltre il limite: servono a costruire il cursore
+    della pagina successiva e a sapere se esiste.
+    """
+    valida_interrogazione(table_name, interrogazione)
+    ordine = colonne_ordinamento(table_name, interrogazione)
+    altre = [f't."{col}" AS "{PREFISSO_CHIAVE}{i}"' for i, (col, _) in enumerate(ordine)] if chiavi else []
+    if table_name in SCHEMAS:
+        colonne = list(interrogazione.colonne) or SCHEMAS[table_name].column_names
+        if decodifica:
+            query = select_decodificata(table_name, colonne, altre)
+        else:
+            columns_sql = ", ".join([f't."{col}"' for col in colonne] + altre)
+            query = f'SELECT {columns_sql} FROM "{table_name}" AS t'
+    else:
+        query = f'SELECT * FROM "{table_name}" AS t'
+    conditions = []  # Lista per memorizzare le condizioni del filtro (clausola WHERE).
+    params = {}  # Dizionario per i parametri della query, per prevenire attacchi di SQL injection.
+
+    if interrogazione.da_anno is not None:
+        conditions.append(f't."{config.colonna_anno}" >= :da_anno')
+        params['da_anno'] = interrogazione.da_anno
+    if interrogazione.a_anno is not None:
+        conditions.append(f't."{config.colonna_anno}" <= :a_anno')
+        params['a_anno'] = interrogazione.a_anno
+
+    # I codici di regioni e macro aree sono fissi (posizione in ordine alfabetico): nessuna lettura delle dimensioni.
+    codici = {}
+    if interrogazione.regioni:
+        codici[config.colonna_regione] = {REGIONI.index(regione) for regione in interrogazione.regioni}
+    if interrogazione.macro_aree:
+        if config.colonna_macro_area in SCHEMAS[table_name].column_names:
+            codici[config.colonna_macro_area] = {MACRO_AREE.index(area) for area in interrogazione.macro_aree}
+        else:
+            # Le tabelle per regione vengono filtrate sulle regioni delle macro aree richieste.
+            regioni = {codice for codice, regione in enumerate(REGIONI)
+                       if config.macro_aree[regione] in interrogazione.macro_aree}
+            codici[config.colonna_regione] = codici.get(config.colonna_regione, regioni) & regioni
+    for col, valori in codici.items():
+        nomi_parametri = [f"{col.replace(' ', '_').lower()}_{i}" for i in range(len(valori))]
+        # Con filtri su regione e macro area incompatibili l'insieme è vuoto: "IN (NULL)" non seleziona nulla.
+        conditions.append(f't."{col}" IN ({", ".join(f":{nome}" for nome in nomi_parametri) or "NULL"})')
+        params.update(zip(nomi_parametri, sorted(valori)))
+
+    if interrogazione.after is not None:
+        non_null = {name for name, sql_type in SCHEMAS[table_name].columns if "NOT NULL" in sql_type}
+        conditions.append(_condizione_dopo(ordine, interrogazione.after, params, non_null))
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if ordine:
+        # I codici delle dimensioni seguono l'ordine alfabetico dei nomi: ordinare per codice equivale.
+        query += " ORDER BY " + ", ".join(f't."{col}"{" DESC" if decrescente else ""}' for col, decrescente in ordine)
+    if interrogazione.limit is not None:
+        query += " LIMIT :limit"
+        params['limit'] = interrogazione.limit + 1 if chiavi else interrogazione.limit
+
+    logger.debug(f"Query costruita: {query} con parametri: {params}")
+    return query, params
+
+
+def _leggi_snapshot(table_name: str, interrogazione: Interrogazione,
+                    conn: sqlite3.Connection) -> pd.DataFrame | None:
+    # Legge la tabella dallo snapshot mappato in memoria, se aggiornato; None per leggere da SQLite.
+    df = carica_tabella_se_aggiornata(table_name, conn)
+    if df is None:
+        return None
+    da_anno, a_anno = interrogazione.da_anno, interrogazione.a_anno
+    anni = df[config.colonna_anno]
+    mask = pd.Series(True, index=df.index)
+    if da_anno is not None:
+        mask &= anni >= da_anno
+    if a_anno is not None:
+        mask &= anni <= a_anno
+    df = df[mask]
+    # Con un filtro per anno SQLite scorre l'indice della chiave primaria: stesso ordine delle righe.
+    if (da_anno is not None or a_anno is not None) and table_name in SCHEMAS:
+        df = df.sort_values(list(SCHEMAS[table_name].primary_key), kind="stable")
+    df = df[list(interrogazione.colonne)] if interrogazione.colonne else df
+    return df.reset_index(drop=True)
+
+
+def leggi_tabella(table_name: str, interrogazione: Interrogazione = Interrogazione(),
+                  conn: sqlite3.Connection | None = None, decodifica: bool = True) -> pd.DataFrame:
+    """
+    Legge una tabella in un DataFrame secondo i parametri dell'interrogazione (filtri, proiezione,
+    ordinamento, limite), nello stesso ordine di righe della SELECT su SQLite. Con 'decodifica' le colonne
+    dimensione (Regione, Macro Area) sono Categorical con i nomi, altrimenti restano codici interi.
+    Se abilitato e aggiornato, le letture filtrate solo per anno vengono servite dallo snapshot colonnare.
+
+    Se viene passata una connessione la usa direttamente, altrimenti ne apre una solo per questa lettura.
+    Solleva ValueError per parametri non validi, FileNotFoundError se il database non esiste
+    e sqlite3.Error / pandas DatabaseError per gli errori di lettura.
+    """
+    valida_interrogazione(table_name, interrogazione)
+    db_path = Path(config.DB_DIR)
+    if conn is None and not db_path.exists():
+        raise FileNotFoundError(f"Database non trovato al percorso: {db_path}")
+
+    # 'closing' garantisce che solo la connessione aperta qui venga chiusa alla fine del blocco.
+    with (nullcontext(conn) if conn is not None else closing(sqlite3.connect(db_path))) as conn:
+        df = None
+        if config.usa_snapshot and interrogazione.solo_anni:
+            df = _leggi_snapshot(table_name, interrogazione, conn)
+        if df is not None:
+            if not decodifica:
+                # I codici del Categorical dello snapshot coincidono con quelli memorizzati nel database.
+                df = df.assign(**{col: df[col].cat.codes.astype(np.int64)
+                                  for col in df.columns if col in DIMENSIONI})
+            return df
+
+        # Le colonne dimensione vengono lette come codici e decodificate in pandas, senza join in SQLite.
+        query, params = costruisci_query(table_name, interrogazione, decodifica=False)
+        df = pd.read_sql_query(query, conn, params=params)
+        return decodifica_dimensioni(conn, df) if decodifica else df
+
+
+@contextmanager
+def transazione_lettura(conn: sqlite3.Connection):
+    """
+    Esegue le letture del blocco in un'unica transazione: in modalità WAL vedono tutte lo stesso stato
+    del database, anche se nel frattempo un'importazione o un calcolo scrivono nuovi dati.
+    Se la connessione è già in una transazione, il blocco ne fa parte.
+    """
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        # Nessuna scrittura da confermare: il rollback chiude la transazione e rilascia lo snapshot.
+        conn.rollback()
+
+
+def tipi_arrow(table_name: str) -> dict:
+    """
+    Restituisce il tipo Arrow di ogni colonna della tabella, dallo schema dichiarato: le colonne dimensione
+    (nomi di regioni e macro aree) sono di tipo dictionary. Vuoto per le tabelle senza schema (tipi dedotti).
+    Richiede pyarrow.
+    """
+    if pa is None:
+        raise ImportError("I tipi Arrow richiedono il pacchetto 'pyarrow'.")
+    if table_name not in SCHEMAS:
+        return {}
+    tipi = {}
+    for name, sql_type in SCHEMAS[table_name].columns:
+        if name in DIMENSIONI:
+            tipi[name] = pa.dictionary(pa.int32(), pa.string())
+        else:
+            tipi[name] = pa.int64() if sql_type.startswith("INTEGER") else pa.float64()
+    return tipi
+
+
+def leggi_tabella_arrow(table_name: str, interrogazione: Interrogazione = Interrogazione(),
+                        conn: sqlite3.Connection | None = None) -> "pa.Table":
+    """
+    Come leggi_tabella, ma restituisce una tabella Arrow (le colonne dimensione diventano colonne dictionary).
+    Richiede pyarrow.
+    """
+    if pa is None:
+        raise ImportError("La lettura in formato Arrow richiede il pacchetto 'pyarrow'.")
+    return pa.Table.from_pandas(leggi_tabella(table_name, interrogazione, conn), preserve_index=False)
@@ -0,0 +1,118 @@
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src.configurations import config
+from src.logging.log_setup import get_logger
+
+# Inizializza il logger per questo modulo, per registrare eventi e errori.
+logger = get_logger(__name__)
+
+
+def _crea_tabella_versioni(conn: sqlite3.Connection):
+    # Crea la tabella dei metadati solo se non esiste già.
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{config.tabella_versioni_dati}" ('
+        '"tabella" TEXT PRIMARY KEY, '
+        '"versione" INTEGER NOT NULL, '
+        '"aggiornato_il" TEXT NOT NULL)'
+    )
+
+
+def bump_data_version(conn: sqlite3.Connection, table_names: list[str]):
+    """
+    Incrementa la versione dei dati delle tabelle indicate.
+    Va chiamata da ogni script che scrive nel database, nella stessa transazione della scrittura.
+    """
+    _crea_tabella_versioni(conn)
+    # Timestamp UTC dell'aggiornamento, usato anche per l'intestazione HTTP Last-Modified.
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    conn.executemany(
+        f'INSERT INTO "{config.tabella_versioni_dati}" ("tabella", "versione", "aggiornato_il") VALUES (?, 1, ?) '
+        'ON CONFLICT("tabella") DO UPDATE SET "versione" = "versione" + 1, "aggiornato_il" = excluded."aggiornato_il"',
+        [(table_name, now) for table_name in table_names]
+    )
+    logger.debug(f"Versione dati incrementata per le tabelle: {table_names}")
+
+
+def get_data_version(conn: sqlite3.Connection, table_name: str) -> int:
+    """
+    Restituisce la versione corrente dei dati di una tabella (0 se non è mai stata registrata).
+    """
+    return get_data_version_record(conn, table_name)[0]
+
+
+def get_data_version_record(conn: sqlite3.Connection, table_name: str) -> tuple[int, str | None]:
+    """
+    Restituisce versione e data di aggiornamento (ISO, UTC) dei dati di una tabella, (0, None) se la versione
+    non è mai stata registrata. Un database ricreato riparte dalla versione 1: la data distingue le due storie.
+    """
+    try:
+        row = conn.execute(
+            f'SELECT "versione", "aggiornato_il" FROM "{config.tabella_versioni_dati}" WHERE "tabella" = ?',
+            (table_name,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # La tabella dei metadati non esiste ancora (database creato prima del versionamento).
+        return 0, None
+    return (row[0], row[1]) if row else (0, None)
+
+
+class DataVersionCache:
+    """
+    Versioni dei dati di tutte le tabelle mantenute in memoria, per l'API.
+
+    Le versioni vengono rilette, con una sola query, solo quando cambiano dimensione o data di modifica del file
+    del database o del suo WAL: ogni scrittura di importazione, post-processing o calcolo modifica uno dei due,
+    le letture no. Tra una scrittura e l'altra la versione di una tabella costa due stat(), senza query.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._wal_path = self.db_path.with_name(f"{self.db_path.name}-wal")
+        self._lock = threading.Lock()
+        # Firma dei file con cui sono state lette le versioni memorizzate.
+        self._firma = None
+        self._versioni: dict[str, tuple[int, str]] = {}
+
+    def _firma_file(self) -> tuple:
+        firma = []
+        for path in (self.db_path, self._wal_path):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Il WAL non esiste quando il database non è aperto in modalità WAL o è stato appena chiuso.
+                firma.append(None)
+                continue
+            firma.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(firma)
+
+    def _leggi_versioni(self) -> dict[str, tuple[int, str]]:
+        uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+        with closing(sqlite3.connect(uri, uri=True)) as conn:
+            try:
+                rows = conn.execute(
+                    f'SELECT "tabella", "versione", "aggiornato_il" FROM "{config.tabella_versioni_dati}"'
+                ).fetchall()
+            except sqlite3.OperationalError:
+                # La tabella dei metadati non esiste ancora (database creato prima del versionamento).
+                return {}
+        logger.debug(f"Versioni dei dati rilette dal database: {len(rows)} tabelle.")
+        return {tabella: (versione, aggiornato_il) for tabella, versione, aggiornato_il in rows}
+
+    def get(self, table_name: str) -> tuple[int, str | None] | None:
+        """
+        Restituisce versione e data di aggiornamento (ISO, UTC) dei dati di una tabella: (0, None) se la
+        versione non è mai stata registrata, None se il database non esiste.
+        """
+        # La firma viene letta prima delle versioni: una scrittura concorrente provoca al più una rilettura in più.
+        firma = self._firma_file()
+        if firma[0] is None:
+            return None
+        with self._lock:
+            if firma != self._firma:
+                self._versioni = self._leggi_versioni()
+                self._firma = firma
+            return self._versioni.get(table_name, (0, None))
@@ -4,18 +4,337 @@ from pathlib import Path
 import sqlite3
 # - pandas per la manipolazione e l'analisi dei dati, in particolare per leggere i file CSV.
 import pandas as pd
+# - hashlib e io per calcolare l'impronta dei file CSV e leggerne solo le righe aggiunte (importazione incrementale).
+import hashlib
+import io
+# - csv e time per la lettura a blocchi dei file e la misura del throughput.
+import csv
+import time
+from typing import BinaryIO, Iterator
+# - ProcessPoolExecutor per analizzare più file CSV in parallelo.
+from concurrent.futures import ProcessPoolExecutor, as_completed
+# - datetime per registrare il momento dell'importazione.
+from datetime import datetime, timezone
+# - closing per chiudere la connessione dedicata all'importazione di un singolo file
+#   e contextmanager per aprire un CSV a partire dalle righe aggiunte.
+from contextlib import closing, contextmanager
 
 # Importa l'oggetto di configurazione per accedere a percorsi e nomi di tabella.
 from src.configurations import config
+# Importa la funzione che segnala l'aggiornamento dei dati di una tabella (usata dalla cache dell'API).
+from src.database.data_version import bump_data_version
+# Importa la codifica dei nomi delle regioni nei codici interi della tabella dimensione.
+from src.database.dimensioni import codifica, codifica_righe
+# Importa gli schemi dichiarati delle tabelle e le funzioni per scriverle con chiavi e indici.
+from src.database.schema import (SCHEMAS, TableSchema, atomic, column_converters, create_table, dataframe_rows,
+                                 insert_rows, tabella_obsoleta, upsert_rows, write_dataframe)
 # Importa la funzione per ottenere un'istanza del logger.
 from src.logging.log_setup import get_logger
+# Importa la funzione che ricostruisce le serie materializzate quando una tabella di input viene ricreata.
+from src.serie_calcolate.materialized import aggiorna_materializzazione
 
 # Inizializza il logger per questo modulo, per registrare eventi e errori.
 logger = get_logger(__name__)
 
 
+def _file_sha256(csv_file_path: Path) -> str:
+    # Calcola l'hash SHA-256 del file leggendolo a blocchi, senza caricarlo interamente in memoria.
+    digest = hashlib.sha256()
+    with open(csv_file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_import_metadata(conn: sqlite3.Connection) -> dict:
+    # Crea la tabella dei metadati se non esiste e restituisce le informazioni registrate per ogni file.
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{config.tabella_file_importati}" ('
+        '"file" TEXT PRIMARY KEY, "tabella" TEXT NOT NULL, "sha256" TEXT NOT NULL, '
+        '"dimensione" INTEGER NOT NULL, "mtime" REAL NOT NULL, "importato_il" TEXT NOT NULL)'
+    )
+    rows = conn.execute(f'SELECT "file", "sha256", "dimensione", "mtime" FROM "{config.tabella_file_importati}"')
+    return {file: (sha256, size, mtime) for file, sha256, size, mtime in rows}
+
+
+def _save_import_metadata(conn: sqlite3.Connection, csv_file_path: Path, table_name: str, sha256: str):
+    # Registra hash, dimensione e data di modifica del file appena importato.
+    stat = csv_file_path.stat()
+    conn.execute(
+        f'INSERT OR REPLACE INTO "{config.tabella_file_importati}" '
+        '("file", "tabella", "sha256", "dimensione", "mtime", "importato_il") VALUES (?, ?, ?, ?, ?, ?)',
+        (csv_file_path.name, table_name, sha256, stat.st_size, stat.st_mtime,
+         datetime.now(timezone.utc).isoformat(timespec="seconds"))
+    )
+
+
+def _appended_offset(csv_file_path: Path, old_sha256: str, old_size: int) -> int | None:
+    """
+    Se il file è cresciuto solo in coda (i primi 'old_size' byte hanno ancora l'hash registrato)
+    restituisce la posizione da cui iniziano le righe aggiunte, altrimenti None (il file va reimportato per intero).
+    """
+    if csv_file_path.stat().st_size <= old_size:
+        return None
+
+    with open(csv_file_path, "rb") as f:
+        header = f.readline()
+        # Ricalcola l'hash della parte già importata, includendo l'intestazione appena letta.
+        digest = hashlib.sha256(header)
+        remaining = old_size - len(header)
+        last_byte = header[-1:]
+        while remaining > 0:
+            block = f.read(min(remaining, 1024 * 1024))
+            if not block:
+                return None
+            digest.update(block)
+            remaining -= len(block)
+            last_byte = block[-1:]
+        # L'ultima riga importata deve essere completa, altrimenti i nuovi byte la modificano.
+        if digest.hexdigest() != old_sha256 or last_byte != b"\n":
+            return None
+    return old_size
+
+
+class _CodaCSV(io.RawIOBase):
+    # File binario in sola lettura: l'intestazione del CSV seguita dal contenuto del file da 'offset' in poi.
+    # Le righe aggiunte vengono lette a blocchi dal disco, senza copiarle in memoria.
+
+    def __init__(self, f: BinaryIO, header: bytes, offset: int):
+        self._f = f
+        self._header = header
+        f.seek(offset)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._header:
+            n = min(len(buffer), len(self._header))
+            buffer[:n] = self._header[:n]
+            self._header = self._header[n:]
+            return n
+        return self._f.readinto(buffer)
+
+
+@contextmanager
+def _open_csv(csv_file_path: Path, offset: int | None = None) -> Iterator[BinaryIO]:
+    """
+    Apre il CSV in binario. Con 'offset' il file restituito contiene l'intestazione e le sole righe
+    aggiunte da quella posizione in poi (vedi _appended_offset).
+    """
+    with open(csv_file_path, "rb") as f:
+        if offset is None:
+            yield f
+            return
+        header = f.readline()
+        yield io.BufferedReader(_CodaCSV(f, header, offset))
+
+
+def _iter_csv_chunks(csv_file: BinaryIO, schema: TableSchema, chunk_size: int) -> Iterator[list[tuple]]:
+    """
+    Legge il CSV riga per riga con il modulo csv e restituisce blocchi di al massimo 'chunk_size' tuple,
+    già convertite nei tipi dichiarati dallo schema. La memoria usata non dipende dalla dimensione del file.
+    """
+    reader = csv.reader(io.TextIOWrapper(csv_file, encoding="utf-8", newline=""), delimiter=";")
+    header = next(reader)
+    # Posizione nel file di ogni colonna dello schema: l'ordine delle colonne nel CSV può essere diverso.
+    missing = [name for name in schema.column_names if name not in header]
+    if missing:
+        raise ValueError(f"Colonne mancanti nel file: {missing}")
+    positions = [header.index(name) for name in schema.column_names]
+    converters = column_converters(schema)
+
+    chunk = []
+    for line_number, record in enumerate(reader, start=2):
+        # Salta le righe vuote (es. a fine file).
+        if not record:
+            continue
+        try:
+            chunk.append(tuple(convert(record[position]) for convert, position in zip(converters, positions)))
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"Riga {line_number} non valida: {record} ({e})") from e
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_csv(conn: sqlite3.Connection, schema: TableSchema, csv_file: BinaryIO, streaming: bool,
+               upsert: bool) -> int:
+    """
+    Scrive il contenuto del CSV nella tabella (ricreandola, oppure con upsert) e restituisce le righe scritte.
+    """
+    if streaming:
+        # Modalità a blocchi: ogni blocco viene scritto con executemany, la transazione resta quella del chiamante.
+        if not upsert:
+            create_table(conn, schema)
+        rows_written = 0
+        for chunk in _iter_csv_chunks(csv_file, schema, config.import_chunk_size):
+            chunk = codifica_righe(conn, schema.column_names, chunk)
+            (upsert_rows if upsert else insert_rows)(conn, schema, chunk)
+            rows_written += len(chunk)
+        return rows_written
+
+    df = pd.read_csv(csv_file, delimiter=";")
+    # Le regioni vengono memorizzate come codici interi della tabella dimensione.
+    df[config.colonna_regione] = codifica(conn, config.colonna_regione, df[config.colonna_regione])
+    if upsert:
+        upsert_rows(conn, schema, dataframe_rows(df, schema.column_names))
+    else:
+        write_dataframe(conn, schema, df)
+    return len(df)
+
+
+def _plan_file(conn: sqlite3.Connection, csv_file_path: Path, table_name: str, incrementale: bool,
+               metadata: dict) -> tuple[str, str | None, int | None]:
+    """
+    Decide come importare un file: restituisce l'esito previsto ("saltato", "ricreata", "aggiornata"),
+    l'hash del file e, per gli aggiornamenti, la posizione nel file da cui iniziano le righe aggiunte.
+    """
+    # Una tabella creata con uno schema precedente (es. regioni testuali) va ricreata per intero.
+    if incrementale and csv_file_path.name in metadata and not tabella_obsoleta(conn, SCHEMAS[table_name]):
+        old_sha256, old_size, old_mtime = metadata[csv_file_path.name]
+        stat = csv_file_path.stat()
+        # Dimensione e data di modifica invariate: il file non è cambiato, non serve nemmeno calcolare l'hash.
+        if stat.st_size == old_size and stat.st_mtime == old_mtime:
+            return "saltato", None, None
+        sha256 = _file_sha256(csv_file_path)
+        # Il file è stato toccato ma il contenuto è identico: aggiorna solo i metadati.
+        if sha256 == old_sha256:
+            with atomic(conn):
+                _save_import_metadata(conn, csv_file_path, table_name, sha256)
+            return "saltato", None, None
+        # Il file ha solo guadagnato righe in coda (es. un nuovo anno): basta inserire quelle.
+        offset = _appended_offset(csv_file_path, old_sha256, old_size)
+        if offset is not None:
+            return "aggiornata", sha256, offset
+        return "ricreata", sha256, None
+
+    return "ricreata", _file_sha256(csv_file_path), None
+
+
+def _import_file(conn: sqlite3.Connection, csv_file_path: Path, table_name: str, incrementale: bool,
+                 streaming: bool, metadata: dict) -> tuple[str, int]:
+    """
+    Importa un singolo file CSV nella sua tabella e restituisce l'esito ("saltato", "aggiornata", "ricreata")
+    insieme al numero di righe scritte.
+    """
+    schema = SCHEMAS[table_name]
+    outcome, sha256, offset = _plan_file(conn, csv_file_path, table_name, incrementale, metadata)
+    if outcome == "saltato":
+        return outcome, 0
+
+    # Tutte le scritture del file avvengono in un'unica transazione.
+    with atomic(conn):
+        if outcome == "ricreata":
+            # La tabella viene ricreata secondo lo schema dichiarato (colonne tipizzate, chiave primaria
+            # su Anno e Regione, indici). Se la scrittura fallisce, 'atomic' ripristina la tabella precedente.
+            with open(csv_file_path, "rb") as csv_file:
+                rows_written = _write_csv(conn, schema, csv_file, streaming, upsert=False)
+            # La ricreazione elimina i trigger delle serie materializzate: vengono ricostruite e reinstallate.
+            aggiorna_materializzazione(conn, table_name)
+        else:
+            # Upsert sulla chiave (Anno, Regione): le righe nuove vengono inserite, quelle già presenti aggiornate.
+            # I trigger delle serie materializzate aggiornano solo i gruppi (Anno, Macro Area) toccati.
+            # Le righe aggiunte vengono lette direttamente dal file: in modalità streaming la memoria resta limitata.
+            with _open_csv(csv_file_path, offset) as csv_file:
+                rows_written = _write_csv(conn, schema, csv_file, streaming, upsert=True)
+            logger.info(f"Tabella '{table_name}': {rows_written} righe aggiunte in coda al file.")
+        # Incrementa la versione dei dati, così l'API scarta le risposte in cache della tabella.
+        bump_data_version(conn, [table_name])
+        _save_import_metadata(conn, csv_file_path, table_name, sha256)
+    return outcome, rows_written
+
+
+def _parse_rows(csv_file_path: Path, table_name: str, offset: int | None = None) -> list[tuple]:
+    """
+    Legge un CSV (per intero, o solo le righe aggiunte da 'offset' in poi) e restituisce le righe convertite
+    secondo lo schema. Viene eseguita nei processi del pool durante l'importazione parallela.
+    """
+    schema = SCHEMAS[table_name]
+    with _open_csv(csv_file_path, offset) as csv_file:
+        return [row for chunk in _iter_csv_chunks(csv_file, schema, config.import_chunk_size) for row in chunk]
+
+
+def _import_files_parallel(conn: sqlite3.Connection, files: list[tuple[Path, str]], incrementale: bool,
+                           workers: int, metadata: dict):
+    """
+    Analizza i file CSV in parallelo in un pool di processi e scrive i risultati con l'unica connessione
+    in scrittura (SQLite ammette un solo scrittore alla volta). Un file non valido non blocca gli altri.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for csv_file_path, table_name in files:
+            try:
+                # La decisione (salto, ricreazione o aggiornamento) legge il database: resta nel processo principale.
+                outcome, sha256, offset = _plan_file(conn, csv_file_path, table_name, incrementale, metadata)
+            except Exception as e:
+                logger.error(f"Errore durante l'importazione del file '{csv_file_path.name}': {e}", exc_info=True)
+                continue
+            if outcome == "saltato":
+                logger.info(f"File '{csv_file_path.name}' invariato dall'ultima importazione. File saltato.")
+                continue
+            future = executor.submit(_parse_rows, csv_file_path, table_name, offset)
+            futures[future] = (csv_file_path, table_name, outcome, sha256, time.perf_counter())
+
+        # Scrive i file nell'ordine in cui il loro parsing termina.
+        for future in as_completed(futures):
+            csv_file_path, table_name, outcome, sha256, submitted = futures[future]
+            schema = SCHEMAS[table_name]
+            try:
+                rows = future.result()
+                parsed = time.perf_counter()
+                with atomic(conn):
+                    rows = codifica_righe(conn, schema.column_names, rows)
+                    if outcome == "ricreata":
+                        create_table(conn, schema)
+                        insert_rows(conn, schema, rows)
+                        aggiorna_materializzazione(conn, table_name)
+                    else:
+                        upsert_rows(conn, schema, rows)
+                    bump_data_version(conn, [table_name])
+                    _save_import_metadata(conn, csv_file_path, table_name, sha256)
+                # Il tempo parte dall'invio al pool: comprende l'eventuale attesa di un processo libero.
+                elapsed = time.perf_counter() - submitted
+                logger.info(
+                    f"Dati da '{csv_file_path.name}' importati con successo nella tabella '{table_name}' "
+                    f"(tabella {outcome}): {len(rows)} righe in {elapsed:.3f} s, "
+                    f"{len(rows) / elapsed if elapsed > 0 else 0:.0f} righe/s "
+                    f"(lettura {parsed - submitted:.3f} s, scrittura {time.perf_counter() - parsed:.3f} s).")
+            except Exception as e:
+                logger.error(f"Errore durante l'importazione del file '{csv_file_path.name}': {e}", exc_info=True)
+
+
+def import_csv_file(csv_file_path: Path, table_name: str, incrementale: bool = True,
+                    streaming: bool = False) -> tuple[str, int]:
+    """
+    Importa un singolo file CSV nella sua tabella con una connessione dedicata e restituisce l'esito
+    ("saltato", "aggiornata", "ricreata") e le righe scritte. A differenza di csv_to_sql, gli errori
+    vengono propagati al chiamante (es. il runner della pipeline).
+    """
+    database_file_path = Path(config.DB_DIR)
+    database_file_path.parent.mkdir(parents=True, exist_ok=True)
+    with closing(sqlite3.connect(database_file_path)) as conn:
+        metadata = _load_import_metadata(conn)
+        start = time.perf_counter()
+        outcome, rows_written = _import_file(conn, Path(csv_file_path), table_name, incrementale, streaming, metadata)
+        logger.info(f"File '{Path(csv_file_path).name}' importato nella tabella '{table_name}' (tabella {outcome}): "
+                    f"{rows_written} righe in {time.perf_counter() - start:.3f} s.")
+        return outcome, rows_written
+
+
 # Definisce la funzione principale per importare i dati dai file CSV al database SQLite.
-def csv_to_sql():
+def csv_to_sql(incrementale: bool = False, streaming: bool = False, workers: int = 1):
+    """
+    Importa i file CSV della cartella dati nel database.
+    In modalità incrementale i file invariati (stesso hash) vengono saltati e quelli che hanno
+    solo righe aggiunte in coda vengono aggiornati con un upsert invece di ricreare la tabella.
+    In modalità streaming i file vengono letti e scritti a blocchi, con memoria costante.
+    Con 'workers' maggiore di 1 i file vengono analizzati in parallelo in un pool di processi
+    (in questa modalità ogni file viene letto per intero dal proprio processo e inviato al processo principale:
+    la memoria non è limitata, per cui con 'streaming' i processi vengono ignorati).
+    """
     # Ottiene il percorso della cartella contenente i file CSV dalla configurazione.
     data_source_dir = Path(config.DATA_DIR)
     # Ottiene il percorso del file del database dalla configurazione.
@@ -27,6 +346,13 @@ def csv_to_sql():
         logger.error(f"La cartella dei dati '{data_source_dir}' non esiste.")
         return
 
+    if streaming and workers > 1:
+        # I processi del pool restituiscono ogni file per intero: la memoria limitata dello streaming
+        # è garantita solo dall'importazione sequenziale.
+        logger.warning(f"Importazione in streaming: i {workers} processi richiesti vengono ignorati e i file "
+                       "vengono importati in sequenza, a blocchi.")
+        workers = 1
+
     # Assicura che la cartella genitore del file di database esista, creandola se necessario.
     database_file_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -51,6 +377,11 @@ def csv_to_sql():
                 config.tabella_produttivita_pesca
             ]
 
+            # Legge i metadati dei file già importati (hash, dimensione, data di modifica).
+            metadata = _load_import_metadata(conn)
+
+            # Associa ogni file alla sua tabella, scartando quelli che non corrispondono a nessuna tabella.
+            files = []
             for csv_file_path in csv_files:
                 file_stem = csv_file_path.stem
 
@@ -59,19 +390,35 @@ def csv_to_sql():
                         f"Il nome del file CSV '{csv_file_path.name}' (stem: '{file_stem}') non corrisponde a "
                         f"nessun nome di tabella definito in config.py. File saltato.")
                     continue
+                files.append((csv_file_path, file_stem))
+
+            import_start = time.perf_counter()
 
-                table_name = file_stem
-                logger.info(f"Processando il file '{csv_file_path.name}' per la tabella '{table_name}'...")
+            if workers > 1:
+                logger.info(f"Importazione parallela di {len(files)} file con {workers} processi...")
+                _import_files_parallel(conn, files, incrementale, workers, metadata)
+            else:
+                for csv_file_path, table_name in files:
+                    logger.info(f"Processando il file '{csv_file_path.name}' per la tabella '{table_name}'...")
 
-                try:
-                    df = pd.read_csv(csv_file_path, delimiter=";")
-                    # if_exists="replace" elimina e ricrea la tabella se esiste già.
-                    # index=False evita di scrivere l'indice del DataFrame nel database.
-                    df.to_sql(table_name, conn, if_exists="replace", index=False)
-                    logger.info(f"Dati da '{csv_file_path.name}' importati con successo nella tabella '{table_name}'.")
-                except Exception as e:
-                    logger.error(f"Errore durante l'importazione del file '{csv_file_path.name}': {e}", exc_info=True)
+                    try:
+                        start = time.perf_counter()
+                        outcome, rows_written = _import_file(conn, csv_file_path, table_name, incrementale, streaming,
+                                                             metadata)
+                        elapsed = time.perf_counter() - start
+                        if outcome == "saltato":
+                            logger.info(
+                                f"File '{csv_file_path.name}' invariato dall'ultima importazione. File saltato.")
+                        else:
+                            logger.info(
+                                f"Dati da '{csv_file_path.name}' importati con successo nella tabella '{table_name}' "
+                                f"(tabella {outcome}): {rows_written} righe in {elapsed:.3f} s, "
+                                f"{rows_written / elapsed if elapsed > 0 else 0:.0f} righe/s.")
+                    except Exception as e:
+                        logger.error(f"Errore durante l'importazione del file '{csv_file_path.name}': {e}",
+                                     exc_info=True)
 
+            logger.info(f"Tempo totale di importazione: {time.perf_counter() - import_start:.3f} s.")
             logger.info("Processo di importazione completato.")
 
     except sqlite3.Error as e:
@@ -0,0 +1,141 @@
+import sqlite3
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from src.configurations import config
+from src.logging.log_setup import get_logger
+
+# Inizializza il logger per questo modulo, per registrare eventi e errori.
+logger = get_logger(__name__)
+
+# Colonne memorizzate come codici interi, con la tabella dimensione che ne contiene i nomi.
+DIMENSIONI = {
+    config.colonna_regione: config.tabella_dim_regioni,
+    config.colonna_macro_area: config.tabella_dim_macro_aree,
+}
+
+# Codici fissi derivati da config.macro_aree: il codice è la posizione del nome in ordine alfabetico,
+# così ordinare per codice equivale a ordinare per nome (come quando le colonne erano testuali).
+REGIONI = sorted(config.macro_aree)
+MACRO_AREE = sorted(set(config.macro_aree.values()))
+
+# Codice della macro area di ogni regione, indicizzato per codice della regione.
+_MACRO_AREA_PER_REGIONE = np.array([MACRO_AREE.index(config.macro_aree[regione]) for regione in REGIONI],
+                                   dtype=np.int64)
+
+
+def crea_tabelle_dimensioni(conn: sqlite3.Connection):
+    """
+    Crea (se non esistono) le tabelle dimensione di regioni e macro aree con i codici fissi derivati da
+    config.macro_aree, e riallinea la macro area di ogni regione alla configurazione corrente.
+    Solleva ValueError se i codici già memorizzati non corrispondono più alla configurazione: i dati
+    codificati con i codici precedenti vanno reimportati.
+    """
+    conn.execute(f'CREATE TABLE IF NOT EXISTS "{config.tabella_dim_macro_aree}" ('
+                 '"id" INTEGER PRIMARY KEY, "nome" TEXT NOT NULL UNIQUE)')
+    # Le regioni assenti da config.macro_aree ricevono un codice successivo a quelli fissi e nessuna macro area.
+    conn.execute(f'CREATE TABLE IF NOT EXISTS "{config.tabella_dim_regioni}" ('
+                 '"id" INTEGER PRIMARY KEY, "nome" TEXT NOT NULL UNIQUE, "macro_area" INTEGER)')
+
+    for table_name, nomi_fissi in ((config.tabella_dim_macro_aree, MACRO_AREE),
+                                   (config.tabella_dim_regioni, REGIONI)):
+        memorizzati = [nome for _, nome in conn.execute(
+            f'SELECT "id", "nome" FROM "{table_name}" WHERE "id" < ? ORDER BY "id"', (len(nomi_fissi),))]
+        if memorizzati and memorizzati != nomi_fissi:
+            raise ValueError(f"I codici della tabella '{table_name}' non corrispondono a config.macro_aree: "
+                             "reimportare i dati con l'importazione completa.")
+
+    conn.executemany(f'INSERT OR IGNORE INTO "{config.tabella_dim_macro_aree}" ("id", "nome") VALUES (?, ?)',
+                     enumerate(MACRO_AREE))
+    conn.executemany(
+        f'INSERT INTO "{config.tabella_dim_regioni}" ("id", "nome", "macro_area") VALUES (?, ?, ?) '
+        'ON CONFLICT("id") DO UPDATE SET "macro_area" = excluded."macro_area"',
+        [(codice, regione, int(_MACRO_AREA_PER_REGIONE[codice])) for codice, regione in enumerate(REGIONI)]
+    )
+
+
+def nomi(conn: sqlite3.Connection, colonna: str) -> list[str]:
+    """
+    Restituisce i nomi della dimensione di una colonna, nella posizione corrispondente al loro codice.
+    """
+    return [nome for (nome,) in conn.execute(f'SELECT "nome" FROM "{DIMENSIONI[colonna]}" ORDER BY "id"')]
+
+
+def codifica(conn: sqlite3.Connection, colonna: str, valori: Iterable[str]) -> list[int]:
+    """
+    Converte i nomi di una colonna dimensione nei rispettivi codici interi. Le regioni non presenti
+    nella configurazione vengono aggiunte alla dimensione (senza macro area), come in precedenza
+    venivano importate ma escluse dalle serie per macro area.
+    """
+    valori = list(valori)
+    crea_tabelle_dimensioni(conn)
+    codici = {nome: codice for codice, nome in conn.execute(f'SELECT "id", "nome" FROM "{DIMENSIONI[colonna]}"')}
+
+    nuovi = [valore for valore in dict.fromkeys(valori) if valore not in codici]
+    if nuovi:
+        if any(not isinstance(valore, str) for valore in nuovi):
+            raise ValueError(f"Valori mancanti o non validi nella colonna '{colonna}'.")
+        if colonna != config.colonna_regione:
+            raise ValueError(f"Valori sconosciuti nella colonna '{colonna}': {nuovi}")
+        primo = max(codici.values(), default=-1) + 1
+        codici.update({nome: primo + offset for offset, nome in enumerate(nuovi)})
+        conn.executemany(f'INSERT INTO "{config.tabella_dim_regioni}" ("id", "nome") VALUES (?, ?)',
+                         [(codici[nome], nome) for nome in nuovi])
+        logger.warning(f"Regioni senza macro area aggiunte alla dimensione: {nuovi}")
+    return [codici[valore] for valore in valori]
+
+
+def codifica_righe(conn: sqlite3.Connection, column_names: list[str], rows: list[tuple]) -> list[tuple]:
+    """
+    Sostituisce nelle righe (tuple nell'ordine di 'column_names') i nomi delle colonne dimensione con i codici.
+    """
+    positions = [position for position, name in enumerate(column_names) if name in DIMENSIONI]
+    if not positions or not rows:
+        return rows
+    columns = [list(column) for column in zip(*rows)]
+    for position in positions:
+        columns[position] = codifica(conn, column_names[position], columns[position])
+    return list(zip(*columns))
+
+
+def macro_aree_delle_regioni(codici_regione: np.ndarray) -> np.ndarray:
+    """
+    Restituisce il codice della macro area di ogni regione (-1 per le regioni senza macro area),
+    con una sola indicizzazione NumPy invece di una map() sui nomi.
+    """
+    codici_regione = np.asarray(codici_regione, dtype=np.int64)
+    note = codici_regione < len(_MACRO_AREA_PER_REGIONE)
+    return np.where(note, _MACRO_AREA_PER_REGIONE[np.where(note, codici_regione, 0)], -1)
+
+
+def decodifica(conn: sqlite3.Connection, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte le colonne dimensione del DataFrame da codici interi a Categorical con i nomi: i codici del
+    Categorical coincidono con quelli memorizzati nel database.
+    """
+    df = df.copy()
+    for colonna in DIMENSIONI:
+        if colonna in df.columns:
+            df[colonna] = pd.Categorical.from_codes(df[colonna].to_numpy(), nomi(conn, colonna))
+    return df
+
+
+def select_decodificata(table_name: str, column_names: list[str], altre: Iterable[str] = ()) -> str:
+    """
+    Restituisce la SELECT delle colonne indicate della tabella (alias 't') con le colonne dimensione risolte
+    nei nomi, per i consumatori esterni (API), seguite dalle eventuali espressioni 'altre'. Con CROSS JOIN
+    SQLite mantiene la tabella dei dati nel ciclo esterno: l'ordine delle righe e l'uso degli indici restano
+    quelli della SELECT sulla sola tabella.
+    """
+    columns, joins = [], []
+    for name in column_names:
+        if name in DIMENSIONI:
+            alias = f"d{len(joins)}"
+            columns.append(f'{alias}."nome" AS "{name}"')
+            joins.append(f'CROSS JOIN "{DIMENSIONI[name]}" AS {alias} ON {alias}."id" = t."{name}"')
+        else:
+            columns.append(f't."{name}"')
+    columns += altre
+    return " ".join([f'SELECT {", ".join(columns)} FROM "{table_name}" AS t'] + joins)
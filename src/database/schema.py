@@ -0,0 +1,202 @@
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from src.configurations import config
+from src.database.dimensioni import DIMENSIONI
+from src.logging.log_setup import get_logger
+
+# Inizializza il logger per questo modulo, per registrare eventi e errori.
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """
+    Schema dichiarativo di una tabella: colonne tipizzate, chiave primaria e indici secondari.
+    """
+    name: str
+    # Coppie (nome colonna, tipo SQLite) nell'ordine in cui vengono create.
+    columns: tuple[tuple[str, str], ...]
+    primary_key: tuple[str, ...]
+    # Ogni indice secondario è una tupla di colonne.
+    indexes: tuple[tuple[str, ...], ...] = field(default_factory=tuple)
+
+    @property
+    def column_names(self) -> list[str]:
+        return [name for name, _ in self.columns]
+
+    @property
+    def value_columns(self) -> list[str]:
+        # Colonne che non fanno parte della chiave primaria (i valori della serie).
+        return [name for name in self.column_names if name not in self.primary_key]
+
+
+# Regione e Macro Area sono memorizzate come codici interi delle tabelle dimensione (vedi dimensioni.py).
+_CODICE = "INTEGER NOT NULL"
+
+
+def _schema_regionale(table_name: str, value_col: str) -> TableSchema:
+    # Tabelle originali: un valore per ogni coppia (Anno, Regione).
+    return TableSchema(
+        name=table_name,
+        columns=((config.colonna_anno, "INTEGER NOT NULL"), (config.colonna_regione, _CODICE),
+                 (value_col, "REAL")),
+        primary_key=(config.colonna_anno, config.colonna_regione),
+        indexes=((config.colonna_regione,),),
+    )
+
+
+def _schema_macroarea(table_name: str, value_col: str) -> TableSchema:
+    # Serie calcolate per macroarea: un valore per ogni coppia (Anno, Macro Area).
+    return TableSchema(
+        name=table_name,
+        columns=((config.colonna_anno, "INTEGER NOT NULL"), (config.colonna_macro_area, _CODICE),
+                 (value_col, "REAL")),
+        primary_key=(config.colonna_anno, config.colonna_macro_area),
+        indexes=((config.colonna_macro_area,),),
+    )
+
+
+def _schema_nazionale(table_name: str, value_col: str) -> TableSchema:
+    # Serie calcolate nazionali: un valore per anno.
+    return TableSchema(
+        name=table_name,
+        columns=((config.colonna_anno, "INTEGER NOT NULL"), (value_col, "REAL")),
+        primary_key=(config.colonna_anno,),
+    )
+
+
+# Schemi di tutte le tabelle del database, dichiarati una sola volta a partire dai nomi in config.py.
+SCHEMAS: dict[str, TableSchema] = {schema.name: schema for schema in (
+    _schema_regionale(config.tabella_andamento_occupazione_pesca, config.colonna_variazione_percentuale),
+    _schema_regionale(config.tabella_importanza_economica_pesca, config.colonna_percentuale_valore_aggiunto),
+    _schema_regionale(config.tabella_produttivita_pesca, config.colonna_produttivita),
+    _schema_macroarea(config.tabella_totali_macroaree_produttivita_pesca,
+                      config.colonna_totale_macroarea_produttivita),
+    _schema_nazionale(config.tabella_totale_nazionale_produttivita_pesca,
+                      config.colonna_totale_nazionale_produttivita),
+    _schema_macroarea(config.tabella_medie_macroaree_valore_aggiunto_pesca,
+                      config.colonna_media_macroarea_percentuale_valore_aggiunto),
+    _schema_nazionale(config.tabella_media_nazionale_occupazione_pesca,
+                      config.colonna_media_nazionale_variazione_percentuale_occupazione),
+    _schema_macroarea(config.tabella_medie_macroaree_occupazione_pesca,
+                      config.colonna_media_macroarea_variazione_percentuale_occupazione),
+)}
+
+
+@contextmanager
+def atomic(conn: sqlite3.Connection):
+    """
+    Esegue il blocco in un SAVEPOINT: in caso di errore tutte le modifiche del blocco (DROP compreso)
+    vengono annullate e la tabella resta com'era. Se non c'è una transazione aperta, il blocco viene
+    confermato al termine.
+    """
+    conn.execute('SAVEPOINT "scrittura"')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK TO "scrittura"')
+        conn.execute('RELEASE "scrittura"')
+        raise
+    conn.execute('RELEASE "scrittura"')
+
+
+def create_table(conn: sqlite3.Connection, schema: TableSchema):
+    """
+    Ricrea la tabella secondo lo schema, con chiave primaria e indici secondari.
+    """
+    columns_sql = ", ".join(f'"{name}" {sql_type}' for name, sql_type in schema.columns)
+    primary_key_sql = ", ".join(f'"{name}"' for name in schema.primary_key)
+
+    conn.execute(f'DROP TABLE IF EXISTS "{schema.name}"')
+    conn.execute(f'CREATE TABLE "{schema.name}" ({columns_sql}, PRIMARY KEY ({primary_key_sql}))')
+
+    for index_columns in schema.indexes:
+        # Il nome dell'indice è derivato da tabella e colonne, così resta stabile tra un'esecuzione e l'altra.
+        index_name = f"idx_{schema.name}_{'_'.join(index_columns)}".replace(" ", "_").replace("-", "_")
+        index_columns_sql = ", ".join(f'"{name}"' for name in index_columns)
+        conn.execute(f'CREATE INDEX "{index_name}" ON "{schema.name}" ({index_columns_sql})')
+
+
+def tabella_obsoleta(conn: sqlite3.Connection, schema: TableSchema) -> bool:
+    """
+    Indica se la tabella esiste con colonne o tipi diversi da quelli dichiarati nello schema
+    (es. creata da una versione precedente): in tal caso va ricreata invece che aggiornata.
+    """
+    declared = [(name, sql_type) for _, name, sql_type, *_ in conn.execute(f'PRAGMA table_info("{schema.name}")')]
+    expected = [(name, sql_type.split()[0]) for name, sql_type in schema.columns]
+    return bool(declared) and declared != expected
+
+
+def dataframe_rows(df: pd.DataFrame, columns: list[str]) -> list[tuple]:
+    """
+    Converte le colonne indicate di un DataFrame in tuple di tipi Python, con None al posto dei NaN.
+    """
+    values = df[columns]
+    # Il passaggio a 'object' produce int/float Python, che sqlite3 sa gestire a differenza dei tipi NumPy.
+    return list(values.astype(object).where(values.notna(), None).itertuples(index=False, name=None))
+
+
+def _to_int(value: str) -> int | None:
+    return int(value) if value.strip() else None
+
+
+def _to_float(value: str) -> float | None:
+    return float(value) if value.strip() else None
+
+
+def column_converters(schema: TableSchema) -> list:
+    """
+    Restituisce, per ogni colonna dello schema, la funzione che converte il testo letto dal CSV
+    nel tipo Python corrispondente al tipo SQLite dichiarato (stringa vuota -> None).
+    """
+    converters = []
+    for name, sql_type in schema.columns:
+        # Le colonne dimensione arrivano dal CSV come nomi: la codifica avviene prima della scrittura.
+        if name in DIMENSIONI:
+            converters.append(str)
+        elif sql_type.startswith("INTEGER"):
+            converters.append(_to_int)
+        elif sql_type.startswith("REAL"):
+            converters.append(_to_float)
+        else:
+            converters.append(str)
+    return converters
+
+
+def insert_rows(conn: sqlite3.Connection, schema: TableSchema, rows: list[tuple]):
+    """
+    Inserisce le righe (nell'ordine delle colonne dello schema) nella tabella esistente.
+    """
+    placeholders = ", ".join("?" for _ in schema.columns)
+    columns_sql = ", ".join(f'"{name}"' for name in schema.column_names)
+    conn.executemany(f'INSERT INTO "{schema.name}" ({columns_sql}) VALUES ({placeholders})', rows)
+
+
+def write_dataframe(conn: sqlite3.Connection, schema: TableSchema, df: pd.DataFrame):
+    """
+    Sostituisce il contenuto della tabella con le righe del DataFrame, mantenendo schema e indici.
+    """
+    create_table(conn, schema)
+    insert_rows(conn, schema, dataframe_rows(df, schema.column_names))
+    logger.debug(f"Scritte {len(df)} righe nella tabella '{schema.name}'.")
+
+
+def upsert_rows(conn: sqlite3.Connection, schema: TableSchema, rows: list[tuple]):
+    """
+    Inserisce le righe nella tabella esistente; se la chiave primaria è già presente aggiorna i valori
+    (INSERT ... ON CONFLICT ... DO UPDATE), senza ricreare la tabella.
+    """
+    placeholders = ", ".join("?" for _ in schema.columns)
+    columns_sql = ", ".join(f'"{name}"' for name in schema.column_names)
+    primary_key_sql = ", ".join(f'"{name}"' for name in schema.primary_key)
+    updates_sql = ", ".join(f'"{name}" = excluded."{name}"' for name in schema.value_columns)
+    conn.executemany(
+        f'INSERT INTO "{schema.name}" ({columns_sql}) VALUES ({placeholders}) '
+        f'ON CONFLICT ({primary_key_sql}) DO UPDATE SET {updates_sql}',
+        rows
+    )
+    logger.debug(f"Inserite o aggiornate {len(rows)} righe nella tabella '{schema.name}'.")
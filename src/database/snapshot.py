@@ -0,0 +1,222 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.configurations import config
+from src.database.data_version import get_data_version_record
+from src.database.dimensioni import DIMENSIONI, nomi
+from src.database.schema import SCHEMAS, TableSchema
+from src.logging.log_setup import get_logger
+
+# pyarrow è una dipendenza opzionale: se installata lo snapshot viene scritto in formato Arrow IPC,
+# altrimenti come array NumPy (.npy), una cartella per tabella e un file per colonna.
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+# Inizializza il logger per questo modulo, per registrare eventi e errori.
+logger = get_logger(__name__)
+
+MANIFEST = "manifest.json"
+
+# Manifest e colonne mappate in memoria già aperti, per cartella di snapshot. La cache è valida finché
+# il manifest non cambia (data di modifica): la riesportazione sostituisce la cartella e la invalida.
+_aperti: dict[Path, tuple[int, dict, dict[str, dict]]] = {}
+_lock = threading.Lock()
+
+
+def _read_table(conn: sqlite3.Connection, schema: TableSchema) -> dict[str, np.ndarray | pd.Categorical]:
+    # Legge la tabella nell'ordine delle righe di SQLite e converte ogni colonna nel suo tipo compatto:
+    # colonne dimensione -> categoriale (gli stessi codici del database + i nomi), INTEGER -> int64,
+    # REAL -> float64 (NaN per NULL), TEXT -> categoriale.
+    rows = conn.execute(f'SELECT * FROM "{schema.name}"').fetchall()
+    columns = {}
+    for index, (name, sql_type) in enumerate(schema.columns):
+        values = [row[index] for row in rows]
+        if name in DIMENSIONI:
+            columns[name] = pd.Categorical.from_codes(np.array(values, dtype=np.int64), nomi(conn, name))
+        elif sql_type.startswith("INTEGER"):
+            columns[name] = np.array(values, dtype=np.int64)
+        elif sql_type.startswith("REAL"):
+            columns[name] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        else:
+            columns[name] = pd.Categorical(values)
+    return columns
+
+
+def _write_npy(directory: Path, columns: dict) -> list[dict]:
+    directory.mkdir()
+    described = []
+    for position, (name, values) in enumerate(columns.items()):
+        # I nomi delle colonne contengono spazi e simboli: i file usano la posizione della colonna.
+        if isinstance(values, pd.Categorical):
+            np.save(directory / f"{position}.npy", values.codes.astype(np.int32))
+            described.append({"nome": name, "tipo": "categoriale", "categorie": [str(c) for c in values.categories]})
+        else:
+            np.save(directory / f"{position}.npy", values)
+            described.append({"nome": name, "tipo": str(values.dtype)})
+    return described
+
+
+def _write_arrow(path: Path, columns: dict) -> list[dict]:
+    # Le colonne categoriali diventano colonne 'dictionary' di Arrow, con gli stessi codici interi.
+    table = pa.table({name: pa.DictionaryArray.from_arrays(values.codes.astype(np.int32), list(values.categories))
+                      if isinstance(values, pd.Categorical) else pa.array(values)
+                      for name, values in columns.items()})
+    # Formato IPC non compresso: il file può essere mappato in memoria e letto senza copie.
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return [{"nome": name, "tipo": "categoriale" if isinstance(values, pd.Categorical) else str(values.dtype)}
+            for name, values in columns.items()]
+
+
+def esporta_snapshot(snapshot_dir: Path = config.snapshot_dir) -> Path:
+    """
+    Esporta tutte le tabelle (originali e calcolate) in uno snapshot colonnare: Arrow IPC se pyarrow è
+    installato, altrimenti array NumPy (.npy) con le colonne testuali codificate come interi categoriali.
+    Lo snapshot viene scritto in una cartella temporanea e poi sostituisce quello precedente.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.parent.mkdir(parents=True, exist_ok=True)
+    formato = "arrow" if pa is not None else "npy"
+    temp_dir = Path(tempfile.mkdtemp(prefix=".snapshot-", dir=snapshot_dir.parent))
+    manifest = {"formato": formato, "tabelle": {}}
+
+    try:
+        with closing(sqlite3.connect(Path(config.DB_DIR))) as conn:
+            for table_name, schema in SCHEMAS.items():
+                try:
+                    columns = _read_table(conn, schema)
+                except sqlite3.OperationalError as e:
+                    logger.warning(f"Tabella '{table_name}' non esportata nello snapshot: {e}")
+                    continue
+                # Nome del file derivato dalla posizione della tabella, per evitare caratteri problematici.
+                file_name = f"t{len(manifest['tabelle'])}"
+                if formato == "arrow":
+                    file_name += ".arrow"
+                    colonne = _write_arrow(temp_dir / file_name, columns)
+                else:
+                    colonne = _write_npy(temp_dir / file_name, columns)
+                versione, aggiornato_il = get_data_version_record(conn, table_name)
+                manifest["tabelle"][table_name] = {
+                    "file": file_name,
+                    # Versione e data di aggiornamento dei dati al momento dell'esportazione: se una delle due
+                    # cambia (anche con un database ricreato, che riparte dalla versione 1) lo snapshot non è
+                    # più valido.
+                    "versione": versione,
+                    "aggiornato_il": aggiornato_il,
+                    "righe": len(next(iter(columns.values()))),
+                    "colonne": colonne,
+                }
+        (temp_dir / MANIFEST).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        # Sostituisce lo snapshot precedente solo dopo aver scritto quello nuovo per intero.
+        if snapshot_dir.exists():
+            shutil.rmtree(snapshot_dir)
+        os.replace(temp_dir, snapshot_dir)
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"Snapshot {formato} di {len(manifest['tabelle'])} tabelle esportato in '{snapshot_dir}'.")
+    return snapshot_dir
+
+
+def _open_snapshot(snapshot_dir: Path) -> tuple[dict, dict[str, dict]] | None:
+    # Restituisce il manifest e le colonne già aperte dello snapshot, rileggendoli solo se il manifest è cambiato.
+    snapshot_dir = Path(snapshot_dir)
+    try:
+        mtime = (snapshot_dir / MANIFEST).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _lock:
+        aperto = _aperti.get(snapshot_dir)
+        if aperto is None or aperto[0] != mtime:
+            manifest = json.loads((snapshot_dir / MANIFEST).read_text(encoding="utf-8"))
+            aperto = _aperti[snapshot_dir] = (mtime, manifest, {})
+        return aperto[1], aperto[2]
+
+
+def _load_manifest(snapshot_dir: Path) -> dict | None:
+    aperto = _open_snapshot(snapshot_dir)
+    return aperto[0] if aperto is not None else None
+
+
+def _map_columns(path: Path, info: dict) -> dict:
+    # Mappa in memoria i file delle colonne di una tabella; i dati vengono letti dal disco solo quando servono.
+    # Le colonne numeriche restano gli array mappati; per le categoriali pandas copia i codici in un intero
+    # più piccolo (int8 per regioni e macro aree), una frazione dei dati della colonna.
+    columns = {}
+    for position, column in enumerate(info["colonne"]):
+        values = np.load(path / f"{position}.npy", mmap_mode="r")
+        if column["tipo"] == "categoriale":
+            columns[column["nome"]] = pd.Categorical.from_codes(values, column["categorie"])
+        else:
+            columns[column["nome"]] = values
+    return columns
+
+
+def _map_arrow(path: Path) -> dict:
+    # Mappa in memoria il file Arrow IPC: la tabella letta punta direttamente ai buffer della mappa, che resta
+    # aperta finché le colonne sono in uso. Come per i file .npy, le colonne numeriche diventano array NumPy
+    # senza copie e solo i codici delle colonne 'dictionary' vengono copiati da pandas.
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        # Una tabella scritta con un solo blocco ha colonne di un solo chunk; altrimenti i chunk vanno uniti (copia).
+        array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+        if pa.types.is_dictionary(array.type):
+            columns[name] = pd.Categorical.from_codes(array.indices.to_numpy(zero_copy_only=True),
+                                                      array.dictionary.to_pylist())
+        else:
+            columns[name] = array.to_numpy(zero_copy_only=True)
+    return columns
+
+
+def carica_tabella(table_name: str, snapshot_dir: Path = config.snapshot_dir) -> pd.DataFrame:
+    """
+    Carica una tabella dallo snapshot mappando i file in memoria: i dati vengono letti dal disco solo quando
+    servono e le colonne numeriche non vengono copiate. Le colonne testuali vengono restituite come categoriali.
+    Solleva KeyError se la tabella non è nello snapshot (o lo snapshot non esiste).
+    """
+    aperto = _open_snapshot(snapshot_dir)
+    if aperto is None or table_name not in aperto[0]["tabelle"]:
+        raise KeyError(table_name)
+    manifest, mappate = aperto
+    info = manifest["tabelle"][table_name]
+    path = Path(snapshot_dir) / info["file"]
+
+    # Le colonne di ogni tabella vengono mappate una sola volta e riusate dai caricamenti successivi.
+    columns = mappate.get(table_name)
+    if columns is None:
+        columns = _map_arrow(path) if manifest["formato"] == "arrow" else _map_columns(path, info)
+        columns = mappate.setdefault(table_name, columns)
+    # copy=False mantiene gli array mappati in memoria invece di copiarli nel DataFrame.
+    return pd.DataFrame(columns, copy=False)
+
+
+def carica_tabella_se_aggiornata(table_name: str, conn: sqlite3.Connection,
+                                 snapshot_dir: Path = config.snapshot_dir) -> pd.DataFrame | None:
+    """
+    Carica la tabella dallo snapshot solo se è aggiornata, cioè se versione e data di aggiornamento dei dati
+    registrate nello snapshot coincidono con quelle attuali del database. Altrimenti restituisce None.
+    """
+    manifest = _load_manifest(snapshot_dir)
+    if manifest is None or table_name not in manifest["tabelle"]:
+        return None
+    info = manifest["tabelle"][table_name]
+    # Gli snapshot esportati prima della registrazione della data non hanno "aggiornato_il": risultano obsoleti.
+    if (info["versione"], info.get("aggiornato_il")) != get_data_version_record(conn, table_name):
+        logger.debug(f"Snapshot della tabella '{table_name}' non aggiornato: lettura da SQLite.")
+        return None
+    return carica_tabella(table_name, snapshot_dir)
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from src.configurations import config
+from src.database.data_version import get_data_version
+from src.generate_plots.create_plots import (FORMATI, FORMATI_IMMAGINE, GRAFICI, GraficoSpec, costruisci_figura,
+                                             kaleido, serializza_figura)
+from src.logging.log_setup import get_logger
+
+# Inizializza il logger per questo modulo, per registrare eventi e errori.
+logger = get_logger(__name__)
+
+
+@dataclass
+class EsitoGrafico:
+    """
+    Risultato della generazione di un grafico in modalità batch.
+    """
+    nome: str
+    # "generato", "aggiornato" (saltato perché la tabella non è cambiata), "vuoto" (nessun dato) o "errore".
+    stato: str
+    file: list[str] = field(default_factory=list)
+    # Secondi spesi a leggere i dati e costruire la figura, e a scrivere i file.
+    durata_figura: float = 0.0
+    durata_scrittura: float = 0.0
+
+
+def _impronta(grafico: GraficoSpec, formati: tuple[str, ...], versione: int) -> str:
+    # Il grafico va rigenerato se cambiano la sua descrizione, i formati richiesti o i dati della tabella.
+    contenuto = json.dumps([repr(grafico), list(formati), versione])
+    return hashlib.sha256(contenuto.encode("utf-8")).hexdigest()
+
+
+def _file_impronta(output_dir: Path, grafico: GraficoSpec) -> Path:
+    # Un file di impronta per grafico, accanto ai file generati: processi diversi non scrivono mai lo stesso file.
+    return output_dir / f"{grafico.table_name}.impronta.json"
+
+
+def _aggiornato(output_dir: Path, grafico: GraficoSpec, impronta: str) -> bool:
+    try:
+        salvata = json.loads(_file_impronta(output_dir, grafico).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    # Anche con l'impronta invariata, un file eliminato a mano va rigenerato.
+    return salvata["impronta"] == impronta and all((output_dir / name).exists() for name in salvata["file"])
+
+
+def _renderizza(grafico: GraficoSpec, formati: tuple[str, ...], output_dir: Path, impronta: str) -> EsitoGrafico:
+    """
+    Costruisce la figura e la scrive in ogni formato richiesto. Viene eseguita nei processi del pool.
+    """
+    inizio = time.perf_counter()
+    try:
+        fig = costruisci_figura(grafico.table_name, grafico.y_col, grafico.title, grafico.color_col,
+                                grafico.y_axis_title)
+        if fig is None:
+            logger.warning(f"Nessun dato trovato per la tabella '{grafico.table_name}'")
+            return EsitoGrafico(grafico.table_name, "vuoto", durata_figura=time.perf_counter() - inizio)
+        costruita = time.perf_counter()
+
+        file = []
+        for formato in formati:
+            path = output_dir / f"{grafico.table_name}.{formato}"
+            # Scrive su un file temporaneo e lo rinomina: chi legge la cartella non vede mai un file a metà.
+            temp_path = path.with_name(f".{path.name}.tmp")
+            temp_path.write_bytes(serializza_figura(fig, formato))
+            os.replace(temp_path, path)
+            file.append(path.name)
+
+        _file_impronta(output_dir, grafico).write_text(json.dumps({"impronta": impronta, "file": file}),
+                                                         encoding="utf-8")
+        return EsitoGrafico(grafico.table_name, "generato", file, costruita - inizio, time.perf_counter() - costruita)
+    except Exception as e:
+        logger.error(f"Errore durante la generazione del grafico per {grafico.table_name}: {e}", exc_info=True)
+        return EsitoGrafico(grafico.table_name, "errore", durata_figura=time.perf_counter() - inizio)
+
+
+def renderizza_grafici(grafici: list[GraficoSpec] | None = None,
+                       formati: tuple[str, ...] = config.grafici_formati,
+                       output_dir: Path = config.grafici_dir,
+                       workers: int = config.grafici_workers,
+                       forza: bool = False) -> bool:
+    """
+    Genera i grafici indicati (tutti se non specificati) come file nella cartella di output, senza aprire
+    il browser, in parallelo in un pool di processi. I grafici la cui tabella non è cambiata dall'ultima
+    generazione (stessa versione dei dati, stessi formati) vengono saltati, salvo con 'forza'.
+    Restituisce True se nessun grafico è fallito.
+    """
+    grafici = GRAFICI if grafici is None else grafici
+    formati = tuple(formati)
+    sconosciuti = [formato for formato in formati if formato not in FORMATI]
+    if sconosciuti:
+        raise ValueError(f"Formati di grafico non supportati: {sconosciuti}")
+    if kaleido is None and any(formato in FORMATI_IMMAGINE for formato in formati):
+        raise ValueError("I formati png e svg richiedono il pacchetto 'kaleido'.")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Le versioni dei dati vengono lette una volta sola, nel processo principale.
+    with closing(sqlite3.connect(Path(config.DB_DIR))) as conn:
+        impronte = {grafico: _impronta(grafico, formati, get_data_version(conn, grafico.table_name))
+                    for grafico in grafici}
+
+    esiti: list[EsitoGrafico] = []
+    da_generare = []
+    for grafico in grafici:
+        if not forza and _aggiornato(output_dir, grafico, impronte[grafico]):
+            esiti.append(EsitoGrafico(grafico.table_name, "aggiornato"))
+        else:
+            da_generare.append(grafico)
+
+    avvio = time.perf_counter()
+    if workers > 1 and len(da_generare) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(da_generare))) as executor:
+            futures = [executor.submit(_renderizza, grafico, formati, output_dir, impronte[grafico])
+                       for grafico in da_generare]
+            esiti += [future.result() for future in futures]
+    else:
+        # Con un solo grafico (o un solo worker) il pool di processi costerebbe più della generazione stessa.
+        esiti += [_renderizza(grafico, formati, output_dir, impronte[grafico]) for grafico in da_generare]
+
+    for esito in esiti:
+        if esito.stato == "generato":
+            logger.info(f"Grafico '{esito.nome}' generato: figura {esito.durata_figura:.3f} s, "
+                        f"scrittura {esito.durata_scrittura:.3f} s, file {esito.file}.")
+        elif esito.stato == "aggiornato":
+            logger.info(f"Grafico '{esito.nome}' già aggiornato. Saltato.")
+    conteggi = {stato: sum(esito.stato == stato for esito in esiti)
+                for stato in ("generato", "aggiornato", "vuoto", "errore")}
+    logger.info(f"Grafici in '{output_dir}': {conteggi['generato']} generati, {conteggi['aggiornato']} aggiornati, "
+                f"{conteggi['vuoto']} senza dati, {conteggi['errore']} errori, "
+                f"in {time.perf_counter() - avvio:.3f} s.")
+    return conteggi["errore"] == 0
@@ -1,20 +1,147 @@
 # Importa Optional per definire tipi di argomenti che possono essere None.
 from typing import Optional
-# Importa pandas per la manipolazione dei dati, in particolare per creare DataFrame.
-import pandas as pd
+# Importa dataclass per descrivere i grafici in modo dichiarativo.
+from dataclasses import dataclass
 # Importa plotly.express per creare grafici interattivi in modo semplice.
 import plotly.express as px
+# Importa plotly.graph_objects per il tipo delle figure restituite.
+import plotly.graph_objects as go
+
+# Importa sqlite3 per il tipo della connessione opzionale passata dall'API.
+import sqlite3
+# Importa threading per serializzare la costruzione delle figure tra i thread (pipeline ed executor dell'API).
+import threading
+
+# kaleido è una dipendenza opzionale: serve solo per esportare i grafici come immagini statiche (png, svg).
+try:
+    import kaleido
+except ImportError:
+    kaleido = None
 
-# Importa la funzione per recuperare i dati dal database.
-from src.api.fetch_from_db import fetch_data_from_db
 # Importa le configurazioni per accedere a valori condivisi come nomi di colonne e tabelle.
 from src.configurations import config
+# Importa la funzione per leggere i dati del database direttamente come DataFrame.
+from src.database.data_access import Interrogazione, leggi_tabella
 # Importa la funzione per inizializzare il logger.
 from src.logging.log_setup import get_logger
 
 # Inizializza il logger per questo modulo, per registrare eventi e informazioni.
 logger = get_logger(__name__)
 
+# plotly.express applica template e colori predefiniti tramite stato globale e non è thread-safe:
+# due figure costruite insieme da thread diversi possono fallire con "Invalid value".
+_lock_plotly = threading.Lock()
+
+
+@dataclass(frozen=True)
+class GraficoSpec:
+    """
+    Descrizione dichiarativa di un grafico: gli stessi argomenti di crea_grafico_serie.
+    """
+    table_name: str
+    y_col: str
+    title: str
+    # Colonna usata per differenziare le linee (es. la macro area); None per le serie nazionali.
+    color_col: Optional[str] = None
+    y_axis_title: Optional[str] = None
+
+
+# Formati in cui un grafico può essere esportato, con il media type corrispondente.
+FORMATI = {
+    "json": "application/json",  # Figura Plotly in JSON, da disegnare lato client con plotly.js.
+    "html": "text/html",
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+# Formati che richiedono kaleido.
+FORMATI_IMMAGINE = ("png", "svg")
+
+
+# I cinque grafici delle serie calcolate, nell'ordine in cui vengono generati.
+GRAFICI: list[GraficoSpec] = [
+    # --- Grafico 1: Media Variazione % Occupazione per Macro Aree ---
+    GraficoSpec(config.tabella_medie_macroaree_occupazione_pesca,
+                config.colonna_media_macroarea_variazione_percentuale_occupazione,
+                "Media Variazione % Occupazione per Macroarea", config.colonna_macro_area,
+                "Variazione Percentuale (%)"),
+    # --- Grafico 2: Media Variazione % Occupazione Nazionale ---
+    GraficoSpec(config.tabella_media_nazionale_occupazione_pesca,
+                config.colonna_media_nazionale_variazione_percentuale_occupazione,
+                "Media Variazione % Occupazione Nazionale", None, "Variazione Percentuale (%)"),
+    # --- Grafico 3: Produttività Totale per Macro Aree ---
+    GraficoSpec(config.tabella_totali_macroaree_produttivita_pesca, config.colonna_totale_macroarea_produttivita,
+                "Produttività Totale per Macroarea", config.colonna_macro_area,
+                "Produttività Totale (migliaia di €)"),
+    # --- Grafico 4: Produttività Totale Nazionale ---
+    GraficoSpec(config.tabella_totale_nazionale_produttivita_pesca, config.colonna_totale_nazionale_produttivita,
+                "Produttività Totale Nazionale", None, "Produttività Totale (migliaia di €)"),
+    # --- Grafico 5: Media % Valore Aggiunto per Macro Aree ---
+    GraficoSpec(config.tabella_medie_macroaree_valore_aggiunto_pesca,
+                config.colonna_media_macroarea_percentuale_valore_aggiunto,
+                "Media % Valore Aggiunto per Macroarea", config.colonna_macro_area, "Valore Aggiunto Medio (%)"),
+]
+
+
+def costruisci_figura(
+        table_name: str,
+        y_col: str,
+        title: str,
+        color_col: Optional[str] = None,
+        y_axis_title: Optional[str] = None,
+        da_anno: Optional[int] = None,
+        a_anno: Optional[int] = None,
+        conn: Optional[sqlite3.Connection] = None
+) -> Optional[go.Figure]:
+    """
+    Costruisce il grafico a linee di una serie storica, con filtri opzionali per anno.
+    Se viene passata una connessione (es. dal pool dell'API) la usa per leggere i dati.
+    Restituisce None se la tabella non contiene dati nell'intervallo richiesto.
+    """
+    # Legge i dati della tabella come DataFrame, con i filtri di anno richiesti, senza passare dall'API.
+    df = leggi_tabella(table_name, Interrogazione(da_anno, a_anno), conn=conn)
+    # Se non vengono restituiti dati, non c'è nessun grafico da costruire.
+    if df.empty:
+        return None
+    # Crea un grafico a linee utilizzando plotly.express, un thread alla volta (vedi _lock_plotly).
+    with _lock_plotly:
+        fig = px.line(
+            df,  # Il DataFrame contenente i dati.
+            x=config.colonna_anno,  # Colonna per l'asse X (l'anno).
+            y=y_col,  # Colonna per l'asse Y (il valore da plottare).
+            color=color_col,  # Colonna per differenziare le linee con colori diversi (opzionale).
+            title=title,  # Titolo del grafico.
+            labels={  # Etichette personalizzate per gli assi.
+                config.colonna_anno: "Anno",
+                y_col: y_axis_title or y_col  # Titolo personalizzato se fornito, altrimenti il nome della colonna.
+            },
+            markers=True  # Mostra un marcatore per ogni punto dati sulla linea.
+        )
+    # Aggiorna ulteriormente il layout del grafico.
+    fig.update_layout(
+        xaxis_title="Anno",  # Titolo dell'asse X.
+        yaxis_title=y_axis_title or y_col,  # Titolo dell'asse Y.
+        # Imposta il titolo della legenda se si usano colori diversi, altrimenti lo lascia vuoto.
+        legend_title_text=config.colonna_macro_area if color_col else ""
+    )
+    return fig
+
+
+def serializza_figura(fig: go.Figure, formato: str) -> bytes:
+    """
+    Esporta la figura nel formato indicato (vedi FORMATI) e restituisce il contenuto del file.
+    Solleva ValueError per un formato sconosciuto o per un'immagine statica senza kaleido.
+    """
+    if formato not in FORMATI:
+        raise ValueError(f"Formato di grafico non supportato: '{formato}'")
+    if formato in FORMATI_IMMAGINE and kaleido is None:
+        raise ValueError("I formati png e svg richiedono il pacchetto 'kaleido'.")
+    if formato == "json":
+        return fig.to_json().encode("utf-8")
+    if formato == "html":
+        # plotly.js viene caricato dalla CDN: ogni file resta di pochi KiB invece di alcuni MiB.
+        return fig.to_html(include_plotlyjs="cdn").encode("utf-8")
+    return fig.to_image(format=formato)
+
 
 # Definisce una funzione per creare un grafico a linee da una serie di dati.
 def crea_grafico_serie(
@@ -23,7 +150,7 @@ def crea_grafico_serie(
         title: str,
         color_col: Optional[str] = None,
         y_axis_title: Optional[str] = None
-):
+) -> bool:
     """
         Crea e visualizza un grafico a linee per una serie storica.
 
@@ -33,43 +160,25 @@ def crea_grafico_serie(
             title (str): Il titolo del grafico.
             color_col (str, optional): Il nome della colonna da usare per differenziare le linee (es. per macroarea).
             y_axis_title (str, optional): Il titolo per l'asse Y. Se non fornito, usa y_col.
+
+        Returns:
+            bool: False se il grafico non è stato creato a causa di un errore.
     """
     # Registra l'inizio del processo di creazione del grafico.
     logger.info(f"Inizio creazione del grafico per la tabella '{table_name}'")
     # Usa un blocco try...except per gestire eventuali errori durante il processo.
     try:
-        # Recupera tutti i dati dalla tabella specificata, senza filtri di anno.
-        data = fetch_data_from_db(table_name, da_anno=None, a_anno=None)
+        # Costruisce il grafico con tutti i dati della tabella, senza filtri di anno.
+        fig = costruisci_figura(table_name, y_col, title, color_col, y_axis_title)
         # Se non vengono restituiti dati, registra un avviso e interrompe la funzione.
-        if not data:
+        if fig is None:
             logger.warning(f"Nessun dato trovato per la tabella '{table_name}'")
-            return
-        # Converte la lista di dizionari (dati) in un DataFrame di pandas.
-        df = pd.DataFrame(data)
-        # Crea un grafico a linee utilizzando plotly.express.
-        fig = px.line(
-            df,  # Il DataFrame contenente i dati.
-            x=config.colonna_anno,  # Colonna per l'asse X (l'anno).
-            y=y_col,  # Colonna per l'asse Y (il valore da plottare).
-            color=color_col,  # Colonna per differenziare le linee con colori diversi (opzionale).
-            title=title,  # Titolo del grafico.
-            labels={  # Etichette personalizzate per gli assi.
-                config.colonna_anno: "Anno",
-                y_col: y_axis_title or y_col  # Usa il titolo personalizzato se fornito, altrimenti il nome della colonna.
-            },
-            markers=True  # Mostra un marcatore per ogni punto dati sulla linea.
-        )
-        # Aggiorna ulteriormente il layout del grafico.
-        fig.update_layout(
-            xaxis_title="Anno",  # Titolo dell'asse X.
-            yaxis_title=y_axis_title or y_col,  # Titolo dell'asse Y.
-            # Imposta il titolo della legenda se si usano colori diversi, altrimenti lo lascia vuoto.
-            legend_title_text=config.colonna_macro_area if color_col else ""
-        )
+            return True
         # Registra che il grafico sta per essere visualizzato.
         logger.info(f"Visualizzazione grafico: {title}")
         # Mostra il grafico interattivo (di solito apre una nuova finestra o un tab nel browser).
         fig.show()
+        return True
 
     # Cattura qualsiasi eccezione che si possa verificare nel blocco 'try'.
     except Exception as e:
@@ -78,3 +187,4 @@ def crea_grafico_serie(
         # Fornisce un suggerimento utile all'utente per risolvere il problema.
         logger.error(
             f"Controlla che i nomi delle colonne ({y_col, {color_col} }) siano corretti e presenti nella tabella '{table_name}'")
+        return False
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import closing, nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+from src.configurations import config
+from src.logging.log_setup import get_logger
+
+# Inizializza il logger per questo modulo, per registrare eventi e errori.
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class Nodo:
+    """
+    Un passo della pipeline: un'azione con le sue dipendenze e gli input che ne determinano l'impronta.
+    """
+    nome: str
+    # Fase a cui appartiene il nodo (es. "importazione", "serie"), usata nel riepilogo dei tempi.
+    fase: str
+    # Azione del nodo: restituisce False (o solleva un'eccezione) in caso di errore.
+    azione: Callable[[], bool | None]
+    # Nomi dei nodi da cui dipende: il nodo parte solo quando sono tutti completati.
+    dipendenze: tuple[str, ...] = ()
+    # File letti dal nodo: il loro hash fa parte dell'impronta.
+    file_input: tuple[Path, ...] = ()
+    # Parametri del nodo (specifiche, configurazione): se cambiano, il nodo viene rieseguito.
+    parametri: str = ""
+    # Tabella prodotta dal nodo: se manca dal database il nodo viene rieseguito anche con l'impronta invariata.
+    output_table: str | None = None
+    # File prodotti dal nodo (es. i grafici): se ne manca uno il nodo viene rieseguito anche con l'impronta invariata.
+    output_file: tuple[Path, ...] = ()
+    # SQLite ammette un solo scrittore alla volta: i nodi che scrivono nel database vengono serializzati.
+    scrive_db: bool = True
+
+
+@dataclass
+class EsitoNodo:
+    """
+    Risultato dell'esecuzione di un nodo.
+    """
+    nome: str
+    fase: str
+    # "eseguito", "aggiornato" (saltato perché già aggiornato), "errore" o "bloccato" (dipendenza fallita).
+    stato: str
+    impronta: str | None = None
+    inizio: float = 0.0
+    fine: float = 0.0
+
+    @property
+    def durata(self) -> float:
+        return self.fine - self.inizio
+
+
+def _file_sha256(path: Path) -> str:
+    # Hash del contenuto del file, letto a blocchi per non caricarlo interamente in memoria.
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class Pipeline:
+    """
+    Esegue un grafo di nodi come 'make': ogni nodo ha un'impronta calcolata dai suoi parametri, dai file letti
+    e dalle impronte delle dipendenze, e viene saltato se l'impronta coincide con quella dell'ultima esecuzione
+    riuscita. I nodi indipendenti vengono eseguiti in parallelo in un pool di thread.
+    """
+    nodi: list[Nodo]
+    workers: int = config.pipeline_workers
+    # Con 'forza' tutti i nodi vengono rieseguiti, ignorando le impronte salvate.
+    forza: bool = False
+    db_path: Path = field(default_factory=lambda: Path(config.DB_DIR))
+
+    def __post_init__(self):
+        self._per_nome = {nodo.nome: nodo for nodo in self.nodi}
+        for nodo in self.nodi:
+            mancanti = [dep for dep in nodo.dipendenze if dep not in self._per_nome]
+            if mancanti:
+                raise ValueError(f"Il nodo '{nodo.nome}' dipende da nodi inesistenti: {mancanti}")
+        # Lock condiviso dai nodi che scrivono nel database e dal salvataggio delle impronte.
+        self._lock_scrittura = threading.Lock()
+
+    # --- Impronte ---
+
+    def _carica_impronte(self) -> dict[str, str]:
+        # Il database non esiste ancora: nessun nodo è aggiornato.
+        if not self.db_path.exists():
+            return {}
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            try:
+                return dict(conn.execute(f'SELECT "nodo", "impronta" FROM "{config.tabella_pipeline_impronte}"'))
+            except sqlite3.OperationalError:
+                return {}
+
+    def _salva_impronta(self, esito: EsitoNodo):
+        with self._lock_scrittura, closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{config.tabella_pipeline_impronte}" ('
+                '"nodo" TEXT PRIMARY KEY, "impronta" TEXT NOT NULL, "durata" REAL NOT NULL, '
+                '"eseguito_il" TEXT NOT NULL)'
+            )
+            conn.execute(
+                f'INSERT OR REPLACE INTO "{config.tabella_pipeline_impronte}" VALUES (?, ?, ?, ?)',
+                (esito.nome, esito.impronta, esito.durata, datetime.now(timezone.utc).isoformat(timespec="seconds"))
+            )
+
+    def _impronta(self, nodo: Nodo, impronte_dipendenze: dict[str, str]) -> str:
+        contenuto = {
+            "nome": nodo.nome,
+            "parametri": nodo.parametri,
+            "file": {str(path): _file_sha256(path) for path in nodo.file_input},
+            "dipendenze": {dep: impronte_dipendenze[dep] for dep in nodo.dipendenze},
+        }
+        return hashlib.sha256(json.dumps(contenuto, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _output_presente(self, nodo: Nodo) -> bool:
+        if not all(Path(path).exists() for path in nodo.output_file):
+            return False
+        if nodo.output_table is None:
+            return True
+        if not self.db_path.exists():
+            return False
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                               (nodo.output_table,)).fetchone()
+        return row is not None
+
+    # --- Esecuzione ---
+
+    def _esegui_nodo(self, nodo: Nodo, impronta: str) -> EsitoNodo:
+        # L'attesa del lock di scrittura non fa parte della durata del nodo.
+        with self._lock_scrittura if nodo.scrive_db else nullcontext():
+            inizio = time.perf_counter()
+            try:
+                riuscito = nodo.azione() is not False
+            except Exception as e:
+                logger.error(f"Errore durante l'esecuzione del nodo '{nodo.nome}': {e}", exc_info=True)
+                riuscito = False
+            fine = time.perf_counter()
+        return EsitoNodo(nodo.nome, nodo.fase, "eseguito" if riuscito else "errore", impronta, inizio, fine)
+
+    def esegui(self) -> dict[str, EsitoNodo]:
+        """
+        Esegue la pipeline e restituisce l'esito di ogni nodo.
+        """
+        salvate = {} if self.forza else self._carica_impronte()
+        esiti: dict[str, EsitoNodo] = {}
+        in_attesa = [nodo.nome for nodo in self.nodi]
+        in_corso: dict[Future, Nodo] = {}
+        avvio = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pipeline") as executor:
+            while in_attesa or in_corso:
+                # Avvia (o salta) tutti i nodi le cui dipendenze sono concluse. Un nodo saltato può sbloccare
+                # altri nodi, quindi la scansione si ripete finché qualcosa cambia.
+                cambiato = True
+                while cambiato:
+                    cambiato = False
+                    for nome in list(in_attesa):
+                        nodo = self._per_nome[nome]
+                        if not all(dep in esiti for dep in nodo.dipendenze):
+                            continue
+                        in_attesa.remove(nome)
+                        cambiato = True
+                        adesso = time.perf_counter()
+                        if any(esiti[dep].stato in ("errore", "bloccato") for dep in nodo.dipendenze):
+                            esiti[nome] = EsitoNodo(nome, nodo.fase, "bloccato", None, adesso, adesso)
+                            logger.warning(f"Nodo '{nome}' non eseguito: una dipendenza non è stata completata.")
+                            continue
+                        impronta = self._impronta(nodo, {dep: esiti[dep].impronta for dep in nodo.dipendenze})
+                        if salvate.get(nome) == impronta and self._output_presente(nodo):
+                            esiti[nome] = EsitoNodo(nome, nodo.fase, "aggiornato", impronta, adesso, adesso)
+                            logger.info(f"Nodo '{nome}' già aggiornato. Saltato.")
+                            continue
+                        logger.info(f"Esecuzione del nodo '{nome}'...")
+                        in_corso[executor.submit(self._esegui_nodo, nodo, impronta)] = nodo
+
+                if not in_corso:
+                    continue
+                completati, _ = wait(in_corso, return_when=FIRST_COMPLETED)
+                for future in completati:
+                    nodo = in_corso.pop(future)
+                    esito = future.result()
+                    esiti[nodo.nome] = esito
+                    if esito.stato == "eseguito":
+                        # L'impronta viene salvata solo per i nodi riusciti: quelli falliti verranno rieseguiti.
+                        self._salva_impronta(esito)
+                        logger.info(f"Nodo '{nodo.nome}' completato in {esito.durata:.3f} s.")
+
+        self._riepilogo(esiti, time.perf_counter() - avvio)
+        return esiti
+
+    def _riepilogo(self, esiti: dict[str, EsitoNodo], totale: float):
+        # Un record per fase: nodi per stato, durata effettiva (dal primo avvio all'ultima conclusione)
+        # e tempo cumulato dei nodi, che supera la durata quando i nodi sono eseguiti in parallelo.
+        fasi = list(dict.fromkeys(nodo.fase for nodo in self.nodi))
+        logger.info("--- Riepilogo pipeline ---")
+        for fase in fasi:
+            esiti_fase = [esito for esito in esiti.values() if esito.fase == fase]
+            eseguiti = [esito for esito in esiti_fase if esito.stato in ("eseguito", "errore")]
+            conteggi = {stato: sum(esito.stato == stato for esito in esiti_fase)
+                        for stato in ("eseguito", "aggiornato", "errore", "bloccato")}
+            durata = (max(e.fine for e in eseguiti) - min(e.inizio for e in eseguiti)) if eseguiti else 0.0
+            cumulato = sum(esito.durata for esito in eseguiti)
+            logger.info(
+                f"Fase '{fase}': {len(esiti_fase)} nodi ({conteggi['eseguito']} eseguiti, "
+                f"{conteggi['aggiornato']} aggiornati, {conteggi['errore']} errori, {conteggi['bloccato']} bloccati), "
+                f"durata {durata:.3f} s, tempo cumulato {cumulato:.3f} s."
+            )
+        logger.info(f"Pipeline completata in {totale:.3f} s.")
@@ -0,0 +1,63 @@
+from functools import partial
+from pathlib import Path
+
+from src.configurations import config
+from src.database.db_operations import import_csv_file
+from src.generate_plots.batch import renderizza_grafici
+from src.generate_plots.create_plots import GRAFICI
+from src.database.schema import SCHEMAS
+from src.pipeline.dag import Nodo
+from src.scripts.post_processing import normalize_missing_data_by_interpolation
+from src.serie_calcolate.engine import calcola_serie
+from src.serie_calcolate.specs import SERIE
+
+# Tabelle originali, una per file CSV, nell'ordine in cui vengono importate.
+TABELLE_ORIGINALI = [
+    config.tabella_andamento_occupazione_pesca,
+    config.tabella_importanza_economica_pesca,
+    config.tabella_produttivita_pesca,
+]
+
+
+def costruisci_nodi(includi_grafici: bool = True) -> list[Nodo]:
+    """
+    Costruisce il grafo della pipeline: CSV -> tabella originale -> tabella interpolata -> ogni serie
+    calcolata -> ogni grafico.
+    """
+    nodi = []
+    for table_name in TABELLE_ORIGINALI:
+        csv_file_path = Path(config.DATA_DIR) / f"{table_name}.csv"
+        # Importazione: l'impronta dipende dal contenuto del CSV, dallo schema della tabella e dai codici
+        # delle regioni (derivati dalla mappa delle macro aree).
+        nodi.append(Nodo(f"importazione:{table_name}", "importazione",
+                         partial(import_csv_file, csv_file_path, table_name),
+                         file_input=(csv_file_path,),
+                         parametri=repr((SCHEMAS[table_name], sorted(config.macro_aree))),
+                         output_table=table_name))
+        # Interpolazione dei valori mancanti della tabella appena importata.
+        nodi.append(Nodo(f"interpolazione:{table_name}", "interpolazione",
+                         partial(normalize_missing_data_by_interpolation, [table_name]),
+                         dipendenze=(f"importazione:{table_name}",), output_table=table_name))
+
+    for spec in SERIE:
+        # La serie dipende dalla tabella interpolata, dalla propria specifica e dalla mappa delle macro aree.
+        nodi.append(Nodo(f"serie:{spec.output_table}", "serie", partial(calcola_serie, [spec]),
+                         dipendenze=(f"interpolazione:{spec.input_table}",),
+                         parametri=repr((spec, sorted(config.macro_aree.items()), config.serie_backend)),
+                         output_table=spec.output_table))
+
+    if includi_grafici:
+        for grafico in GRAFICI:
+            # I grafici leggono soltanto il database: possono essere generati in parallelo a tutto il resto.
+            # Vengono scritti come file (senza browser), così la pipeline può girare su un server.
+            # Se un file viene eliminato (o l'intera cartella dei grafici) il nodo viene rieseguito.
+            output_dir = Path(config.grafici_dir)
+            nodi.append(Nodo(f"grafico:{grafico.table_name}", "grafici",
+                             partial(renderizza_grafici, [grafico], formati=config.grafici_formati,
+                                     output_dir=output_dir, workers=1),
+                             dipendenze=(f"serie:{grafico.table_name}",),
+                             parametri=repr((grafico, config.grafici_formati)),
+                             output_file=tuple(output_dir / f"{grafico.table_name}.{formato}"
+                                               for formato in config.grafici_formati),
+                             scrive_db=False))
+    return nodi
@@ -1,28 +1,114 @@
+import json
 import sqlite3
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
 # Importa le configurazioni e il logger personalizzato.
 from src.configurations import config
+from src.database.data_access import leggi_tabella
+from src.database.data_version import bump_data_version
+from src.database.dimensioni import nomi
+from src.database.schema import atomic
 from src.logging.log_setup import get_logger
 
 # Inizializza il logger per questo modulo.
 logger = get_logger(__name__)
 
 
-def normalize_missing_data_by_interpolation():
+def _interpola_matrice(values: np.ndarray, exists: np.ndarray) -> np.ndarray:
+    """
+    Interpola linearmente ogni colonna (regione) della matrice anno x regione, con la stessa semantica di
+    Series.interpolate(method='linear').round(2) applicata alle sole righe presenti di ogni regione:
+    - le colonne con meno di 2 valori validi restano invariate;
+    - i punti sono equidistanti per posizione tra le righe presenti (non per anno), come in pandas;
+    - i NaN iniziali restano NaN, quelli finali prendono l'ultimo valore valido;
+    - l'intera colonna viene arrotondata a due decimali.
+    Le celle della matrice senza una riga corrispondente ('exists' falso) vengono ignorate.
+    """
+    n_rows = values.shape[0]
+    valid = exists & ~np.isnan(values)
+    row_index = np.arange(n_rows)[:, None]
+    # Posizione di ogni riga presente all'interno della propria regione (0, 1, 2, ...).
+    position = (np.cumsum(exists, axis=0) - 1).astype(float)
+
+    # Indice del valore valido precedente (o corrente) e successivo di ogni cella, per tutte le colonne insieme.
+    prev_index = np.maximum.accumulate(np.where(valid, row_index, -1), axis=0)
+    next_index = np.minimum.accumulate(np.where(valid, row_index, n_rows)[::-1], axis=0)[::-1]
+
+    columns = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    has_prev = prev_index >= 0
+    has_next = next_index < n_rows
+    safe_prev = np.where(has_prev, prev_index, 0)
+    safe_next = np.where(has_next, next_index, 0)
+    x0, y0 = position[safe_prev, columns], values[safe_prev, columns]
+    x1, y1 = position[safe_next, columns], values[safe_next, columns]
+
+    # Stessa formula di np.interp (usato da pandas): pendenza * (x - x0) + y0.
+    with np.errstate(invalid="ignore", divide="ignore"):
+        interpolated = (y1 - y0) / (x1 - x0) * (position - x0) + y0
+    # Dopo l'ultimo valore valido np.interp restituisce l'ultimo valore (riempimento in avanti).
+    interpolated = np.where(has_next, interpolated, y0)
+
+    enough_points = valid.sum(axis=0) >= 2
+    to_fill = exists & ~valid & has_prev & enough_points
+    result = np.where(to_fill, interpolated, values)
+    # Come in pandas, l'arrotondamento riguarda tutta la serie delle regioni interpolate.
+    return np.where(enough_points, np.round(result, 2), result)
+
+
+def interpola_per_regione(df: pd.DataFrame, value_col: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Interpola i valori mancanti di ogni regione disponendo i dati in una matrice anno x regione.
+    Restituisce i valori interpolati e la maschera dei valori riempiti, allineati alle righe di 'df'.
+    """
+    # Coordinate di ogni riga nella matrice: anni e regioni in ordine crescente.
+    # factorize usa una tabella hash: molto più veloce di np.unique sulle stringhe delle regioni.
+    year_index, years = pd.factorize(df[config.colonna_anno], sort=True)
+    region_index, regions = pd.factorize(df[config.colonna_regione], sort=True)
+
+    values = np.full((len(years), len(regions)), np.nan)
+    exists = np.zeros((len(years), len(regions)), dtype=bool)
+    original = df[value_col].to_numpy(dtype=float)
+    values[year_index, region_index] = original
+    exists[year_index, region_index] = True
+
+    interpolated = _interpola_matrice(values, exists)[year_index, region_index]
+    return interpolated, np.isnan(original) & ~np.isnan(interpolated)
+
+
+def _sonda_sql(table_name: str, value_col: str) -> str:
+    """
+    Query che conta le celle che l'interpolazione cambierebbe, con le stesse regole di _interpola_matrice:
+    solo le regioni con almeno 2 valori validi vengono elaborate; in queste cambiano i NaN successivi al primo
+    valore valido e i valori con più di due decimali (es. righe aggiunte da un CSV a quattro decimali).
+    I NaN che non si possono interpolare non fanno rileggere la tabella a ogni esecuzione.
+    """
+    anno, regione, value = f'"{config.colonna_anno}"', f'"{config.colonna_regione}"', f'"{value_col}"'
+    # ROUND(v * 100) / 100 è l'arrotondamento di NumPy, salvo i casi a metà, che hanno comunque tre decimali.
+    return (f'SELECT COUNT(*) FROM "{table_name}" AS t JOIN ('
+            f'SELECT {regione}, MIN({anno}) AS "primo_anno" FROM "{table_name}" WHERE {value} IS NOT NULL '
+            f'GROUP BY {regione} HAVING COUNT(*) >= 2) AS r ON r.{regione} = t.{regione} '
+            f'WHERE (t.{value} IS NULL AND t.{anno} > r."primo_anno") '
+            f'OR t.{value} != ROUND(t.{value} * 100) / 100.0')
+
+
+def normalize_missing_data_by_interpolation(tabelle: list[str] | None = None) -> bool:
     """
     Normalizza i dati mancanti nelle tabelle specificate tramite interpolazione lineare.
-    Utilizza un approccio vettorizzato con pandas.transform per maggiore efficienza e leggibilità.
+    Tutte le regioni vengono interpolate insieme su una matrice anno x regione con NumPy.
     Riempie SOLO i NaN esistenti all'interno degli anni già presenti per ciascuna regione.
-    Le tabelle nel database vengono SOSTITUITE con i dati processati.
+    Nel database vengono aggiornate solo le celle cambiate; le tabelle in cui nessuna cella cambierebbe
+    (vedi _sonda_sql) non vengono lette.
+    Con 'tabelle' vengono processate solo le tabelle indicate (tutte se non specificate).
+    Restituisce False se almeno una tabella non è stata processata a causa di un errore.
     """
     # Definisce il percorso del file di database.
     db_path = Path(config.DB_DIR)
     # Controlla se il database esiste, altrimenti registra un errore e termina.
     if not db_path.exists():
         logger.error(f"Database '{db_path}' non trovato. Eseguire prima l'importazione.")
-        return
+        return False
 
     # Dizionario che mappa le tabelle da processare con la colonna di valori corrispondente.
     tables_to_process = {
@@ -30,10 +116,14 @@ def normalize_missing_data_by_interpolation():
         config.tabella_importanza_economica_pesca: config.colonna_percentuale_valore_aggiunto,
         config.tabella_produttivita_pesca: config.colonna_produttivita,
     }
+    if tabelle is not None:
+        tables_to_process = {table: col for table, col in tables_to_process.items() if table in tabelle}
 
     # Inizializza i contatori per il riepilogo finale.
     tables_processed_successfully = 0
     total_nans_filled_overall = 0
+    # Conta le tabelle non processate a causa di un errore, per l'esito restituito.
+    errors = 0
 
     # Utilizza un blocco try...except per gestire errori a livello di connessione al database.
     try:
@@ -46,11 +136,19 @@ def normalize_missing_data_by_interpolation():
                 logger.info(f"Inizio post-processing per la tabella: '{table_name}', colonna: '{value_col}'")
 
                 try:
-                    # Legge l'intera tabella dal database in un DataFrame di pandas.
-                    original_df = pd.read_sql_query(f'SELECT * FROM "{table_name}"', conn)
-                except pd.io.sql.DatabaseError as e:
+                    # Sonda economica: se nessuna cella può cambiare la tabella non viene nemmeno letta.
+                    da_elaborare = conn.execute(_sonda_sql(table_name, value_col)).fetchone()[0]
+                    if da_elaborare == 0:
+                        logger.info(f"Tabella '{table_name}' processata. Nessun valore NaN da riempire "
+                                    "né da arrotondare.")
+                        tables_processed_successfully += 1
+                        continue
+                    # Legge l'intera tabella in un DataFrame di pandas, con le regioni come codici interi.
+                    original_df = leggi_tabella(table_name, conn=conn, decodifica=False)
+                except (sqlite3.Error, pd.io.sql.DatabaseError) as e:
                     # Se la tabella non può essere letta, registra un errore e passa alla successiva.
                     logger.error(f"Errore durante la lettura della tabella '{table_name}': {e}. Tabella saltata.")
+                    errors += 1
                     continue
 
                 # Se la tabella è vuota, non c'è nulla da processare.
@@ -73,39 +171,49 @@ def normalize_missing_data_by_interpolation():
                 df.sort_values([config.colonna_regione, config.colonna_anno], inplace=True)
 
                 # --- Logica di Interpolazione ---
-                # Raggruppa i dati per regione e applica l'interpolazione a ogni gruppo.
-                # 'transform' è efficiente perché applica la funzione a ogni gruppo e restituisce una Serie
-                # con lo stesso indice del DataFrame originale, facilitando l'assegnazione.
-                interpolated_series = df.groupby(config.colonna_regione)[value_col].transform(
-                    # Usa una funzione lambda per applicare l'interpolazione lineare.
-                    # L'interpolazione viene eseguita solo se ci sono almeno 2 punti dati validi per quella regione.
-                    lambda s: s.interpolate(method='linear').round(2) if s.count() >= 2 else s
-                )
+                # Interpola tutte le regioni insieme sulla matrice anno x regione, senza chiamate Python per regione.
+                interpolated_values, filled_mask = interpola_per_regione(df, value_col)
 
                 # --- Logging dei cambiamenti ---
-                # Crea una maschera booleana per identificare dove un valore NaN è stato riempito.
-                filled_mask = df[value_col].isna() & interpolated_series.notna()
                 # Calcola il numero di valori riempiti in questa tabella.
-                nans_filled_this_table = filled_mask.sum()
+                nans_filled_this_table = int(filled_mask.sum())
 
-                # Se sono stati riempiti dei valori, logga i dettagli per ciascuno.
+                # Un solo record di riepilogo per tabella (anni riempiti per regione) invece di una riga per valore.
                 if nans_filled_this_table > 0:
-                    for index, row in df[filled_mask].iterrows():
-                        new_value = interpolated_series.loc[index]
-                        logger.info(
-                            f"Tabella '{table_name}', Regione '{row[config.colonna_regione]}', "
-                            f"Anno '{row[config.colonna_anno]}': Valore NaN interpolato a {new_value}."
-                        )
+                    filled = df.loc[filled_mask, [config.colonna_regione, config.colonna_anno]]
+                    # Le regioni sono codici interi: nel riepilogo vengono riportati i nomi.
+                    nomi_regioni = nomi(conn, config.colonna_regione)
+                    riepilogo = {
+                        "tabella": table_name,
+                        "valori_riempiti": nans_filled_this_table,
+                        "anni_per_regione": {nomi_regioni[regione]: sorted(int(anno) for anno in anni)
+                                             for regione, anni in filled.groupby(config.colonna_regione)[
+                                                 config.colonna_anno]},
+                    }
+                    logger.info(f"Valori NaN interpolati: {json.dumps(riepilogo, ensure_ascii=False)}")
 
-                # Aggiorna la colonna nel DataFrame con i dati interpolati.
-                df[value_col] = interpolated_series
+                # Celle da riscrivere: quelle riempite e quelle il cui valore cambia con l'arrotondamento.
+                original_values = df[value_col].to_numpy(dtype=float)
+                changed_mask = filled_mask | (~np.isnan(original_values) & (interpolated_values != original_values))
+                changed = df.loc[changed_mask, [config.colonna_anno, config.colonna_regione]]
+                updates = list(zip(interpolated_values[changed_mask].tolist(),
+                                   changed[config.colonna_anno].tolist(), changed[config.colonna_regione].tolist()))
 
                 # --- Salvataggio nel Database ---
                 try:
-                    # Riordina le colonne per farle corrispondere all'ordine originale prima di salvare.
-                    final_df = df.reindex(columns=original_df.columns)
-                    # Salva il DataFrame aggiornato nel database, sostituendo la tabella esistente.
-                    final_df.to_sql(table_name, conn, if_exists='replace', index=False)
+                    # Aggiorna solo le celle cambiate, con un'unica executemany in una sola transazione: la tabella,
+                    # i suoi indici e le righe invariate restano come sono. I trigger delle serie materializzate
+                    # ricalcolano solo i gruppi (Anno, Macro Area) toccati.
+                    if updates:
+                        with atomic(conn):
+                            conn.executemany(
+                                f'UPDATE "{table_name}" SET "{value_col}" = ? '
+                                f'WHERE "{config.colonna_anno}" = ? AND "{config.colonna_regione}" = ?',
+                                updates
+                            )
+                            # Incrementa la versione dei dati della tabella per invalidare le cache dell'API.
+                            bump_data_version(conn, [table_name])
+                        logger.debug(f"Tabella '{table_name}': {len(updates)} celle aggiornate.")
 
                     # Logga un messaggio di successo basato sul fatto che siano stati riempiti o meno dei valori.
                     if nans_filled_this_table > 0:
@@ -122,6 +230,7 @@ def normalize_missing_data_by_interpolation():
                     # Gestisce errori durante la scrittura nel database.
                     logger.error(f"Errore durante la scrittura dei dati per la tabella '{table_name}': {e}",
                                  exc_info=True)
+                    errors += 1
 
             # Logga un riepilogo finale al termine di tutte le operazioni.
             logger.info(
@@ -133,9 +242,12 @@ def normalize_missing_data_by_interpolation():
     except sqlite3.Error as e:
         # Gestisce errori specifici di SQLite.
         logger.error(f"Errore database SQLite durante il post-processing: {e}", exc_info=True)
+        return False
     except Exception as e:
         # Gestisce qualsiasi altro errore generico.
         logger.error(f"Errore generico durante il post-processing: {e}", exc_info=True)
+        return False
+    return errors == 0
 
 
 # Questo blocco viene eseguito solo se lo script è lanciato direttamente.
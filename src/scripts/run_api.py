@@ -1,31 +1,97 @@
+# Importa argparse per leggere le opzioni di avvio dalla riga di comando.
+import argparse
+# Importa asyncio per eseguire il riscaldamento delle cache nell'executor del database.
+import asyncio
 # Importa uvicorn, che è un server ASGI (Asynchronous Server Gateway Interface) per eseguire l'applicazione.
 import uvicorn
+# Importa asynccontextmanager per definire le operazioni di avvio e arresto dell'applicazione.
+from contextlib import asynccontextmanager
+# Importa sqlite3 per riconoscere gli errori del database durante i controlli di avvio.
+import sqlite3
 # Importa la classe principale FastAPI per creare l'API.
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, status
 
 # Importa i router definiti in altri file per organizzare gli endpoint.
-from src.api import table_routes, series_routes
+from src.api import table_routes, series_routes, metrics_routes, plot_routes, bulk_routes
 # Importa le configurazioni dell'applicazione (es. livello di log).
 from src.configurations import config
+# Importa il pool di connessioni, la cache delle risposte e l'executor condivisi dalle rotte.
+from src.api.async_fetch import create_db_executor, run_in_db_executor
+from src.api.compressione import CompressioneMiddleware
+from src.api.fetch_from_db import year_range_uses_index
+from src.api.response_cache import ResponseCache
+from src.api.riscaldamento import riscalda_cache
+from src.database.connection_pool import SQLiteConnectionPool
+from src.database.data_version import DataVersionCache
+from src.database.schema import SCHEMAS
 # Importa la funzione per impostare il logger.
 from src.logging.log_setup import get_logger
 
 # Inizializza il logger per questo modulo, per registrare eventi e informazioni.
 logger = get_logger(__name__)
 
+
+# Definisce le operazioni eseguite all'avvio e allo spegnimento dell'applicazione.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Crea il pool di connessioni in sola lettura e lo rende disponibile alle rotte tramite 'app.state'.
+    app.state.db_pool = SQLiteConnectionPool(config.DB_DIR)
+    # Crea la cache delle risposte già serializzate.
+    app.state.response_cache = ResponseCache()
+    # Crea la cache dei grafici già generati, separata da quella dei dati perché le voci sono molto più grandi.
+    app.state.plot_cache = ResponseCache(max_entries=config.api_plot_cache_max_entries)
+    # Mantiene in memoria le versioni dei dati, da cui derivano ETag e Last-Modified delle risposte.
+    app.state.data_versions = DataVersionCache(config.DB_DIR)
+    # Crea l'executor in cui gli endpoint asincroni eseguono le letture bloccanti da SQLite.
+    app.state.db_executor = create_db_executor()
+    # Il worker è pronto a ricevere traffico solo dopo il riscaldamento delle cache (vedi /pronto).
+    app.state.pronto = False
+    try:
+        # Apre subito le connessioni, così le prime richieste non pagano il costo di apertura.
+        app.state.db_pool.open()
+        # Controlla che le query per intervallo di anni usino gli indici creati da importazione e calcolo.
+        with app.state.db_pool.connection() as conn:
+            for table_name in SCHEMAS:
+                try:
+                    if not year_range_uses_index(table_name, conn):
+                        logger.warning(f"Le query per anno sulla tabella '{table_name}' non usano un indice. "
+                                       "Rieseguire importazione e calcolo delle serie.")
+                except sqlite3.Error:
+                    logger.warning(f"Tabella '{table_name}' non presente nel database.")
+    except FileNotFoundError:
+        # Il pool verrà aperto alla prima richiesta, quando il database sarà stato creato.
+        logger.warning(f"Database '{config.DB_DIR}' non ancora presente: pool non aperto all'avvio.")
+    # Riscalda le cache prima che il server accetti richieste: il worker riceve traffico già con le risposte
+    # più richieste in memoria, senza picchi di latenza durante i riavvii.
+    await asyncio.get_running_loop().run_in_executor(app.state.db_executor, riscalda_cache, app)
+    yield
+    # Attende la fine delle letture in corso e chiude tutte le connessioni allo spegnimento del server.
+    app.state.db_executor.shutdown(wait=True)
+    app.state.db_pool.close()
+
 # Crea un'istanza dell'applicazione FastAPI.
 # Vengono forniti metadati come titolo, versione e descrizione, che saranno visibili nella documentazione automatica (es. /docs).
 app = FastAPI(
     title="API dati di Pesca",
     version="1.0",
     description="API per l'esportazione di dati di Pesca e Serie Calcolate",
+    lifespan=lifespan,
 )
 
+# Comprime le risposte secondo l'intestazione Accept-Encoding del client (gzip, brotli o zstd).
+app.add_middleware(CompressioneMiddleware)
+
 # Include il router per le rotte relative alle tabelle del database.
 # Tutti gli endpoint definiti in 'table_routes' saranno disponibili sotto l'applicazione principale.
 app.include_router(table_routes.router)
 # Include il router per le rotte relative alle serie calcolate.
 app.include_router(series_routes.router)
+# Include il router per la lettura di più serie e tabelle con una sola richiesta.
+app.include_router(bulk_routes.router)
+# Include il router per i grafici delle serie calcolate.
+app.include_router(plot_routes.router)
+# Include il router per le metriche di funzionamento dell'API.
+app.include_router(metrics_routes.router)
 
 
 # Definisce un endpoint per la radice ("/") dell'API.
@@ -42,11 +108,41 @@ async def read_root():
         "message": "Benvenuto nell'API di dati di esca, consulta /docs per la interrogare il database ed esportare i dati"}
 
 
+# Definisce un endpoint di readiness, da interrogare prima di inviare traffico al worker.
+@app.get("/pronto", tags=["Stato"])
+async def get_pronto(request: Request):
+    """
+    Risponde 200 quando il riscaldamento delle cache del worker è completato, altrimenti 503.
+    """
+    if not request.app.state.pronto:
+        # Il database potrebbe essere stato creato dopo l'avvio: il riscaldamento viene ritentato.
+        await run_in_db_executor(request, riscalda_cache, request.app)
+    if not request.app.state.pronto:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Riscaldamento delle cache non completato.")
+    return {"pronto": True}
+
+
 # Questo blocco di codice viene eseguito solo se lo script è lanciato direttamente (es. 'python run_api.py').
 # Non viene eseguito se il modulo è importato da un altro script.
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Avvia il server dell'API.")
+    parser.add_argument("--produzione", action="store_true",
+                        help=f"avvia più processi worker ({config.api_workers}, da config.api_workers)")
+    parser.add_argument("--workers", type=int, help="numero di processi worker, in alternativa a --produzione")
+    parser.add_argument("--host", default=config.api_host, help="indirizzo su cui restare in ascolto")
+    parser.add_argument("--port", type=int, default=config.api_port, help="porta su cui restare in ascolto")
+    parser.add_argument("--keep-alive", type=int, default=config.api_timeout_keep_alive,
+                        help="secondi di attesa di una nuova richiesta su una connessione keep-alive")
+    args = parser.parse_args()
+    workers = args.workers or (config.api_workers if args.produzione else 1)
+
     # Avvia il server uvicorn per servire l'applicazione FastAPI.
-    # 'host="127.0.0.1"' rende il server accessibile alla macchina sulla rete.
-    # 'port=8000' imposta la porta su cui il server ascolterà.
     # 'log_level' imposta il livello di verbosità dei log del server, preso dalla configurazione.
-    uvicorn.run(app, host="127.0.0.1", port=8000, log_level=config.log_level)
\ No newline at end of file
+    opzioni = dict(host=args.host, port=args.port, timeout_keep_alive=args.keep_alive, log_level=config.log_level)
+    if workers > 1:
+        # Con più processi uvicorn importa l'applicazione in ogni worker: serve il percorso di importazione.
+        # Ogni worker esegue il proprio lifespan e inizia ad accettare connessioni solo dopo il riscaldamento.
+        uvicorn.run("src.scripts.run_api:app", workers=workers, **opzioni)
+    else:
+        uvicorn.run(app, **opzioni)
\ No newline at end of file
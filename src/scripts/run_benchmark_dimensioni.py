@@ -0,0 +1,80 @@
+# src/scripts/run_benchmark_dimensioni.py
+
+# Importa argparse per leggere le opzioni dalla riga di comando.
+import argparse
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+import pandas as pd
+
+# Importa le configurazioni, per il percorso del database e i nomi di tabelle e colonne.
+from src.configurations import config
+# Importa le funzioni della dimensione delle regioni (codici interi e nomi).
+from src.database.dimensioni import macro_aree_delle_regioni, nomi
+# Importa la funzione per ottenere un'istanza del logger.
+from src.logging.log_setup import get_logger
+
+# Inizializza il logger per questo modulo.
+logger = get_logger(__name__)
+
+
+def _misura(funzione, ripetizioni: int) -> float:
+    # Tempo medio di esecuzione della funzione, in millisecondi.
+    inizio = time.perf_counter()
+    for _ in range(ripetizioni):
+        funzione()
+    return (time.perf_counter() - inizio) / ripetizioni * 1000
+
+
+def benchmark(repliche: int = 1000, ripetizioni: int = 10):
+    """
+    Confronta il calcolo delle serie per macro area con regioni e macro aree come stringhe (map() sui nomi,
+    come prima della codifica) e come codici interi / Categorical. La tabella della produttività viene
+    replicata 'repliche' volte per ottenere un volume di dati misurabile.
+    """
+    table_name, value_col = config.tabella_produttivita_pesca, config.colonna_produttivita
+    with closing(sqlite3.connect(Path(config.DB_DIR))) as conn:
+        codici = pd.read_sql_query(
+            f'SELECT "{config.colonna_anno}", "{config.colonna_regione}", "{value_col}" FROM "{table_name}"', conn)
+        nomi_regioni = nomi(conn, config.colonna_regione)
+    codici = pd.concat([codici] * repliche, ignore_index=True)
+    keys = [config.colonna_anno, config.colonna_macro_area]
+
+    # Percorso a stringhe: nomi delle regioni come oggetti Python e map() per riga sulla configurazione.
+    stringhe = codici.assign(**{config.colonna_regione: [nomi_regioni[c] for c in codici[config.colonna_regione]]})
+
+    def con_stringhe():
+        df = stringhe.assign(**{config.colonna_macro_area: stringhe[config.colonna_regione].map(config.macro_aree)})
+        return df.groupby(keys, dropna=False)[value_col].agg(["sum", "count"])
+
+    # Percorso a codici: macro area per indicizzazione NumPy e groupby su interi.
+    def con_codici():
+        df = codici.assign(**{config.colonna_macro_area:
+                              macro_aree_delle_regioni(codici[config.colonna_regione].to_numpy())})
+        return df.groupby(keys)[value_col].agg(["sum", "count"])
+
+    memoria = {
+        "stringhe": stringhe[config.colonna_regione].memory_usage(deep=True, index=False),
+        "codici": codici[config.colonna_regione].memory_usage(deep=True, index=False),
+        "categoriale": pd.Categorical.from_codes(codici[config.colonna_regione], nomi_regioni).memory_usage(deep=True),
+    }
+    tempo_stringhe = _misura(con_stringhe, ripetizioni)
+    tempo_codici = _misura(con_codici, ripetizioni)
+
+    logger.info(f"Righe: {len(codici)}. Memoria della colonna '{config.colonna_regione}': "
+                + ", ".join(f"{nome} {byte / 1024:.1f} KiB" for nome, byte in memoria.items()))
+    logger.info(f"Macro area + groupby: stringhe {tempo_stringhe:.2f} ms, codici {tempo_codici:.2f} ms "
+                f"({tempo_stringhe / tempo_codici:.1f}x)")
+
+
+# Questo blocco viene eseguito solo se lo script è lanciato direttamente.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Confronta tempi e memoria del raggruppamento per macro area con stringhe e con codici interi.")
+    parser.add_argument("--repliche", type=int, default=1000,
+                        help="quante volte replicare la tabella della produttività")
+    parser.add_argument("--ripetizioni", type=int, default=10, help="numero di esecuzioni misurate")
+    args = parser.parse_args()
+    benchmark(args.repliche, args.ripetizioni)
@@ -0,0 +1,76 @@
+# src/scripts/run_benchmark_formati.py
+
+# Importa argparse per leggere le opzioni dalla riga di comando.
+import argparse
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+# Importa le funzioni di serializzazione usate dalle rotte dei dati, una per formato.
+from src.api.serialization import (FORMATI_ARROW, csv_header, encode_arrow, encode_columns, encode_csv_rows,
+                                   encode_rows, formati_disponibili)
+# Importa le configurazioni, per il percorso del database e i nomi delle tabelle.
+from src.configurations import config
+# Importa la costruzione della query (con i nomi delle dimensioni decodificati) e i tipi Arrow delle colonne.
+from src.database.data_access import costruisci_query, tipi_arrow
+# Importa la funzione per ottenere un'istanza del logger.
+from src.logging.log_setup import get_logger
+
+# Inizializza il logger per questo modulo.
+logger = get_logger(__name__)
+
+
+def _misura(funzione, ripetizioni: int) -> tuple[float, int]:
+    # Tempo medio di esecuzione della funzione, in millisecondi, e dimensione in byte del risultato.
+    inizio = time.perf_counter()
+    for _ in range(ripetizioni):
+        body = funzione()
+    return (time.perf_counter() - inizio) / ripetizioni * 1000, len(body)
+
+
+def benchmark(repliche: int = 100, ripetizioni: int = 10):
+    """
+    Misura tempo di codifica e dimensione del corpo della risposta per ogni formato dei dati disponibile
+    (JSON a record e a colonne, CSV e, se pyarrow è installato, Arrow IPC e Parquet), partendo dalle righe
+    della tabella della produttività come le restituisce il cursore. La tabella viene replicata
+    'repliche' volte per ottenere un volume di dati misurabile.
+    """
+    table_name = config.tabella_produttivita_pesca
+    query, params = costruisci_query(table_name)
+    with closing(sqlite3.connect(Path(config.DB_DIR))) as conn:
+        cursor = conn.execute(query, params)
+        columns = [description[0] for description in cursor.description]
+        rows = cursor.fetchall() * repliche
+
+    codifiche = {
+        "json": lambda: b"[" + encode_rows(columns, rows) + b"]",
+        "json (colonne)": lambda: encode_columns(columns, rows),
+        "csv": lambda: csv_header(columns) + encode_csv_rows(rows),
+    }
+    disponibili = formati_disponibili()
+    for formato in FORMATI_ARROW:
+        if formato in disponibili:
+            # Il valore predefinito lega il formato di questa iterazione alla funzione.
+            codifiche[formato] = lambda formato=formato: encode_arrow(columns, rows, tipi_arrow(table_name), formato)
+        else:
+            logger.warning(f"Formato '{formato}' non misurato: richiede il pacchetto 'pyarrow'.")
+
+    logger.info(f"Righe: {len(rows)}.")
+    risultati = {nome: _misura(codifica, ripetizioni) for nome, codifica in codifiche.items()}
+    # Il JSON a record, il formato predefinito dell'API, è il riferimento per tempi e dimensioni.
+    tempo_json, byte_json = risultati["json"]
+    for nome, (tempo, byte) in risultati.items():
+        logger.info(f"{nome:>15}: {tempo:8.2f} ms ({tempo / tempo_json:.2f}x), "
+                    f"{byte / 1024:9.1f} KiB ({byte / byte_json:.0%} del JSON)")
+
+
+# Questo blocco viene eseguito solo se lo script è lanciato direttamente.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Confronta tempo di codifica e dimensione delle risposte dei dati nei diversi formati.")
+    parser.add_argument("--repliche", type=int, default=100,
+                        help="quante volte replicare la tabella della produttività")
+    parser.add_argument("--ripetizioni", type=int, default=10, help="numero di esecuzioni misurate")
+    args = parser.parse_args()
+    benchmark(args.repliche, args.ripetizioni)
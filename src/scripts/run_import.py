@@ -1,5 +1,10 @@
+# Importa argparse per leggere le opzioni dalla riga di comando.
+import argparse
+
 # Importa la funzione 'csv_to_sql' dal modulo db_operations, che gestisce l'importazione dei dati.
 from src.database.db_operations import csv_to_sql
+# Importa le configurazioni, per i valori predefiniti delle opzioni.
+from src.configurations import config
 # Importa la funzione per ottenere un'istanza del logger.
 from src.logging.log_setup import get_logger
 
@@ -9,14 +14,14 @@ logger = get_logger(__name__)
 
 
 # Definisce la funzione principale dello script.
-def main():
+def main(incrementale: bool = False, streaming: bool = False, workers: int = 1):
     """
     Funzione principale che avvia il processo di importazione.
     """
     # Logga un messaggio per indicare l'inizio del processo.
     logger.info("Avvio dello script di importazione dati da CSV a database SQLite...")
     # Chiama la funzione che esegue l'importazione dei dati dai file CSV al database.
-    csv_to_sql()
+    csv_to_sql(incrementale=incrementale, streaming=streaming, workers=workers)
     # Logga un messaggio per indicare il completamento del processo.
     logger.info("Script di importazione terminato.")
 
@@ -24,5 +29,17 @@ def main():
 # Questo blocco di codice viene eseguito solo se lo script è lanciato direttamente
 # (es. 'python run_import.py') e non quando viene importato come modulo in un altro script.
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa i file CSV nel database SQLite.")
+    # Con --incrementale vengono reimportati solo i file cambiati dall'ultima esecuzione.
+    parser.add_argument("--incrementale", action="store_true",
+                        help="salta i file invariati e aggiorna solo le righe nuove o modificate")
+    # Con --streaming i file vengono letti e scritti a blocchi, con memoria costante.
+    parser.add_argument("--streaming", action="store_true",
+                        help="legge e scrive i file a blocchi invece di caricarli interamente in memoria")
+    # Con --workers N i file vengono analizzati in parallelo da N processi (non con --streaming).
+    parser.add_argument("--workers", type=int, default=config.import_workers,
+                        help="numero di processi usati per analizzare i file CSV in parallelo "
+                             "(ignorato con --streaming, che importa i file in sequenza)")
+    args = parser.parse_args()
     # Chiama la funzione principale per avviare l'esecuzione.
-    main()
\ No newline at end of file
+    main(incrementale=args.incrementale, streaming=args.streaming, workers=args.workers)
\ No newline at end of file
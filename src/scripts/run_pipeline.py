@@ -0,0 +1,40 @@
+# Importa argparse per leggere le opzioni dalla riga di comando.
+import argparse
+
+# Importa le configurazioni, per i valori predefiniti delle opzioni.
+from src.configurations import config
+# Importa il runner della pipeline e il grafo dei nodi (importazione, interpolazione, serie, grafici).
+from src.pipeline.dag import Pipeline
+from src.pipeline.nodes import costruisci_nodi
+# Importa la funzione per ottenere un'istanza del logger.
+from src.logging.log_setup import get_logger
+
+# Inizializza il logger per questo modulo.
+logger = get_logger(__name__)
+
+
+# Definisce la funzione principale dello script.
+def main(workers: int = config.pipeline_workers, forza: bool = False, grafici: bool = True) -> bool:
+    """
+    Esegue l'intera pipeline in ordine di dipendenza, saltando i passi già aggiornati.
+    Restituisce True se nessun nodo è fallito.
+    """
+    logger.info("Avvio della pipeline...")
+    esiti = Pipeline(costruisci_nodi(includi_grafici=grafici), workers=workers, forza=forza).esegui()
+    return all(esito.stato in ("eseguito", "aggiornato") for esito in esiti.values())
+
+
+# Questo blocco viene eseguito solo se lo script è lanciato direttamente.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Esegue importazione, interpolazione, serie calcolate e grafici, saltando i passi già aggiornati.")
+    # Con --workers N i nodi indipendenti vengono eseguiti da N thread.
+    parser.add_argument("--workers", type=int, default=config.pipeline_workers,
+                        help="numero di nodi indipendenti eseguiti in parallelo")
+    # Con --forza tutti i nodi vengono rieseguiti.
+    parser.add_argument("--forza", action="store_true", help="riesegue tutti i nodi ignorando le impronte salvate")
+    # Con --senza-grafici la pipeline si ferma alle serie calcolate.
+    parser.add_argument("--senza-grafici", action="store_true", help="non genera i grafici")
+    args = parser.parse_args()
+    # Esce con codice 1 se almeno un nodo non è stato completato.
+    raise SystemExit(0 if main(workers=args.workers, forza=args.forza, grafici=not args.senza_grafici) else 1)
@@ -1,7 +1,12 @@
-# Importa la funzione per creare i grafici.
-from src.generate_plots.create_plots import crea_grafico_serie
-# Importa le configurazioni (nomi di tabelle, colonne, ecc.).
+# Importa argparse per leggere le opzioni dalla riga di comando.
+import argparse
+
+# Importa le configurazioni, per i valori predefiniti delle opzioni.
 from src.configurations import config
+# Importa la funzione per generare i grafici come file, in parallelo.
+from src.generate_plots.batch import renderizza_grafici
+# Importa la funzione per creare i grafici e la descrizione dei grafici da generare.
+from src.generate_plots.create_plots import FORMATI, GRAFICI, crea_grafico_serie
 # Importa la funzione per ottenere un'istanza del logger.
 from src.logging.log_setup import get_logger
 
@@ -10,64 +15,37 @@ logger = get_logger(__name__)
 
 
 # Definisce la funzione principale dello script.
-def main():
+def main(batch: bool = False, formati: tuple[str, ...] = config.grafici_formati,
+         workers: int = config.grafici_workers, forza: bool = False):
     """
     Funzione principale per eseguire la generazione di tutti i grafici delle serie calcolate.
+    In modalità batch i grafici vengono scritti come file (senza browser), in parallelo.
     """
     # Logga un messaggio per indicare l'inizio dell'esecuzione dello script.
     logger.info("--- Avvio dello script di generazione grafici ---")
 
     # Utilizza un blocco try...except per catturare eventuali errori durante la generazione dei grafici.
     try:
-        # --- Grafico 1: Media Variazione % Occupazione per Macro Aree ---
-        # Logga l'inizio della generazione del primo grafico.
-        logger.info("Generazione grafico: Media Variazione % Occupazione per Macroarea")
-        # Chiama la funzione per creare il grafico, passando i parametri specifici.
-        crea_grafico_serie(
-            table_name=config.tabella_medie_macroaree_occupazione_pesca,
-            y_col=config.colonna_media_macroarea_variazione_percentuale_occupazione,
-            color_col=config.colonna_macro_area,  # Usa la macro area per differenziare le linee con colori diversi.
-            title="Media Variazione % Occupazione per Macroarea",
-            y_axis_title="Variazione Percentuale (%)"
-        )
-
-        # --- Grafico 2: Media Variazione % Occupazione Nazionale ---
-        logger.info("Generazione grafico: Media Variazione % Occupazione Nazionale")
-        crea_grafico_serie(
-            table_name=config.tabella_media_nazionale_occupazione_pesca,
-            y_col=config.colonna_media_nazionale_variazione_percentuale_occupazione,
-            title="Media Variazione % Occupazione Nazionale",
-            y_axis_title="Variazione Percentuale (%)"
-        )
-
-        # --- Grafico 3: Produttività Totale per Macro Aree ---
-        logger.info("Generazione grafico: Produttività Totale per Macroarea")
-        crea_grafico_serie(
-            table_name=config.tabella_totali_macroaree_produttivita_pesca,
-            y_col=config.colonna_totale_macroarea_produttivita,
-            color_col=config.colonna_macro_area,  # Usa la macro area per i colori.
-            title="Produttività Totale per Macroarea",
-            y_axis_title="Produttività Totale (migliaia di €)"
-        )
-
-        # --- Grafico 4: Produttività Totale Nazionale ---
-        logger.info("Generazione grafico: Produttività Totale Nazionale")
-        crea_grafico_serie(
-            table_name=config.tabella_totale_nazionale_produttivita_pesca,
-            y_col=config.colonna_totale_nazionale_produttivita,
-            title="Produttività Totale Nazionale",
-            y_axis_title="Produttività Totale (migliaia di €)"
-        )
+        if batch:
+            # Scrive i grafici nella cartella di output, saltando quelli con i dati invariati.
+            if renderizza_grafici(formati=formati, workers=workers, forza=forza):
+                logger.info("--- Tutti i grafici sono stati generati con successo. ---")
+            else:
+                logger.error("--- Alcuni grafici non sono stati generati. ---")
+            return
 
-        # --- Grafico 5: Media % Valore Aggiunto per Macro Aree ---
-        logger.info("Generazione grafico: Media % Valore Aggiunto per Macroarea")
-        crea_grafico_serie(
-            table_name=config.tabella_medie_macroaree_valore_aggiunto_pesca,
-            y_col=config.colonna_media_macroarea_percentuale_valore_aggiunto,
-            color_col=config.colonna_macro_area,  # Usa la macro area per i colori.
-            title="Media % Valore Aggiunto per Macroarea",
-            y_axis_title="Valore Aggiunto Medio (%)"
-        )
+        # Genera i grafici descritti in GRAFICI (serie per macro area e nazionali), uno alla volta.
+        for grafico in GRAFICI:
+            # Logga l'inizio della generazione del grafico.
+            logger.info(f"Generazione grafico: {grafico.title}")
+            # Chiama la funzione per creare il grafico, passando i parametri specifici.
+            crea_grafico_serie(
+                table_name=grafico.table_name,
+                y_col=grafico.y_col,
+                color_col=grafico.color_col,  # La macro area differenzia le linee con colori diversi.
+                title=grafico.title,
+                y_axis_title=grafico.y_axis_title
+            )
 
         # Logga un messaggio di successo al termine della generazione di tutti i grafici.
         logger.info("--- Tutti i grafici sono stati generati con successo. ---")
@@ -81,5 +59,16 @@ def main():
 
 # Questo blocco viene eseguito solo se lo script è lanciato direttamente.
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera i grafici delle serie calcolate.")
+    # Con --batch i grafici vengono scritti in file invece di essere aperti nel browser.
+    parser.add_argument("--batch", action="store_true",
+                        help=f"scrive i grafici come file in '{config.grafici_dir}' invece di mostrarli")
+    parser.add_argument("--formati", nargs="+", choices=list(FORMATI), default=list(config.grafici_formati),
+                        help="formati dei file generati in modalità batch")
+    parser.add_argument("--workers", type=int, default=config.grafici_workers,
+                        help="processi usati per generare i grafici in parallelo")
+    parser.add_argument("--forza", action="store_true",
+                        help="rigenera anche i grafici delle tabelle non cambiate")
+    args = parser.parse_args()
     # Chiama la funzione principale per avviare la generazione dei grafici.
-    main()
\ No newline at end of file
+    main(batch=args.batch, formati=tuple(args.formati), workers=args.workers, forza=args.forza)
\ No newline at end of file
@@ -1,38 +1,43 @@
 # src/scripts/run_serie_calcolate.py
 
+# Importa argparse per leggere le opzioni dalla riga di comando.
+import argparse
+
+# Importa le configurazioni, per i valori predefiniti delle opzioni.
+from src.configurations import config
 # Importa la funzione per ottenere un'istanza del logger.
 from src.logging.log_setup import get_logger
 
-# Importa tutte le funzioni di calcolo delle serie derivate.
-# Ogni funzione è responsabile del calcolo di una specifica metrica
-from src.serie_calcolate.calcolo_media_occupazione_macroaree import calcola_media_occupazione_macroaree
-from src.serie_calcolate.calcolo_media_occupazione_nazionale import calcola_media_occupazione_nazionale
-from src.serie_calcolate.calcolo_media_valore_aggiunto_macroaree import calcola_media_valore_aggiunto_macroaree
-from src.serie_calcolate.calcolo_produttivita_macroaree import calcola_produttivita_macroaree
-from src.serie_calcolate.calcolo_produttivita_nazionale import calcola_produttivita_nazionale
+# Importa il motore delle serie calcolate, che calcola tutte le serie derivate
+# descritte dalle specifiche dichiarative in un unico passaggio.
+from src.serie_calcolate.engine import calcola_serie, verifica_parita_backend
 
 # Inizializza il logger per questo modulo.
 logger = get_logger(__name__)
 
 
 # Definisce la funzione principale dello script.
-def main():
+def main(backend: str = config.serie_backend, verifica_parita: bool = False):
     """
     Funzione principale che orchestra il calcolo di tutte le serie derivate.
+    Con 'verifica_parita' confronta i backend pandas e SQL invece di scrivere le serie.
     """
     # Logga un messaggio per indicare l'inizio del processo.
     logger.info("Avvio del processo di calcolo delle serie calcolate...")
 
     # Utilizza un blocco try...except per catturare eventuali errori durante l'esecuzione dei calcoli.
     try:
-        # Chiama in sequenza ogni funzione di calcolo.
-        # Ognuna di queste funzioni legge i dati dal database, esegue i calcoli
-        # e salva i risultati in una nuova tabella.
-        calcola_media_occupazione_macroaree()
-        calcola_media_occupazione_nazionale()
-        calcola_media_valore_aggiunto_macroaree()
-        calcola_produttivita_macroaree()
-        calcola_produttivita_nazionale()
+        if verifica_parita:
+            # Confronta i due backend senza modificare il database.
+            if verifica_parita_backend():
+                logger.info("I backend pandas e SQL producono risultati identici.")
+            else:
+                logger.error("I backend pandas e SQL producono risultati diversi.")
+            return
+
+        # Calcola tutte le serie: le aggregazioni vengono eseguite insieme (in memoria con pandas
+        # oppure direttamente in SQLite) e i risultati salvati in un'unica transazione.
+        calcola_serie(backend=backend)
 
         # Logga un messaggio di successo al termine di tutti i calcoli.
         logger.info("Processo di calcolo delle serie calcolate completato.")
@@ -47,5 +52,13 @@ def main():
 # Questo blocco viene eseguito solo se lo script è lanciato direttamente
 # (es. 'python run_serie_calcolate.py').
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calcola le serie derivate e le salva nel database SQLite.")
+    # Con --backend sql le aggregazioni vengono eseguite da SQLite, senza caricare i dati in pandas.
+    parser.add_argument("--backend", choices=["pandas", "sql"], default=config.serie_backend,
+                        help="dove eseguire le aggregazioni delle serie")
+    # Con --verifica-parita i due backend vengono confrontati senza scrivere nulla.
+    parser.add_argument("--verifica-parita", action="store_true",
+                        help="confronta i risultati dei backend pandas e SQL senza modificare il database")
+    args = parser.parse_args()
     # Chiama la funzione principale per avviare l'esecuzione.
-    main()
\ No newline at end of file
+    main(backend=args.backend, verifica_parita=args.verifica_parita)
\ No newline at end of file
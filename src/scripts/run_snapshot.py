@@ -0,0 +1,77 @@
+# src/scripts/run_snapshot.py
+
+# Importa argparse per leggere le opzioni dalla riga di comando.
+import argparse
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+import pandas as pd
+
+# Importa le configurazioni, per il percorso del database.
+from src.configurations import config
+from src.database.schema import SCHEMAS
+# Importa le funzioni per esportare e caricare lo snapshot colonnare.
+from src.database.snapshot import carica_tabella, esporta_snapshot
+# Importa la funzione per ottenere un'istanza del logger.
+from src.logging.log_setup import get_logger
+
+# Inizializza il logger per questo modulo.
+logger = get_logger(__name__)
+
+
+def benchmark(ripetizioni: int = 20):
+    """
+    Confronta, per ogni tabella, il tempo medio di caricamento in un DataFrame da SQLite (read_sql_query)
+    e dallo snapshot mappato in memoria. Il tempo dello snapshot comprende la somma di una colonna,
+    così i dati vengono effettivamente letti e non solo mappati. I file dello snapshot vengono mappati al primo
+    caricamento e riusati dai successivi, come avviene in un processo dell'API.
+    """
+    with closing(sqlite3.connect(Path(config.DB_DIR))) as conn:
+        for table_name in SCHEMAS:
+            value_col = SCHEMAS[table_name].value_columns[0]
+
+            inizio = time.perf_counter()
+            for _ in range(ripetizioni):
+                pd.read_sql_query(f'SELECT * FROM "{table_name}"', conn)[value_col].sum()
+            tempo_sqlite = (time.perf_counter() - inizio) / ripetizioni
+
+            inizio = time.perf_counter()
+            for _ in range(ripetizioni):
+                carica_tabella(table_name)[value_col].sum()
+            tempo_snapshot = (time.perf_counter() - inizio) / ripetizioni
+
+            logger.info(f"Tabella '{table_name}': SQLite {tempo_sqlite * 1000:.3f} ms, "
+                        f"snapshot {tempo_snapshot * 1000:.3f} ms "
+                        f"({tempo_sqlite / tempo_snapshot:.1f}x)")
+
+
+# Definisce la funzione principale dello script.
+def main(esporta: bool = True, esegui_benchmark: bool = False, ripetizioni: int = 20):
+    """
+    Esporta lo snapshot colonnare del database e, se richiesto, misura i tempi di caricamento.
+    """
+    try:
+        if esporta:
+            esporta_snapshot()
+        if esegui_benchmark:
+            benchmark(ripetizioni)
+    except Exception as e:
+        # Logga un messaggio di errore dettagliato, includendo la traccia dell'errore.
+        logger.error(f"Errore durante l'esportazione dello snapshot: {e}", exc_info=True)
+
+
+# Questo blocco viene eseguito solo se lo script è lanciato direttamente.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Esporta lo snapshot colonnare del database SQLite.")
+    # Con --solo-benchmark lo snapshot esistente non viene riscritto.
+    parser.add_argument("--solo-benchmark", action="store_true",
+                        help="non esporta lo snapshot, misura solo i tempi di caricamento")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="dopo l'esportazione confronta i tempi di caricamento da SQLite e dallo snapshot")
+    parser.add_argument("--ripetizioni", type=int, default=20,
+                        help="numero di caricamenti misurati per ogni tabella")
+    args = parser.parse_args()
+    main(esporta=not args.solo_benchmark, esegui_benchmark=args.benchmark or args.solo_benchmark,
+         ripetizioni=args.ripetizioni)
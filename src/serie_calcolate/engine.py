@@ -0,0 +1,190 @@
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.configurations import config
+from src.database.data_access import Interrogazione, leggi_tabella
+from src.database.data_version import bump_data_version
+from src.database.dimensioni import macro_aree_delle_regioni
+from src.database.schema import SCHEMAS, atomic, write_dataframe
+from src.logging.log_setup import get_logger
+from src.serie_calcolate.materialized import materializza_input, ricostruisci_parziali, select_sql
+# SERIE_PER_TABELLA resta importabile da questo modulo, come prima dello spostamento in specs.py.
+from src.serie_calcolate.specs import SERIE, SERIE_PER_TABELLA, SerieSpec  # noqa: F401
+
+logger = get_logger(__name__)
+
+
+def _aggregate_input(df: pd.DataFrame, specs: list[SerieSpec]) -> dict[str, pd.DataFrame]:
+    """
+    Calcola tutte le serie che leggono la stessa tabella di input con un unico groupby().agg().
+
+    Il raggruppamento avviene per (Anno, Macro Area) e per Anno, calcolando somma e conteggio di ogni colonna
+    di valori: le medie si ottengono come somma diviso conteggio, senza rileggere i dati. Le serie nazionali
+    sommano direttamente le righe di ogni anno, come gli script originali e i parziali nazionali del backend SQL:
+    risommare i parziali per macro area cambierebbe l'ordine delle addizioni e, nei casi a metà, round(2).
+    """
+    value_cols = sorted({spec.value_col for spec in specs})
+    aggregazioni = {
+        **{f"{col}__sum": (col, "sum") for col in value_cols},
+        **{f"{col}__count": (col, "count") for col in value_cols},
+    }
+
+    # Le regioni senza macro area formano il gruppo -1: escluse dalle serie per macro area
+    # (come nel calcolo originale), ma comprese nei totali nazionali.
+    partials = {}
+    if any(config.colonna_macro_area in spec.group_by for spec in specs):
+        partials["macro_area"] = df.groupby([config.colonna_anno, config.colonna_macro_area]).agg(
+            **aggregazioni).reset_index()
+    if any(config.colonna_macro_area not in spec.group_by for spec in specs):
+        partials["nazionale"] = df.groupby(config.colonna_anno).agg(**aggregazioni).reset_index()
+
+    results = {}
+    for spec in specs:
+        if config.colonna_macro_area in spec.group_by:
+            grouped = partials["macro_area"][partials["macro_area"][config.colonna_macro_area] >= 0]
+        else:
+            grouped = partials["nazionale"]
+
+        sums = grouped[f"{spec.value_col}__sum"]
+        if spec.aggregation == "sum":
+            values = sums
+        else:
+            # Media come somma / conteggio: un gruppo senza valori validi produce NaN, come mean() di pandas.
+            values = sums / grouped[f"{spec.value_col}__count"].where(grouped[f"{spec.value_col}__count"] > 0)
+
+        risultati_df = grouped[list(spec.group_by)].copy()
+        # Arrotonda i valori a due cifre decimali, come negli script originali.
+        risultati_df[spec.output_col] = values.round(2).to_numpy()
+        results[spec.output_table] = risultati_df.reset_index(drop=True)
+    return results
+
+
+def _calcola_pandas(conn: sqlite3.Connection, specs: list[SerieSpec]) -> dict[str, pd.DataFrame]:
+    """
+    Calcola le serie in memoria con pandas e restituisce un DataFrame per ogni tabella di output.
+    """
+    # Raggruppa le serie per tabella di input, così ogni tabella viene letta una volta sola.
+    specs_per_input: dict[str, list[SerieSpec]] = {}
+    for spec in specs:
+        specs_per_input.setdefault(spec.input_table, []).append(spec)
+
+    results = {}
+    for input_table, input_specs in specs_per_input.items():
+        value_cols = sorted({spec.value_col for spec in input_specs})
+        columns = [config.colonna_anno, config.colonna_regione] + value_cols
+        # Legge solo le colonne necessarie, con le regioni come codici interi (dallo snapshot, se abilitato).
+        df = leggi_tabella(input_table, Interrogazione(colonne=tuple(columns)), conn=conn, decodifica=False)
+
+        # Le regioni sono codici interi: la macro area di ogni riga si ottiene con un'indicizzazione NumPy.
+        df[config.colonna_macro_area] = macro_aree_delle_regioni(df[config.colonna_regione].to_numpy())
+
+        results.update(_aggregate_input(df, input_specs))
+        logger.info(f"Tabella '{input_table}' letta e aggregata per {len(input_specs)} serie")
+    return results
+
+
+def uguali_dopo_arrotondamento(arrotondati, valori, ulp: int = 4) -> np.ndarray:
+    """
+    Confronta valori già arrotondati a due decimali con valori non arrotondati calcolati in un altro modo
+    (es. TOTAL() di SQLite invece della somma compensata di pandas). Due somme che differiscono solo
+    nelle ultime cifre binarie possono cadere da parti opposte di un caso a metà (.xx5): il valore coincide
+    se round(2) lo restituisce spostando il valore al più di 'ulp' unità nell'ultima cifra. NaN coincide con NaN.
+    """
+    arrotondati = np.asarray(arrotondati, dtype=float)
+    valori = np.asarray(valori, dtype=float)
+    tolleranza = ulp * np.spacing(np.abs(valori))
+    uguali = np.isnan(arrotondati) & np.isnan(valori)
+    for delta in (-tolleranza, 0.0, tolleranza):
+        uguali |= np.round(valori + delta, 2) == arrotondati
+    return uguali
+
+
+def verifica_parita_backend(specs: list[SerieSpec] | None = None) -> bool:
+    """
+    Confronta i risultati del backend pandas e del backend SQL senza modificare il database.
+    Restituisce True se tutte le serie hanno gli stessi gruppi e gli stessi valori arrotondati a due decimali,
+    a meno dell'ultima cifra binaria prima dell'arrotondamento (vedi uguali_dopo_arrotondamento).
+    """
+    specs = SERIE if specs is None else specs
+    with closing(sqlite3.connect(Path(config.DB_DIR))) as conn:
+        pandas_results = _calcola_pandas(conn, specs)
+        # Tabelle dimensione e parziali vengono ricostruiti in una transazione esplicita, annullata al termine.
+        conn.execute("BEGIN")
+        ricostruisci_parziali(conn, specs)
+        parita = True
+        for spec in specs:
+            schema = SCHEMAS[spec.output_table]
+            sql_df = pd.DataFrame(conn.execute(select_sql(spec, arrotonda=False)).fetchall(),
+                                  columns=schema.column_names)
+            pandas_df = pandas_results[spec.output_table].sort_values(list(spec.group_by)).reset_index(drop=True)
+            keys = list(spec.group_by)
+            # Gli stessi gruppi nello stesso ordine, poi i valori confrontati dopo l'arrotondamento.
+            if not pandas_df[keys].astype("int64").equals(sql_df[keys].astype("int64")):
+                parita = False
+                logger.error(f"Gruppi diversi tra pandas e SQL per '{spec.output_table}'")
+                continue
+            diversi = ~uguali_dopo_arrotondamento(pandas_df[spec.output_col], sql_df[spec.output_col])
+            if diversi.any():
+                parita = False
+                logger.error(f"Risultati diversi tra pandas e SQL per '{spec.output_table}': "
+                             f"{pandas_df[diversi].to_dict('records')} / {sql_df[diversi].to_dict('records')}")
+            else:
+                logger.info(f"Parità pandas/SQL verificata per '{spec.output_table}'")
+        conn.rollback()
+    return parita
+
+
+def calcola_serie(specs: list[SerieSpec] | None = None, backend: str = config.serie_backend) -> bool:
+    """
+    Calcola le serie indicate (tutte se non specificate) e salva tutti i risultati nel database
+    in un'unica transazione. Con il backend "pandas" ogni tabella di input viene letta una sola volta
+    in memoria; con il backend "sql" le aggregazioni vengono eseguite direttamente da SQLite.
+
+    In entrambi i casi le serie restano poi materializzate: i trigger sulle tabelle di input aggiornano
+    solo i gruppi toccati da ogni scrittura successiva, senza bisogno di rieseguire il calcolo completo.
+    Restituisce True se tutte le serie sono state calcolate e salvate.
+    """
+    specs = SERIE if specs is None else specs
+    try:
+        db_path = Path(config.DB_DIR)
+
+        with sqlite3.connect(db_path) as conn:
+            logger.info(f"Connessione al database '{db_path}' stabilita")
+
+            results = _calcola_pandas(conn, specs) if backend == "pandas" else None
+
+            # Scrive tutte le serie in un'unica transazione: in caso di errore nessuna tabella viene modificata.
+            with atomic(conn):
+                gia_scritte = set()
+                if backend == "pandas":
+                    for spec in specs:
+                        write_dataframe(conn, SCHEMAS[spec.output_table], results[spec.output_table])
+                    gia_scritte = {spec.output_table for spec in specs}
+                elif backend != "sql":
+                    raise ValueError(f"Backend di calcolo sconosciuto: '{backend}'")
+
+                # Ricostruisce i parziali delle tabelle di input e installa i trigger. Con il backend "sql"
+                # è questo passaggio a scrivere le serie, comprese quelle derivate dalle stesse tabelle di input.
+                output_tables = [spec.output_table for spec in specs]
+                for input_table in dict.fromkeys(spec.input_table for spec in specs):
+                    riscritte = materializza_input(conn, input_table, gia_scritte)
+                    output_tables += [table for table in riscritte if table not in output_tables]
+                # Incrementa la versione dei dati delle tabelle per invalidare le cache dell'API
+                bump_data_version(conn, output_tables)
+
+            for spec in specs:
+                logger.info(f"Serie calcolata e salvata in '{spec.output_table}'")
+            return True
+
+    except sqlite3.Error as e:
+        logger.error(f"Errore SQLite durante l'operazione sul database: {e}", exc_info=True)
+    except KeyError as e:
+        logger.error(f"Errore di configurazione: una chiave attesa non è stata trovata in config. Dettagli: {e}",
+                     exc_info=True)
+    except Exception as e:
+        logger.error(f"Errore generico durante il calcolo delle serie calcolate: {e}", exc_info=True)
+    return False
@@ -0,0 +1,261 @@
+import sqlite3
+
+from src.configurations import config
+from src.database.data_version import bump_data_version
+from src.database.dimensioni import crea_tabelle_dimensioni
+from src.database.schema import SCHEMAS, create_table
+from src.logging.log_setup import get_logger
+from src.serie_calcolate.specs import SERIE, SerieSpec
+
+# Inizializza il logger per questo modulo, per registrare eventi e errori.
+logger = get_logger(__name__)
+
+# Codice di macro area della riga dei parziali con il totale nazionale di ogni anno (tutte le regioni).
+# Le serie nazionali leggono questa riga invece di risommare i parziali delle macro aree.
+MACRO_AREA_NAZIONALE = -2
+
+
+def _letterale(value: str) -> str:
+    # I trigger non accettano parametri: i nomi di tabella e colonna vengono inseriti come letterali SQL.
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _arrotonda_sql(expr: str) -> str:
+    # Arrotonda a due decimali come round(2) di pandas/NumPy (valore * 100, pari più vicino, / 100).
+    # ROUND() di SQLite arrotonda i casi a metà per eccesso: nei casi a metà si usa 2 * ROUND(x / 2),
+    # che è esatto perché la divisione per 2 non introduce errori.
+    x = f"(({expr}) * 100)"
+    return (f"CASE WHEN ABS({x} - CAST({x} AS INTEGER)) = 0.5 THEN 2 * ROUND({x} / 2) / 100.0 "
+            f"ELSE ROUND({x}) / 100.0 END")
+
+
+def _somma_compensata_sql(valore: str) -> tuple[str, str]:
+    # Espressioni SET che aggiungono 'valore' a "somma" con la compensazione di Neumaier: "compensazione"
+    # raccoglie le cifre perse da ogni addizione, così gli aggiornamenti dei trigger non accumulano errori.
+    # Nelle UPDATE di SQLite ogni espressione legge i valori precedenti della riga.
+    nuova = f'("somma" + {valore})'
+    perse = (f'CASE WHEN ABS("somma") >= ABS({valore}) THEN ("somma" - {nuova}) + {valore} '
+             f'ELSE ({valore} - {nuova}) + "somma" END')
+    return f'"somma" = {nuova}', f'"compensazione" = "compensazione" + {perse}'
+
+
+def _crea_tabella_parziali(conn: sqlite3.Connection):
+    # Somme, conteggi dei valori validi e numero di righe per ogni (tabella, colonna, Anno, Macro Area);
+    # il totale di un gruppo è "somma" + "compensazione" (quest'ultima è nulla dopo una ricostruzione).
+    # Le regioni senza macro area sono raccolte nel gruppo -1 (comprese solo nelle serie nazionali);
+    # il gruppo MACRO_AREA_NAZIONALE contiene i totali di tutte le regioni dell'anno.
+    tipi = {name: sql_type for _, name, sql_type, *_ in
+            conn.execute(f'PRAGMA table_info("{config.tabella_serie_parziali}")')}
+    if tipi and (tipi.get(config.colonna_macro_area) != "INTEGER" or "compensazione" not in tipi):
+        # Tabella creata quando la macro area era testuale o senza compensazione: i parziali vengono
+        # comunque ricalcolati.
+        conn.execute(f'DROP TABLE "{config.tabella_serie_parziali}"')
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{config.tabella_serie_parziali}" ('
+        f'"tabella" TEXT NOT NULL, "colonna" TEXT NOT NULL, "{config.colonna_anno}" INTEGER NOT NULL, '
+        f'"{config.colonna_macro_area}" INTEGER NOT NULL, "somma" REAL NOT NULL, "compensazione" REAL NOT NULL, '
+        f'"conteggio" INTEGER NOT NULL, "righe" INTEGER NOT NULL, '
+        f'PRIMARY KEY ("tabella", "colonna", "{config.colonna_anno}", "{config.colonna_macro_area}"))'
+    )
+
+
+def materializzazione_attiva(conn: sqlite3.Connection) -> bool:
+    """
+    Indica se le serie calcolate sono mantenute come viste materializzate (tabella dei parziali presente).
+    """
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                       (config.tabella_serie_parziali,)).fetchone()
+    return row is not None
+
+
+def _ricostruisci_parziali(conn: sqlite3.Connection, input_table: str, value_col: str):
+    # Ricalcola da zero somme e conteggi di una colonna con le funzioni native di SQLite: i dati non escono
+    # dal database. TOTAL() restituisce 0.0 per un gruppo senza valori, come sum() di pandas; senza
+    # compensazione può differire da pandas nell'ultima cifra binaria (vedi uguali_dopo_arrotondamento).
+    conn.execute(f'DELETE FROM "{config.tabella_serie_parziali}" WHERE "tabella" = ? AND "colonna" = ?',
+                 (input_table, value_col))
+    conn.execute(
+        f'INSERT INTO "{config.tabella_serie_parziali}" '
+        f'SELECT ?, ?, t."{config.colonna_anno}", IFNULL(r."macro_area", -1), '
+        f'TOTAL(t."{value_col}"), 0.0, COUNT(t."{value_col}"), COUNT(*) FROM "{input_table}" AS t '
+        f'LEFT JOIN "{config.tabella_dim_regioni}" AS r ON r."id" = t."{config.colonna_regione}" '
+        f'GROUP BY t."{config.colonna_anno}", IFNULL(r."macro_area", -1)',
+        (input_table, value_col)
+    )
+    # Totali nazionali sommati direttamente dalle righe dell'anno, come groupby(Anno).sum() di pandas.
+    conn.execute(
+        f'INSERT INTO "{config.tabella_serie_parziali}" '
+        f'SELECT ?, ?, "{config.colonna_anno}", ?, TOTAL("{value_col}"), 0.0, COUNT("{value_col}"), COUNT(*) '
+        f'FROM "{input_table}" GROUP BY "{config.colonna_anno}"',
+        (input_table, value_col, MACRO_AREA_NAZIONALE)
+    )
+
+
+def ricostruisci_parziali(conn: sqlite3.Connection, specs: list[SerieSpec]):
+    """
+    Ricalcola da zero i parziali (somme e conteggi per Anno e Macro Area) delle colonne usate dalle serie indicate.
+    """
+    crea_tabelle_dimensioni(conn)
+    _crea_tabella_parziali(conn)
+    for input_table, value_col in sorted({(spec.input_table, spec.value_col) for spec in specs}):
+        _ricostruisci_parziali(conn, input_table, value_col)
+
+
+def select_sql(spec: SerieSpec, filtro: str = "", arrotonda: bool = True) -> str:
+    """
+    Restituisce la SELECT che calcola la serie dai parziali memorizzati: le serie per macro area leggono
+    i parziali per (Anno, Macro Area), quelle nazionali i totali per anno (MACRO_AREA_NAZIONALE).
+    Nessun parziale viene risommato, così ricostruzione completa e trigger calcolano ogni gruppo con la stessa
+    espressione. 'filtro' limita i gruppi ricalcolati; con arrotonda=False i valori non sono arrotondati.
+    """
+    anno = f'"{config.colonna_anno}"'
+    macro_area = f'"{config.colonna_macro_area}"'
+    where = f'"tabella" = {_letterale(spec.input_table)} AND "colonna" = {_letterale(spec.value_col)}'
+    if filtro:
+        where += f" AND {filtro}"
+    # La media è somma / conteggio: NULLIF restituisce NULL per un gruppo senza valori, come mean() di pandas.
+    somma = '("somma" + "compensazione")'
+    value = f'{somma} / NULLIF("conteggio", 0)' if spec.aggregation == "mean" else somma
+    if arrotonda:
+        value = _arrotonda_sql(value)
+
+    if config.colonna_macro_area in spec.group_by:
+        # Le regioni senza macro area (-1) e i totali nazionali restano esclusi dalle serie per macro area.
+        return (f'SELECT {anno}, {macro_area}, {value} FROM "{config.tabella_serie_parziali}" '
+                f"WHERE {where} AND {macro_area} >= 0 ORDER BY {anno}, {macro_area}")
+    return (f'SELECT {anno}, {value} FROM "{config.tabella_serie_parziali}" '
+            f'WHERE {where} AND {macro_area} = {MACRO_AREA_NAZIONALE} ORDER BY {anno}')
+
+
+def _macro_area_sql(riga: str) -> str:
+    # Codice della macro area della riga NEW/OLD del trigger (-1 se la regione non ha una macro area).
+    return (f'IFNULL((SELECT r."macro_area" FROM "{config.tabella_dim_regioni}" AS r '
+            f'WHERE r."id" = {riga}."{config.colonna_regione}"), -1)')
+
+
+def _aggiungi_riga_sql(input_table: str, value_col: str, riga: str) -> list[str]:
+    # Aggiunge la riga ai parziali del suo gruppo e al totale nazionale del suo anno:
+    # somma (compensata) e conteggi crescono senza rileggere la tabella.
+    value = f'{riga}."{value_col}"'
+    somma, compensazione = _somma_compensata_sql('excluded."somma"')
+    return [
+        f'INSERT INTO "{config.tabella_serie_parziali}" VALUES ({_letterale(input_table)}, {_letterale(value_col)}, '
+        f'{riga}."{config.colonna_anno}", {macro_area}, IFNULL({value}, 0.0), 0.0, {value} IS NOT NULL, 1) '
+        f'ON CONFLICT ("tabella", "colonna", "{config.colonna_anno}", "{config.colonna_macro_area}") DO UPDATE SET '
+        f'{somma}, {compensazione}, "conteggio" = "conteggio" + excluded."conteggio", '
+        '"righe" = "righe" + excluded."righe"'
+        for macro_area in (_macro_area_sql(riga), MACRO_AREA_NAZIONALE)
+    ]
+
+
+def _rimuovi_riga_sql(input_table: str, value_col: str, riga: str) -> list[str]:
+    # Sottrae la riga dai parziali del suo gruppo e dal totale nazionale, ed elimina i gruppi rimasti senza righe.
+    value = f'{riga}."{value_col}"'
+    somma, compensazione = _somma_compensata_sql(f"-IFNULL({value}, 0.0)")
+    statements = []
+    for macro_area in (_macro_area_sql(riga), MACRO_AREA_NAZIONALE):
+        chiave = (f'"tabella" = {_letterale(input_table)} AND "colonna" = {_letterale(value_col)} '
+                  f'AND "{config.colonna_anno}" = {riga}."{config.colonna_anno}" '
+                  f'AND "{config.colonna_macro_area}" = {macro_area}')
+        statements += [
+            f'UPDATE "{config.tabella_serie_parziali}" SET {somma}, {compensazione}, '
+            f'"conteggio" = "conteggio" - ({value} IS NOT NULL), "righe" = "righe" - 1 WHERE {chiave}',
+            f'DELETE FROM "{config.tabella_serie_parziali}" WHERE {chiave} AND "righe" <= 0',
+        ]
+    return statements
+
+
+def _aggiorna_output_sql(spec: SerieSpec, riga: str) -> list[str]:
+    # Ricalcola nella tabella di output solo il gruppo (Anno, Macro Area) o (Anno) della riga, a partire dai
+    # parziali, con la stessa SELECT della ricostruzione completa: nessuna funzione Python, che nei trigger
+    # non sarebbe disponibile su ogni connessione in scrittura.
+    anno = f'"{config.colonna_anno}" = {riga}."{config.colonna_anno}"'
+    if config.colonna_macro_area in spec.group_by:
+        filtro = f'{anno} AND "{config.colonna_macro_area}" = {_macro_area_sql(riga)}'
+    else:
+        filtro = anno
+    columns_sql = ", ".join(f'"{name}"' for name in list(spec.group_by) + [spec.output_col])
+    return [
+        f'DELETE FROM "{spec.output_table}" WHERE {filtro}',
+        f'INSERT INTO "{spec.output_table}" ({columns_sql}) {select_sql(spec, filtro)}',
+        # Incrementa la versione dei dati della tabella di output per invalidare le cache dell'API.
+        f'INSERT INTO "{config.tabella_versioni_dati}" ("tabella", "versione", "aggiornato_il") '
+        f"VALUES ({_letterale(spec.output_table)}, 1, strftime('%Y-%m-%dT%H:%M:%S+00:00', 'now')) "
+        'ON CONFLICT("tabella") DO UPDATE SET "versione" = "versione" + 1, "aggiornato_il" = excluded."aggiornato_il"',
+    ]
+
+
+def _crea_trigger(conn: sqlite3.Connection, input_table: str, specs: list[SerieSpec]):
+    # Un trigger per evento sulla tabella di input mantiene aggiornati parziali e tabelle di output.
+    value_cols = sorted({spec.value_col for spec in specs})
+
+    def corpo(aggiungi: bool, rimuovi: bool) -> str:
+        statements = []
+        for value_col in value_cols:
+            if rimuovi:
+                statements += _rimuovi_riga_sql(input_table, value_col, "OLD")
+            if aggiungi:
+                statements += _aggiungi_riga_sql(input_table, value_col, "NEW")
+        for spec in specs:
+            if rimuovi:
+                statements += _aggiorna_output_sql(spec, "OLD")
+            if aggiungi:
+                statements += _aggiorna_output_sql(spec, "NEW")
+        return "".join(f"{statement};\n" for statement in statements)
+
+    # L'aggiornamento scatta solo se cambia una chiave o un valore, non per gli upsert che riscrivono gli stessi dati.
+    columns = [config.colonna_anno, config.colonna_regione] + value_cols
+    modificata = " OR ".join(f'OLD."{col}" IS NOT NEW."{col}"' for col in columns)
+    columns_sql = ", ".join(f'"{col}"' for col in columns)
+    eventi = {
+        "insert": ("AFTER INSERT", corpo(aggiungi=True, rimuovi=False)),
+        "update": (f"AFTER UPDATE OF {columns_sql}", corpo(aggiungi=True, rimuovi=True)),
+        "delete": ("AFTER DELETE", corpo(aggiungi=False, rimuovi=True)),
+    }
+    for evento, (quando, statements) in eventi.items():
+        # Il nome del trigger è derivato dalla tabella, come quello degli indici.
+        trigger_name = f"trg_{input_table}_serie_{evento}".replace(" ", "_").replace("-", "_")
+        condizione = f" WHEN {modificata}" if evento == "update" else ""
+        conn.execute(f'DROP TRIGGER IF EXISTS "{trigger_name}"')
+        conn.execute(f'CREATE TRIGGER "{trigger_name}" {quando} ON "{input_table}" FOR EACH ROW{condizione} '
+                     f'BEGIN\n{statements}END')
+
+
+def materializza_input(conn: sqlite3.Connection, input_table: str, gia_scritte: set[str] = frozenset()) -> list[str]:
+    """
+    Ricostruisce da zero i parziali di una tabella di input e le serie che ne derivano, e installa i trigger
+    che da quel momento aggiornano solo i gruppi toccati da ogni scrittura. Le tabelle di output in
+    'gia_scritte' non vengono riscritte. Restituisce le tabelle di output riscritte.
+    Va eseguita all'interno della transazione del chiamante.
+    """
+    specs = [spec for spec in SERIE if spec.input_table == input_table]
+    ricostruisci_parziali(conn, specs)
+    # I trigger aggiornano anche la tabella delle versioni: deve esistere prima della prima scrittura.
+    bump_data_version(conn, [])
+
+    riscritte = []
+    for spec in specs:
+        if spec.output_table in gia_scritte:
+            continue
+        schema = SCHEMAS[spec.output_table]
+        create_table(conn, schema)
+        columns_sql = ", ".join(f'"{name}"' for name in schema.column_names)
+        conn.execute(f'INSERT INTO "{spec.output_table}" ({columns_sql}) {select_sql(spec)}')
+        riscritte.append(spec.output_table)
+
+    _crea_trigger(conn, input_table, specs)
+    logger.debug(f"Serie materializzate per la tabella '{input_table}': {[spec.output_table for spec in specs]}")
+    return riscritte
+
+
+def aggiorna_materializzazione(conn: sqlite3.Connection, input_table: str):
+    """
+    Da chiamare dopo aver ricreato una tabella di input (la ricreazione elimina i suoi trigger): se le serie
+    sono materializzate, ricostruisce quelle che derivano dalla tabella e reinstalla i trigger.
+    Va eseguita all'interno della transazione del chiamante.
+    """
+    if not any(spec.input_table == input_table for spec in SERIE) or not materializzazione_attiva(conn):
+        return
+    riscritte = materializza_input(conn, input_table)
+    bump_data_version(conn, riscritte)
+    logger.info(f"Serie derivate da '{input_table}' ricostruite: {riscritte}")
@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+
+from src.configurations import config
+
+
+@dataclass(frozen=True)
+class SerieSpec:
+    """
+    Descrizione dichiarativa di una serie calcolata.
+    """
+    # Tabella di output in cui salvare la serie.
+    output_table: str
+    # Colonna di output che contiene il valore aggregato.
+    output_col: str
+    # Tabella di input (una delle tabelle originali) e colonna dei valori da aggregare.
+    input_table: str
+    value_col: str
+    # Chiavi di raggruppamento: solo l'anno (serie nazionali) oppure anno e macro area.
+    group_by: tuple[str, ...]
+    # Funzione di aggregazione: "mean" oppure "sum".
+    aggregation: str
+
+
+# Le cinque serie calcolate, nell'ordine in cui venivano calcolate dagli script originali.
+SERIE: list[SerieSpec] = [
+    SerieSpec(config.tabella_medie_macroaree_occupazione_pesca,
+              config.colonna_media_macroarea_variazione_percentuale_occupazione,
+              config.tabella_andamento_occupazione_pesca, config.colonna_variazione_percentuale,
+              (config.colonna_anno, config.colonna_macro_area), "mean"),
+    SerieSpec(config.tabella_media_nazionale_occupazione_pesca,
+              config.colonna_media_nazionale_variazione_percentuale_occupazione,
+              config.tabella_andamento_occupazione_pesca, config.colonna_variazione_percentuale,
+              (config.colonna_anno,), "mean"),
+    SerieSpec(config.tabella_medie_macroaree_valore_aggiunto_pesca,
+              config.colonna_media_macroarea_percentuale_valore_aggiunto,
+              config.tabella_importanza_economica_pesca, config.colonna_percentuale_valore_aggiunto,
+              (config.colonna_anno, config.colonna_macro_area), "mean"),
+    SerieSpec(config.tabella_totali_macroaree_produttivita_pesca,
+              config.colonna_totale_macroarea_produttivita,
+              config.tabella_produttivita_pesca, config.colonna_produttivita,
+              (config.colonna_anno, config.colonna_macro_area), "sum"),
+    SerieSpec(config.tabella_totale_nazionale_produttivita_pesca,
+              config.colonna_totale_nazionale_produttivita,
+              config.tabella_produttivita_pesca, config.colonna_produttivita,
+              (config.colonna_anno,), "sum"),
+]
+
+# Accesso alle specifiche per nome della tabella di output.
+SERIE_PER_TABELLA: dict[str, SerieSpec] = {spec.output_table: spec for spec in SERIE}
@@ -0,0 +1,73 @@
+import shutil
+import sqlite3
+import sys
+from contextlib import closing
+from pathlib import Path
+
+import pytest
+
+# La radice del progetto va nel percorso di importazione: i moduli si importano come 'src. ...'.
+PRJ_ROOT = Path(__file__).resolve().parent.parent
+if str(PRJ_ROOT) not in sys.path:
+    sys.path.insert(0, str(PRJ_ROOT))
+
+from src.configurations import config  # noqa: E402
+
+
+@pytest.fixture
+def progetto(tmp_path, monkeypatch) -> Path:
+    """
+    Cartella di progetto temporanea con una copia dei CSV inclusi nel repository:
+    database, snapshot e grafici vengono scritti lì invece che nella cartella del progetto.
+    """
+    data_dir = tmp_path / "data"
+    shutil.copytree(PRJ_ROOT / "data", data_dir)
+    monkeypatch.setattr(config, "DATA_DIR", data_dir)
+    monkeypatch.setattr(config, "DB_DIR", tmp_path / "database.db")
+    monkeypatch.setattr(config, "snapshot_dir", tmp_path / "snapshot")
+    monkeypatch.setattr(config, "grafici_dir", tmp_path / "grafici")
+    monkeypatch.setattr(config, "usa_snapshot", False)
+    return tmp_path
+
+
+@pytest.fixture
+def database(progetto) -> Path:
+    """
+    Database temporaneo completo: importazione dei CSV, interpolazione dei valori mancanti e serie calcolate.
+    """
+    from src.database.db_operations import csv_to_sql
+    from src.scripts.post_processing import normalize_missing_data_by_interpolation
+    from src.serie_calcolate.engine import calcola_serie
+
+    csv_to_sql()
+    assert normalize_missing_data_by_interpolation()
+    assert calcola_serie()
+    return config.DB_DIR
+
+
+@pytest.fixture
+def righe():
+    """
+    Funzione che legge il contenuto di una tabella del database temporaneo come lista ordinata di tuple,
+    con i nomi delle dimensioni decodificati.
+    """
+    from src.database.data_access import Interrogazione, costruisci_query
+
+    def leggi(table_name: str) -> list[tuple]:
+        query, params = costruisci_query(table_name, Interrogazione())
+        with closing(sqlite3.connect(config.DB_DIR)) as conn:
+            return sorted(conn.execute(query, params).fetchall(), key=repr)
+
+    return leggi
+
+
+@pytest.fixture
+def client(database):
+    """
+    Client di test dell'API sul database temporaneo; il lifespan (pool, cache, riscaldamento) viene eseguito.
+    """
+    from fastapi.testclient import TestClient
+    from src.scripts.run_api import app
+
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,180 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from src.api.serialization import FORMATI_ARROW, FORMATI_DATI, formati_disponibili
+from src.configurations import config
+
+PRODUTTIVITA = "/tabelle_originali/produttivita"
+
+
+@pytest.mark.parametrize("richiesta", [1, 2], ids=["lettura", "dalla_cache"])
+def test_corpo_piccolo_non_compresso(client, richiesta):
+    # Sotto api_compressione_min_byte la risposta resta non compressa anche se il client accetta gzip.
+    for _ in range(richiesta):
+        response = client.get(PRODUTTIVITA, params={"da_anno": 2005, "a_anno": 2005, "regione": "Sicilia"},
+                              headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert len(response.content) < config.api_compressione_min_byte
+    assert response.json() == [{"Anno": 2005, "Regione": "Sicilia", config.colonna_produttivita: 21.41}]
+
+
+def test_corpo_grande_compresso(client):
+    response = client.get(PRODUTTIVITA, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) > 200
+
+
+def _pagine(client, percorso: str, params: dict) -> list[list[dict]]:
+    # Segue l'intestazione Link rel="next" fino all'ultima pagina.
+    pagine = []
+    response = client.get(percorso, params=params)
+    while True:
+        assert response.status_code == 200
+        pagine.append(response.json())
+        if "next" not in response.links:
+            return pagine
+        response = client.get(response.links["next"]["url"])
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"ordina": [f"-{config.colonna_produttivita}"]},
+    {"ordina": ["Regione", "-Anno"], "macro_area": "Sud"},
+    {"da_anno": 2003, "a_anno": 2008, "colonne": ["Regione", config.colonna_produttivita]},
+], ids=["chiave", "valore_decrescente", "piu_colonne_filtro", "proiezione"])
+def test_paginazione_con_cursore(client, params):
+    # Le pagine concatenate coincidono con la lettura non paginata nello stesso ordine totale (le pagine
+    # aggiungono in coda la chiave primaria), senza righe ripetute o saltate.
+    ordina = params.get("ordina", [])
+    chiave = [col for col in ("Anno", "Regione") if col not in {col.removeprefix("-") for col in ordina}]
+    attese = client.get(PRODUTTIVITA, params={**params, "ordina": ordina + chiave}).json()
+    pagine = _pagine(client, PRODUTTIVITA, {**params, "limit": 37})
+    assert all(len(pagina) == 37 for pagina in pagine[:-1]) and 0 < len(pagine[-1]) <= 37
+    assert [riga for pagina in pagine for riga in pagina] == attese
+
+
+def test_paginazione_serie_calcolata(client):
+    percorso = "/serie-calcolate/produttivita-macroaree"
+    attese = client.get(percorso, params={"ordina": ["Anno", "Macro Area"]}).json()
+    pagine = _pagine(client, percorso, {"limit": 5})
+    assert len(pagine) > 1
+    assert [riga for pagina in pagine for riga in pagina] == attese
+
+
+def test_cursore_non_valido(client):
+    response = client.get(PRODUTTIVITA, params={"limit": 10, "after": "non-un-cursore"})
+    assert response.status_code == 400
+
+
+def test_revalidazione_con_etag(client):
+    response = client.get(PRODUTTIVITA)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+
+    # Stesso ETag, anche debole come lo restituiscono alcuni proxy: 304 senza corpo, con le stesse intestazioni.
+    for if_none_match in (etag, f"W/{etag}", f'"altro", {etag}', "*"):
+        response = client.get(PRODUTTIVITA, headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    assert client.get(PRODUTTIVITA, headers={"If-None-Match": '"altro"'}).status_code == 200
+    # Parametri diversi sono un'altra risposta, con un altro ETag.
+    response = client.get(PRODUTTIVITA, params={"da_anno": 2005}, headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+
+def test_revalidazione_con_data_di_modifica(client):
+    last_modified = client.get(PRODUTTIVITA).headers["last-modified"]
+    response = client.get(PRODUTTIVITA, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304 and response.content == b""
+
+    for if_modified_since in ("Mon, 01 Jan 2001 00:00:00 GMT", "non-una-data"):
+        response = client.get(PRODUTTIVITA, headers={"If-Modified-Since": if_modified_since})
+        assert response.status_code == 200
+    # If-None-Match ha la precedenza: con un ETag diverso la data non basta per il 304.
+    response = client.get(PRODUTTIVITA, headers={"If-None-Match": '"altro"', "If-Modified-Since": last_modified})
+    assert response.status_code == 200
+
+
+def test_etag_cambia_con_i_dati(client):
+    from src.database.data_version import bump_data_version
+
+    etag = client.get(PRODUTTIVITA).headers["etag"]
+    with closing(sqlite3.connect(config.DB_DIR)) as conn, conn:
+        bump_data_version(conn, [config.tabella_produttivita_pesca])
+    # La copia del client non è più valida: risposta completa con il nuovo ETag, non servita dalla vecchia voce.
+    response = client.get(PRODUTTIVITA, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()) > 200
+
+
+SICILIA_2005 = {"da_anno": 2005, "a_anno": 2005, "regione": "Sicilia"}
+
+
+@pytest.mark.parametrize("accept, formato", [
+    ("*/*", "json"),
+    ("application/json", "json"),
+    ("text/csv", "csv"),
+    ("text/*", "csv"),
+    ("text/csv;q=0.5, application/json", "json"),
+    ("application/json;q=0.2, text/csv;q=0.9", "csv"),
+    ("application/vnd.apache.arrow.stream, text/csv;q=0.1", "csv"),
+], ids=["qualsiasi", "json", "csv", "intervallo", "q_json", "q_csv", "arrow_o_csv"])
+def test_negoziazione_del_formato(client, accept, formato):
+    if "arrow" in accept:
+        pytest.importorskip("pyarrow", reason="senza pyarrow la negoziazione non può scegliere Arrow")
+        formato = "arrow"
+    response = client.get(PRODUTTIVITA, params=SICILIA_2005, headers={"Accept": accept})
+    assert response.status_code == 200
+    assert response.headers["content-type"].split(";")[0] == FORMATI_DATI[formato]
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    if formato == "json":
+        assert response.json() == [{"Anno": 2005, "Regione": "Sicilia", config.colonna_produttivita: 21.41}]
+    elif formato == "csv":
+        assert response.text.splitlines() == [f"Anno,Regione,{config.colonna_produttivita}", "2005,Sicilia,21.41"]
+
+
+def test_formati_con_etag_distinti(client):
+    # JSON e CSV sono rappresentazioni diverse: l'ETag dell'una non revalida l'altra.
+    etag = client.get(PRODUTTIVITA, headers={"Accept": "application/json"}).headers["etag"]
+    response = client.get(PRODUTTIVITA, headers={"Accept": "text/csv", "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    # Il parametro 'formato' ha la precedenza sull'intestazione Accept.
+    response = client.get(PRODUTTIVITA, params={"formato": "csv"}, headers={"Accept": "application/json"})
+    assert response.headers["content-type"].startswith("text/csv")
+
+
+@pytest.mark.parametrize("headers, params, status_code", [
+    ({"Accept": "image/png"}, {}, 406),
+    ({"Accept": "application/json;q=0"}, {}, 406),
+    ({}, {"formato": "xml"}, 400),
+], ids=["tipo_non_offerto", "q_zero", "formato_sconosciuto"])
+def test_formato_non_accettabile(client, headers, params, status_code):
+    assert client.get(PRODUTTIVITA, params=params, headers=headers).status_code == status_code
+
+
+@pytest.mark.parametrize("formato", FORMATI_ARROW)
+def test_formati_arrow(client, formato):
+    if formato not in formati_disponibili():
+        # Senza la dipendenza opzionale il formato è riconosciuto ma non disponibile.
+        assert client.get(PRODUTTIVITA, params={"formato": formato}).status_code == 501
+        return
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    response = client.get(PRODUTTIVITA, params={**SICILIA_2005, "formato": formato})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == FORMATI_DATI[formato]
+    if formato == "arrow":
+        tabella = pa.ipc.open_stream(response.content).read_all()
+    else:
+        tabella = pq.read_table(pa.BufferReader(response.content))
+    assert tabella.to_pylist() == [{"Anno": 2005, "Regione": "Sicilia", config.colonna_produttivita: 21.41}]
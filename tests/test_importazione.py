@@ -0,0 +1,82 @@
+import io
+
+import pytest
+
+from src.configurations import config
+from src.database import db_operations
+from src.database.db_operations import _open_csv, csv_to_sql, import_csv_file
+
+TABELLA = config.tabella_produttivita_pesca
+TABELLE = [config.tabella_andamento_occupazione_pesca, config.tabella_importanza_economica_pesca, TABELLA]
+# Un anno successivo all'ultimo presente nel CSV, con valori a quattro decimali come quelli originali.
+ANNO_AGGIUNTO = "2012;Piemonte;61.1234\n2012;Sicilia;30.5678\n"
+
+
+def _file_csv():
+    return config.DATA_DIR / f"{TABELLA}.csv"
+
+
+def _aggiungi_anno():
+    with open(_file_csv(), "a", encoding="utf-8", newline="") as f:
+        f.write(ANNO_AGGIUNTO)
+
+
+@pytest.mark.parametrize("opzioni", [{"streaming": True}, {"workers": 2}])
+def test_modalita_di_importazione_equivalenti(progetto, righe, opzioni):
+    csv_to_sql()
+    attese = {table_name: righe(table_name) for table_name in TABELLE}
+    config.DB_DIR.unlink()
+    csv_to_sql(**opzioni)
+    for table_name, rows in attese.items():
+        assert righe(table_name) == rows
+
+
+def test_streaming_ignora_i_processi(progetto, righe, monkeypatch):
+    # Con streaming e più processi l'importazione resta sequenziale, a blocchi: i processi non vengono avviati.
+    def parallela(*args, **kwargs):
+        raise AssertionError("importazione parallela avviata in modalità streaming")
+
+    monkeypatch.setattr(db_operations, "_import_files_parallel", parallela)
+    csv_to_sql(streaming=True, workers=2)
+    assert len(righe(TABELLA)) > 0
+
+
+def test_incrementale_salta_file_invariato(progetto):
+    assert import_csv_file(_file_csv(), TABELLA)[0] == "ricreata"
+    assert import_csv_file(_file_csv(), TABELLA) == ("saltato", 0)
+
+
+@pytest.mark.parametrize("opzioni", [{}, {"streaming": True}, {"workers": 2}])
+def test_incrementale_importa_solo_righe_aggiunte(progetto, righe, opzioni):
+    csv_to_sql(incrementale=True, **opzioni)
+    _aggiungi_anno()
+    csv_to_sql(incrementale=True, **opzioni)
+    aggiornate = righe(TABELLA)
+
+    # Stesso contenuto di un'importazione completa del file cresciuto.
+    config.DB_DIR.unlink()
+    csv_to_sql()
+    assert aggiornate == righe(TABELLA)
+    assert (2012, "Sicilia") in {(anno, regione) for anno, regione, _ in aggiornate}
+
+
+def test_incrementale_righe_aggiunte_esito(progetto):
+    import_csv_file(_file_csv(), TABELLA, streaming=True)
+    _aggiungi_anno()
+    assert import_csv_file(_file_csv(), TABELLA, streaming=True) == ("aggiornata", 2)
+
+
+def test_incrementale_file_modificato_ricrea_tabella(progetto):
+    import_csv_file(_file_csv(), TABELLA)
+    contenuto = _file_csv().read_text(encoding="utf-8")
+    _file_csv().write_text(contenuto.replace("59.2180", "59.2181"), encoding="utf-8")
+    assert import_csv_file(_file_csv(), TABELLA)[0] == "ricreata"
+
+
+def test_coda_csv_letta_dal_file(progetto):
+    # Le righe aggiunte vengono lette dal file a partire dalla posizione registrata, precedute dall'intestazione.
+    dimensione = _file_csv().stat().st_size
+    _aggiungi_anno()
+    with _open_csv(_file_csv(), dimensione) as csv_file:
+        testo = io.TextIOWrapper(csv_file, encoding="utf-8").read()
+    assert testo == "Anno;Regione;Produttivita in migliaia di euro\n" + ANNO_AGGIUNTO
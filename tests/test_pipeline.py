@@ -0,0 +1,42 @@
+import shutil
+
+from src.configurations import config
+from src.pipeline.dag import Pipeline
+from src.pipeline.nodes import costruisci_nodi
+from src.serie_calcolate.specs import SERIE
+
+TABELLA = config.tabella_produttivita_pesca
+
+
+def _esegui() -> dict[str, str]:
+    esiti = Pipeline(costruisci_nodi(), workers=2).esegui()
+    return {nome: esito.stato for nome, esito in esiti.items()}
+
+
+def test_seconda_esecuzione_salta_tutti_i_nodi(progetto):
+    assert set(_esegui().values()) == {"eseguito"}
+    assert set(_esegui().values()) == {"aggiornato"}
+
+
+def test_csv_modificato_riesegue_solo_i_nodi_a_valle(progetto):
+    _esegui()
+    with open(config.DATA_DIR / f"{TABELLA}.csv", "a", encoding="utf-8", newline="") as f:
+        f.write("2012;Piemonte;61.1234\n")
+    stati = _esegui()
+
+    serie = [spec.output_table for spec in SERIE if spec.input_table == TABELLA]
+    rieseguiti = {f"importazione:{TABELLA}", f"interpolazione:{TABELLA}",
+                  *(f"serie:{table}" for table in serie), *(f"grafico:{table}" for table in serie)}
+    assert {nome for nome, stato in stati.items() if stato == "eseguito"} == rieseguiti
+    assert all(stato == "aggiornato" for nome, stato in stati.items() if nome not in rieseguiti)
+
+
+def test_grafici_eliminati_vengono_rigenerati(progetto):
+    _esegui()
+    shutil.rmtree(config.grafici_dir)
+    stati = _esegui()
+
+    assert all(stato == "eseguito" for nome, stato in stati.items() if nome.startswith("grafico:"))
+    assert all(stato == "aggiornato" for nome, stato in stati.items() if not nome.startswith("grafico:"))
+    assert all((config.grafici_dir / f"{spec.output_table}.{formato}").exists()
+               for spec in SERIE for formato in config.grafici_formati)
@@ -0,0 +1,61 @@
+import sqlite3
+from contextlib import closing
+
+from src.configurations import config
+from src.database.db_operations import csv_to_sql
+from src.scripts import post_processing
+from src.scripts.post_processing import normalize_missing_data_by_interpolation
+
+TABELLA = config.tabella_produttivita_pesca
+
+
+def _valori(table_name: str, value_col: str) -> list[float]:
+    with closing(sqlite3.connect(config.DB_DIR)) as conn:
+        return [value for value, in conn.execute(f'SELECT "{value_col}" FROM "{table_name}"')]
+
+
+def test_righe_aggiunte_senza_valori_mancanti_arrotondate(database):
+    # Un anno aggiunto senza valori mancanti ma con quattro decimali viene comunque arrotondato a due.
+    with open(config.DATA_DIR / f"{TABELLA}.csv", "a", encoding="utf-8", newline="") as f:
+        f.write("2012;Piemonte;61.1234\n2012;Sicilia;30.5678\n")
+    csv_to_sql(incrementale=True)
+    assert normalize_missing_data_by_interpolation([TABELLA])
+
+    valori = _valori(TABELLA, config.colonna_produttivita)
+    assert valori == [round(value, 2) for value in valori]
+    assert {61.12, 30.57} <= set(valori)
+
+
+def _annulla(condizione: str):
+    with closing(sqlite3.connect(config.DB_DIR)) as conn, conn:
+        conn.execute(f'UPDATE "{TABELLA}" SET "{config.colonna_produttivita}" = NULL WHERE {condizione}')
+
+
+def _letture(monkeypatch) -> list[str]:
+    # Registra le tabelle lette per intero dal post-processing.
+    lette = []
+    originale = post_processing.leggi_tabella
+
+    def leggi_tabella(table_name, *args, **kwargs):
+        lette.append(table_name)
+        return originale(table_name, *args, **kwargs)
+
+    monkeypatch.setattr(post_processing, "leggi_tabella", leggi_tabella)
+    return lette
+
+
+def test_nan_non_interpolabili_non_fanno_rileggere_la_tabella(database, monkeypatch):
+    # Un NaN nel primo anno di una regione non si può interpolare: resta NaN e la tabella non va riletta.
+    _annulla(f'"{config.colonna_anno}" = (SELECT MIN("{config.colonna_anno}") FROM "{TABELLA}")')
+    lette = _letture(monkeypatch)
+    assert normalize_missing_data_by_interpolation([TABELLA])
+    assert lette == []
+    assert None in _valori(TABELLA, config.colonna_produttivita)
+
+
+def test_nan_interni_interpolati(database, monkeypatch):
+    _annulla(f'"{config.colonna_anno}" = 2005')
+    lette = _letture(monkeypatch)
+    assert normalize_missing_data_by_interpolation([TABELLA])
+    assert lette == [TABELLA]
+    assert None not in _valori(TABELLA, config.colonna_produttivita)
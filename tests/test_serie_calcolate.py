@@ -0,0 +1,74 @@
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+from src.configurations import config
+from src.database.data_access import Interrogazione, leggi_tabella
+from src.database.db_operations import csv_to_sql
+from src.serie_calcolate.engine import (_aggregate_input, calcola_serie, uguali_dopo_arrotondamento,
+                                        verifica_parita_backend)
+from src.serie_calcolate.specs import SERIE, SERIE_PER_TABELLA
+
+
+def _riferimento(spec, arrotonda: bool = True) -> list[tuple]:
+    # Calcolo come negli script originali: nomi delle regioni mappati sulle macro aree, groupby e round(2).
+    colonne = (config.colonna_anno, config.colonna_regione, spec.value_col)
+    df = leggi_tabella(spec.input_table, Interrogazione(colonne=colonne))
+    df[config.colonna_macro_area] = df[config.colonna_regione].astype(object).map(config.macro_aree)
+    risultati = df.groupby(list(spec.group_by))[spec.value_col].agg(spec.aggregation)
+    if arrotonda:
+        risultati = risultati.round(2)
+    return sorted(risultati.reset_index().itertuples(index=False, name=None), key=repr)
+
+
+def _uguali_a_meno_di_ulp(righe: list[tuple], spec) -> bool:
+    # Il backend SQL somma con TOTAL() senza compensazione: i valori arrotondati possono differire da pandas
+    # solo se la somma esatta cade a pochi ulp da un caso a metà.
+    attese = _riferimento(spec, arrotonda=False)
+    if [riga[:-1] for riga in righe] != [riga[:-1] for riga in attese]:
+        return False
+    return bool(uguali_dopo_arrotondamento([riga[-1] for riga in righe], [riga[-1] for riga in attese]).all())
+
+
+def test_serie_nazionale_somma_le_righe_dell_anno():
+    # Valori per cui la somma delle somme per macro area e la somma diretta delle righe cadono da parti opposte
+    # di un caso a metà: la serie nazionale deve arrotondare la somma diretta, come il calcolo originale.
+    spec = SERIE_PER_TABELLA[config.tabella_totale_nazionale_produttivita_pesca]
+    df = pd.DataFrame({config.colonna_anno: [2000] * 4, config.colonna_macro_area: [0, 0, 1, 1],
+                       spec.value_col: [87.648, 5.857, 33.612, 15.028]})
+    risultato = _aggregate_input(df, [spec])[spec.output_table]
+    assert risultato[spec.output_col].tolist() == [142.15]
+
+
+def test_verifica_parita_backend(database):
+    assert verifica_parita_backend()
+
+
+@pytest.mark.parametrize("spec", SERIE, ids=lambda spec: spec.output_table)
+@pytest.mark.parametrize("backend", ["pandas", "sql"])
+def test_serie_uguali_al_calcolo_originale(database, righe, backend, spec):
+    assert calcola_serie(backend=backend)
+    if backend == "pandas":
+        assert righe(spec.output_table) == _riferimento(spec)
+    else:
+        assert _uguali_a_meno_di_ulp(righe(spec.output_table), spec)
+
+
+def test_serie_mantenute_dai_trigger(database, righe):
+    # Con le serie materializzate, importazione incrementale e scritture dirette aggiornano solo i gruppi
+    # toccati: il risultato deve coincidere con un ricalcolo completo.
+    assert calcola_serie(backend="sql")
+    tabella = config.tabella_produttivita_pesca
+    value_col = next(spec.value_col for spec in SERIE if spec.input_table == tabella)
+    with open(config.DATA_DIR / f"{tabella}.csv", "a", encoding="utf-8", newline="") as f:
+        f.write("2012;Piemonte;61.1234\n2012;Sicilia;30.5678\n")
+    csv_to_sql(incrementale=True)
+    with closing(sqlite3.connect(config.DB_DIR)) as conn, conn:
+        conn.execute(f'UPDATE "{tabella}" SET "{value_col}" = "{value_col}" * 1.5 '
+                     f'WHERE "{config.colonna_anno}" = 2005')
+        conn.execute(f'DELETE FROM "{tabella}" WHERE "{config.colonna_anno}" = 2001')
+
+    for spec in SERIE:
+        assert _uguali_a_meno_di_ulp(righe(spec.output_table), spec)
@@ -0,0 +1,72 @@
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.configurations import config
+from src.database import data_version, snapshot
+from src.database.data_access import leggi_tabella
+from src.database.db_operations import csv_to_sql
+from src.database.schema import SCHEMAS
+from src.database.snapshot import carica_tabella, carica_tabella_se_aggiornata, esporta_snapshot
+
+TABELLA = config.tabella_importanza_economica_pesca
+
+
+@pytest.fixture(params=["npy", "arrow"])
+def formato(request, monkeypatch):
+    # Il formato dello snapshot dipende da pyarrow: senza di esso le colonne sono scritte come .npy.
+    if request.param == "arrow":
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setattr(snapshot, "pa", None)
+    return request.param
+
+
+def _mappato(values: np.ndarray) -> bool:
+    # Risale la catena delle viste: i dati devono appartenere alla mappa del file (np.memmap o buffer Arrow),
+    # non a un array NumPy con dati propri.
+    while isinstance(values, np.ndarray):
+        if isinstance(values, np.memmap):
+            return True
+        values = values.base
+    return values is not None
+
+
+def test_snapshot_uguale_al_database(database, formato):
+    esporta_snapshot(config.snapshot_dir)
+    for table_name in SCHEMAS:
+        # La copia converte le colonne mappate (np.memmap) in array ordinari, confrontabili con quelli di SQLite.
+        caricata = carica_tabella(table_name, config.snapshot_dir).copy()
+        pd.testing.assert_frame_equal(caricata, leggi_tabella(table_name), check_dtype=False, check_categorical=False)
+
+
+def test_snapshot_colonne_numeriche_non_copiate(database, formato):
+    esporta_snapshot(config.snapshot_dir)
+    df = carica_tabella(TABELLA, config.snapshot_dir)
+    for col in (config.colonna_anno, config.colonna_percentuale_valore_aggiunto):
+        assert _mappato(df[col].to_numpy())
+
+
+def test_snapshot_obsoleto_dopo_ricreazione_del_database(database, monkeypatch):
+    esporta_snapshot(config.snapshot_dir)
+    with closing(sqlite3.connect(config.DB_DIR)) as conn:
+        versione = data_version.get_data_version(conn, TABELLA)
+        assert carica_tabella_se_aggiornata(TABELLA, conn, config.snapshot_dir) is not None
+
+    # Database ricreato da zero più tardi: le versioni ripartono da 1 e possono coincidere con quelle dello
+    # snapshot, che va comunque considerato obsoleto.
+    class Dopo(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2030, 1, 1, tzinfo=tz)
+
+    monkeypatch.setattr(data_version, "datetime", Dopo)
+    config.DB_DIR.unlink()
+    csv_to_sql()
+    with closing(sqlite3.connect(config.DB_DIR)) as conn:
+        assert data_version.get_data_version(conn, TABELLA) == versione
+        assert carica_tabella_se_aggiornata(TABELLA, conn, config.snapshot_dir) is None